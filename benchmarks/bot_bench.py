@@ -0,0 +1,100 @@
+"""Measure how bot seats affect the responsiveness of the server to human players
+
+Plays `num_games` games at a time, each with one simulated human host and bots in every other seat,
+while a probe client sends a cheap request every few milliseconds and records how long the answer
+takes. Runs once with the bots searching in the process pool and once with their searches run inline
+on the IOLoop, as a blocking implementation would. Without a core to spare, workers share the CPU with
+the IOLoop and it is up to the OS scheduler how quickly the IOLoop gets it back.
+
+Usage: python benchmarks/bot_bench.py [duration] [num_games] [num_players]
+"""
+
+import asyncio
+from concurrent.futures import Executor, Future
+import os
+import random
+import sys
+import time
+
+import tornado.httpserver
+import tornado.testing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import bot_seats  # noqa: E402
+import server  # noqa: E402
+import server_log  # noqa: E402
+from sim_client import SimClient  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+
+
+class InlineExecutor(Executor):
+    """runs every call right away on the calling thread"""
+    def submit(self, fn, /, *args, **kwargs):
+        future: Future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+async def play_with_bots(url: str, num_players: int, rng: random.Random) -> None:
+    host = SimClient(url, "host", rng)
+    await host.connect()
+    host.send({"type": "new_game", "host": host.name})
+    await host.receive_until("player_id")
+    for i in range(1, num_players):
+        host.send({"type": "add_bot", "player_name": f"bot{i}"})
+        await host.receive_until("success")
+    host.send({"type": "begin_game"})
+    await host.play()
+    host.close()
+
+
+async def run(url: str, duration: float, num_games: int, num_players: int) -> None:
+    deadline = time.perf_counter() + duration
+    completed = 0
+    latencies = []
+
+    async def game_slot(slot: int) -> None:
+        nonlocal completed
+        rng = random.Random(slot)
+        while time.perf_counter() < deadline:
+            await play_with_bots(url, num_players, rng)
+            completed += 1
+
+    async def probe() -> None:
+        client = SimClient(url, "probe", random.Random(0))
+        await client.connect()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            client.send({"type": "join_game", "game_id": "missing", "player_name": "probe"})
+            await client.receive_until("error")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(PROBE_INTERVAL)
+        client.close()
+
+    await asyncio.gather(probe(), *[game_slot(i) for i in range(num_games)])
+    latencies.sort()
+    print(f"  {completed / duration:6.2f} games/s  probe latency p50 {latencies[len(latencies) // 2] * 1e3:7.2f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:7.2f} ms  max {latencies[-1] * 1e3:7.2f} ms")
+
+
+async def main(duration: float, num_games: int, num_players: int) -> None:
+    server.games.game_over_ttl = 0
+    (sock, port) = tornado.testing.bind_unused_port()
+    tornado.httpserver.HTTPServer(server.application).add_sockets([sock])
+    url = f"ws://127.0.0.1:{port}/ws"
+    print(f"{os.cpu_count()} cores, bot time budget {bot_seats.BOT_TIME_BUDGET * 1e3:.0f} ms")
+
+    print("bots searching in the process pool:")
+    await run(url, duration, num_games, num_players)
+    server.games.games.clear()
+    print("bots searching on the IOLoop:")
+    bot_seats.executor = InlineExecutor()  # type: ignore
+    await run(url, duration, num_games, num_players)
+
+
+if __name__ == "__main__":
+    server_log.disable()
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 20,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+                     int(sys.argv[3]) if len(sys.argv) > 3 else 5))
@@ -0,0 +1,83 @@
+"""Measure server CPU per action of a 10-player game, with and without serialize-once broadcasts
+
+Plays random actions on a GameHandle whose players are connected through fake WebSockets that only
+collect the frames sent to them, so the time is spent in the game, the fan-out and the encoding.
+"per recipient" reproduces the old fan-out that encoded every message once per player.
+10-player games reach presidential powers that are not implemented yet; those games are started over.
+
+Usage: python benchmarks/broadcast_bench.py [num_actions] [num_players]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import server  # noqa: E402
+import server_log  # noqa: E402
+
+from secret_hitler.exceptions import GameError, UnimplementedFeature  # noqa: E402
+
+
+class PerRecipientGameHandle(server.GameHandle):
+    def broadcast(self, message, recipients=None):
+        for ws in (self.handles.values() if recipients is None else recipients):
+            ws.safe_send(message)
+
+
+def fake_connection(encoding):
+    # no request behind it, so tornado's initialization is skipped
+    ws = server.WSHandler.__new__(server.WSHandler)
+    ws.game = None
+    ws.player_id = None
+    ws.log = server.ContextAdapter(server.logger, ws)
+    ws.encoding = encoding
+    ws.sent = []
+    ws.write_message = ws.sent.append
+    return ws
+
+
+def new_game(handle_type, num_players: int, encoding: str):
+    handle = handle_type("p0")
+    for i in range(num_players):
+        handle.add_player(f"p{i}", fake_connection(encoding))
+    handle.begin_game()
+    return handle
+
+
+def time_per_action(handle_type, num_actions: int, num_players: int, encoding: str) -> float:
+    rng = random.Random(0)
+    handle = new_game(handle_type, num_players, encoding)
+    elapsed = 0.0
+    done = 0
+    while done < num_actions:
+        if handle.is_over():
+            handle = new_game(handle_type, num_players, encoding)
+        player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+        prompt = handle.prompts[player]
+        choice = rng.choice(prompt.choices)
+        start = time.perf_counter()
+        try:
+            handle.perform_action(handle.ids[player], prompt.method, choice)
+        except GameError as err:
+            if isinstance(err, UnimplementedFeature):
+                handle = new_game(handle_type, num_players, encoding)
+            continue
+        finally:
+            elapsed += time.perf_counter() - start
+        done += 1
+    return elapsed / num_actions
+
+
+def main(num_actions: int, num_players: int):
+    server_log.disable()
+    for encoding in ("json", "compact"):
+        for (name, handle_type) in (("per recipient", PerRecipientGameHandle), ("broadcast", server.GameHandle)):
+            seconds = time_per_action(handle_type, num_actions, num_players, encoding)
+            print(f"{encoding:>8} {name:>14}: {seconds * 1e6:7.1f} us/action")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10)
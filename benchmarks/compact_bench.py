@@ -0,0 +1,52 @@
+"""Compare the memory held by mid-game states stored as Board/Stage copies and as CompactState
+
+Usage: python benchmarks/compact_bench.py [num_states] [num_players]
+"""
+
+import copy
+import random
+import sys
+import tracemalloc
+
+from secret_hitler.compact import CompactState
+from secret_hitler.sim import SimBoard
+from secret_hitler import stages
+
+
+def mid_game_state(num_players: int):
+    # a seeded game in the middle of a chancellor vote
+    board = SimBoard(random.Random(num_players))
+    for i in range(num_players):
+        board.add_player(f"p{i}")
+    board.begin_game()
+    stage: stages.Stage = stages.RevealIdentities(board)
+    for _ in range(num_players):
+        stage = stage.perform_action("ack_identity", "Got it!")
+    stage = stage.perform_action("nominate_chancellor", "p1")
+    stage = stage.perform_action("vote_for_chancellor", "ja")
+    return (board, stage)
+
+
+def measure(make, num_states: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = [make() for _ in range(num_states)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del held
+    return total / num_states
+
+
+def main(num_states: int, num_players: int) -> None:
+    (board, stage) = mid_game_state(num_players)
+    # the PRNG is shared rather than copied, it is not part of a stored state
+    board_bytes = measure(lambda: copy.deepcopy((board, stage), {id(board.rng): board.rng}), num_states)
+    compact_bytes = measure(lambda: CompactState.from_board(board, stage), num_states)
+    print(f"Board + Stage: {board_bytes:8.0f} bytes/state")
+    print(f"CompactState:  {compact_bytes:8.0f} bytes/state  ({board_bytes / compact_bytes:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 7)
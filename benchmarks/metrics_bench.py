@@ -0,0 +1,76 @@
+"""Measure the overhead of the server metrics on the request path
+
+Drives games through WSHandler.on_message of fake connections, which only collect the frames sent to
+them, once with the metrics recording and once with recording replaced by no-ops (the perf_counter
+calls around the instrumented code remain). Games reaching presidential powers that are not
+implemented yet are started over.
+
+Usage: python benchmarks/metrics_bench.py [num_requests] [num_players]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import metrics  # noqa: E402
+import server  # noqa: E402
+import server_log  # noqa: E402
+
+
+def fake_connection():
+    # no request behind it, so tornado's initialization is skipped
+    ws = server.WSHandler.__new__(server.WSHandler)
+    ws.game = None
+    ws.player_id = None
+    ws.state_version = None
+    ws.log = server.ContextAdapter(server.logger, ws)
+    ws.encoding = "json"
+    ws.write_message = lambda frame: None
+    return ws
+
+
+def new_game(num_players: int):
+    connections = [fake_connection() for _ in range(num_players)]
+    connections[0].on_message(json.dumps({"type": "new_game", "host": "p0"}))
+    for (i, ws) in enumerate(connections[1:], 1):
+        ws.on_message(json.dumps({"type": "join_game", "game_id": connections[0].game.game_id, "player_name": f"p{i}"}))
+    connections[0].on_message(json.dumps({"type": "begin_game"}))
+    return {f"p{i}": ws for (i, ws) in enumerate(connections)}
+
+
+def time_per_request(num_requests: int, num_players: int) -> float:
+    rng = random.Random(0)
+    connections = new_game(num_players)
+    elapsed = 0.0
+    for _ in range(num_requests):
+        handle = next(iter(connections.values())).game
+        if handle.is_over() or not handle.prompts or type(handle.game.stage).__name__ == "PerformPresidentialPower":
+            server.games.games.clear()
+            connections = new_game(num_players)
+            handle = connections["p0"].game
+        player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+        prompt = handle.prompts[player]
+        request = json.dumps({"type": "user_action", "action": prompt.method, "choice": rng.choice(prompt.choices)})
+        start = time.perf_counter()
+        connections[player].on_message(request)
+        elapsed += time.perf_counter() - start
+    return elapsed / num_requests
+
+
+def main(num_requests: int, num_players: int):
+    server_log.disable()
+    with_metrics = time_per_request(num_requests, num_players)
+    metrics.Counter.inc = lambda self, labels=(), amount=1: None  # type: ignore
+    metrics.Histogram.observe = lambda self, value, labels=(): None  # type: ignore
+    without_metrics = time_per_request(num_requests, num_players)
+    print(f"without metrics: {without_metrics * 1e6:6.1f} us/request")
+    print(f"with metrics:    {with_metrics * 1e6:6.1f} us/request  "
+          f"(+{(with_metrics - without_metrics) * 1e6:.1f} us, {with_metrics / without_metrics - 1:+.1%})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,54 @@
+"""Compare the size and encoding time of the WebSocket message encodings
+
+Plays games against an in-process server, records every message the clients received, and re-encodes
+all of them with each encoding.
+
+Usage: python benchmarks/protocol_bench.py [num_games] [num_players]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+import tornado.httpserver
+import tornado.testing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import protocol  # noqa: E402
+import server  # noqa: E402
+import server_log  # noqa: E402
+from sim_client import play_game  # noqa: E402
+
+REPEAT = 20
+
+
+async def record_messages(num_games: int, num_players: int):
+    (sock, port) = tornado.testing.bind_unused_port()
+    tornado.httpserver.HTTPServer(server.application).add_sockets([sock])
+    rng = random.Random(0)
+    messages = []
+    for _ in range(num_games):
+        clients = await play_game(f"ws://127.0.0.1:{port}/ws", num_players, rng)
+        messages += [message for c in clients for message in c.received]
+    return messages
+
+
+def main(num_games: int, num_players: int):
+    server_log.disable()
+    messages = asyncio.run(record_messages(num_games, num_players))
+    print(f"{len(messages)} messages from {num_games} {num_players}-player games")
+    for (name, encode) in protocol.ENCODINGS.items():
+        size = sum(len(encode(m)) for m in messages)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            for m in messages:
+                encode(m)
+        elapsed = (time.perf_counter() - start) / REPEAT / len(messages)
+        print(f"{name:>8}: {size / len(messages):6.1f} bytes/message  {elapsed * 1e6:5.2f} us/message")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,84 @@
+"""Time recovering the games of a server process from its game log
+
+Plays `num_games` 5-player games for up to `num_actions` random actions each with the game log enabled,
+then recovers them by replaying the whole log, and again from a snapshot taken at the end.
+
+Usage: python benchmarks/recovery_bench.py [num_games] [num_actions]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import server  # noqa: E402
+import server_log  # noqa: E402
+from game_log import GameLog  # noqa: E402
+
+from secret_hitler.exceptions import GameError  # noqa: E402
+
+
+def play(num_games: int, num_actions: int) -> None:
+    rng = random.Random(0)
+    for _ in range(num_games):
+        handle = server.create_game("p0")
+        for name in ["p1", "p2", "p3", "p4"]:
+            handle.add_player(name, None)
+        handle.begin_game()
+        for _ in range(num_actions):
+            if handle.is_over():
+                break
+            player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+            prompt = handle.prompts[player]
+            try:
+                handle.perform_action(handle.ids[player], prompt.method, rng.choice(prompt.choices))
+            except GameError:
+                pass
+
+
+def recover(log_dir: str) -> float:
+    server.games.games.clear()
+    start = time.perf_counter()
+    server.recover_games(GameLog(log_dir))
+    return time.perf_counter() - start
+
+
+def main(num_games: int, num_actions: int):
+    with tempfile.TemporaryDirectory() as log_dir:
+        server.events = GameLog(log_dir)
+        server.snapshot_games()
+        start = time.perf_counter()
+        play(num_games, num_actions)
+        server.events.sync()
+        elapsed = time.perf_counter() - start
+        (_, events_bytes) = server.events.size()
+        print(f"played {num_games} games in {elapsed:.2f}s, log: {events_bytes / 2 ** 20:.1f} MiB")
+        expected = {game_id: server.games[game_id].game.board.rng.getstate() for game_id in server.games}
+        events = server.events
+        server.events = None
+
+        elapsed = recover(log_dir)
+        assert {game_id: server.games[game_id].game.board.rng.getstate() for game_id in server.games} == expected
+        print(f"replaying the log:     {elapsed:6.2f}s")
+
+        server.events = events
+        start = time.perf_counter()
+        server.snapshot_games()
+        snapshot_time = time.perf_counter() - start
+        server.events.sync()
+        written_time = time.perf_counter() - start
+        (snapshot_bytes, _) = server.events.size()
+        server.events.close()
+        server.events = None
+        elapsed = recover(log_dir)
+        assert len(server.games) == num_games
+        print(f"loading the snapshot:  {elapsed:6.2f}s  (taking it: {snapshot_time:.2f}s on the IOLoop, "
+              f"{written_time:.2f}s until written, {snapshot_bytes / 2 ** 20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    server_log.disable()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,75 @@
+"""Load test the game server with simulated WebSocket clients
+
+Runs the server and the clients in one process: `concurrency` games are played back to back for `duration`
+seconds while finished games are evicted, and sustained games/s, live games and memory are reported every
+interval. The clients share the CPU with the server, so absolute numbers understate the server's capacity.
+Clients take think_time seconds on average to answer a prompt, so that thousands of games can be in play at
+once without the clients saturating the CPU. Games start over the first RAMP_UP seconds.
+
+Usage: python benchmarks/server_load_bench.py [duration] [concurrency] [num_players] [think_time]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import server  # noqa: E402
+import server_log  # noqa: E402
+from sim_client import play_game  # noqa: E402
+
+REPORT_INTERVAL = 2.0
+RAMP_UP = 30.0
+LISTEN_BACKLOG = 4096
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def run(duration: float, concurrency: int, num_players: int, think_time: float) -> None:
+    server.games.game_over_ttl = 0
+    # a deep accept backlog, or connections are reset while thousands of clients connect during the ramp up
+    [sock] = tornado.netutil.bind_sockets(0, "127.0.0.1", backlog=LISTEN_BACKLOG)
+    port = sock.getsockname()[1]
+    tornado.httpserver.HTTPServer(server.application).add_sockets([sock])
+    url = f"ws://127.0.0.1:{port}/ws"
+    tornado.ioloop.PeriodicCallback(server.evict_expired_games, 500).start()
+
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def game_slot(slot: int) -> None:
+        nonlocal completed
+        rng = random.Random(slot)
+        await asyncio.sleep(RAMP_UP * slot / concurrency)
+        while time.perf_counter() < deadline:
+            await play_game(url, num_players, rng, think_time=think_time)
+            completed += 1
+
+    async def report() -> None:
+        last = 0
+        start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(REPORT_INTERVAL)
+            print(f"t={time.perf_counter() - start:5.1f}s  {(completed - last) / REPORT_INTERVAL:7.1f} games/s  "
+                  f"live games: {len(server.games):5d}  rss: {rss_bytes() / 2 ** 20:7.1f} MiB")
+            last = completed
+
+    await asyncio.gather(report(), *[game_slot(i) for i in range(concurrency)])
+    print(f"total: {completed} games, evicted {server.games.num_evicted}")
+
+
+if __name__ == "__main__":
+    server_log.disable()
+    asyncio.run(run(float(sys.argv[1]) if len(sys.argv) > 1 else 20,
+                    int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+                    int(sys.argv[3]) if len(sys.argv) > 3 else 5,
+                    float(sys.argv[4]) if len(sys.argv) > 4 else 0))
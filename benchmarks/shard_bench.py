@@ -0,0 +1,93 @@
+"""Compare game throughput of the sharded server for increasing numbers of workers
+
+Starts web_server/router.py with each number of workers and loads it from several client processes,
+each playing `concurrency` games back to back for `duration` seconds. Clients need CPU too: on a
+machine with C cores, worker counts up to about C/2 leave room for them.
+
+Usage: python benchmarks/shard_bench.py [max_workers] [duration] [concurrency] [client_processes]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+from sim_client import play_game  # noqa: E402
+
+ROUTER = os.path.join(os.path.dirname(__file__), "..", "web_server", "router.py")
+PORT = 3838
+NUM_PLAYERS = 5
+
+
+async def load(url: str, duration: float, concurrency: int, seed: int) -> int:
+    deadline = time.perf_counter() + duration
+    completed = 0
+
+    async def game_slot(slot: int) -> None:
+        nonlocal completed
+        rng = random.Random(seed * concurrency + slot)
+        while time.perf_counter() < deadline:
+            await play_game(url, NUM_PLAYERS, rng)
+            completed += 1
+
+    await asyncio.gather(*[game_slot(i) for i in range(concurrency)])
+    return completed
+
+
+def client_process(args) -> int:
+    return asyncio.run(load(*args))
+
+
+def wait_for_server(url: str, timeout: float = 10) -> None:
+    from tornado.websocket import websocket_connect
+
+    async def try_connect() -> None:
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                (await websocket_connect(url)).close()
+                return
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+    asyncio.run(try_connect())
+
+
+def games_per_second(num_workers: int, duration: float, concurrency: int, client_processes: int) -> float:
+    env = dict(os.environ, SECRET_HITLER_LOG_LEVEL="WARNING")
+    router = subprocess.Popen([sys.executable, ROUTER, str(num_workers), str(PORT)], cwd=os.path.dirname(ROUTER),
+                              env=env, start_new_session=True)
+    try:
+        url = f"ws://127.0.0.1:{PORT}/ws"
+        wait_for_server(url)
+        with multiprocessing.Pool(client_processes) as pool:
+            completed = sum(pool.map(client_process, [(url, duration, concurrency, i) for i in range(client_processes)]))
+        return completed / duration
+    finally:
+        # the router forks its workers into the same process group
+        os.killpg(router.pid, signal.SIGTERM)
+        router.wait()
+
+
+def main(max_workers: int, duration: float, concurrency: int, client_processes: int):
+    print(f"{os.cpu_count()} cores, {client_processes} client processes x {concurrency} concurrent games")
+    results: List[float] = []
+    num_workers = 1
+    while num_workers <= max_workers:
+        results.append(games_per_second(num_workers, duration, concurrency, client_processes))
+        print(f"{num_workers:3d} workers: {results[-1]:8.1f} games/s  ({results[-1] / results[0]:4.2f}x)")
+        num_workers *= 2
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 20,
+         int(sys.argv[4]) if len(sys.argv) > 4 else 2)
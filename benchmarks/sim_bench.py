@@ -0,0 +1,62 @@
+"""Compare full-game throughput of secret_hitler.sim against the fuzz test loop over Game.perform_action
+
+Usage: python benchmarks/sim_bench.py [num_games] [num_players]
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+from secret_hitler.game import Game
+from secret_hitler.prompts import Prompt
+from secret_hitler.sim import simulate
+from secret_hitler.stages import IllegalActionError
+
+
+def play_fuzz_game(seed: int, num_players: int) -> None:
+    # same driver as tests/secret_hitler/fuzz_test.py (stdout is discarded by the caller)
+    random.seed(seed)
+    game = Game()
+    for i in range(num_players):
+        game.add_player(f"p{i}")
+    prompts: Optional[Dict[str, Prompt]] = game.begin_game()[0]
+    while prompts:
+        print(f"[New Stage] {type(game.stage).__name__}")
+        users = list(prompts.keys())
+        random.shuffle(users)
+        for user in users:
+            choices = list(prompts[user].choices)
+            random.shuffle(choices)
+            for choice in choices:
+                try:
+                    (new_prompts, _) = game.perform_action(prompts[user].method, choice)
+                    print(f"[Action Success] {user}: {prompts[user].method}({choice})")
+                    break
+                except IllegalActionError:
+                    pass
+        prompts = new_prompts
+
+
+def main(num_games: int, num_players: int) -> None:
+    seeds = range(num_games)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in seeds:
+            play_fuzz_game(seed, num_players)
+    fuzz_rate = num_games / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    simulate(seeds, num_players)
+    sim_rate = num_games / (time.perf_counter() - start)
+
+    print(f"fuzz loop: {fuzz_rate:10.0f} games/s")
+    print(f"sim:       {sim_rate:10.0f} games/s  ({sim_rate / fuzz_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
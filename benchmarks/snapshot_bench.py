@@ -0,0 +1,48 @@
+"""Compare Game.snapshot/restore against copy.deepcopy for branching a mid-game state
+
+Usage: python benchmarks/snapshot_bench.py [num_branches]
+"""
+
+import copy
+import random
+import sys
+import time
+
+from secret_hitler.game import Game
+
+
+def mid_game(num_players: int = 7) -> Game:
+    # a seeded game in the middle of a chancellor vote
+    game = Game(random.Random(num_players))
+    for i in range(num_players):
+        game.add_player(f"p{i}")
+    game.begin_game()
+    for _ in range(num_players):
+        game.perform_action("ack_identity", "Got it!")
+    game.perform_action("nominate_chancellor", "p1")
+    game.perform_action("vote_for_chancellor", "ja")
+    return game
+
+
+def main(num_branches: int) -> None:
+    game = mid_game()
+
+    start = time.perf_counter()
+    for _ in range(num_branches):
+        branch = copy.deepcopy(game)
+        branch.perform_action("vote_for_chancellor", "nein")
+    deepcopy_rate = num_branches / (time.perf_counter() - start)
+
+    snapshot = game.snapshot()
+    start = time.perf_counter()
+    for _ in range(num_branches):
+        game.restore(snapshot)
+        game.perform_action("vote_for_chancellor", "nein")
+    snapshot_rate = num_branches / (time.perf_counter() - start)
+
+    print(f"deepcopy:         {deepcopy_rate:10.0f} branches/s")
+    print(f"snapshot/restore: {snapshot_rate:10.0f} branches/s  ({snapshot_rate / deepcopy_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,88 @@
+"""Measure what spectators cost the players of a game
+
+Plays random actions in a game with fake player connections while num_spectators fake spectator
+sockets subscribe to it, and reports the time of the actions themselves (what players wait for), the
+time to deliver each update to every spectator, and the longest the IOLoop is held by a delivery
+between two yields. Real sockets add the cost of writing to them on top of the delivery time.
+
+Usage: python benchmarks/spectator_bench.py [num_actions] [num_spectators...]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import server  # noqa: E402
+import server_log  # noqa: E402
+import spectators  # noqa: E402
+
+from secret_hitler.exceptions import GameError  # noqa: E402
+
+
+class Socket:
+    encoding = "json"
+
+    def write_message(self, frame):
+        return None
+
+
+def fake_connection():
+    # no request behind it, so tornado's initialization is skipped
+    ws = server.WSHandler.__new__(server.WSHandler)
+    ws.game = None
+    ws.player_id = None
+    ws.log = server.ContextAdapter(server.logger, ws)
+    ws.encoding = "json"
+    ws.write_message = lambda frame: None
+    return ws
+
+
+def new_game(num_spectators: int) -> server.GameHandle:
+    handle = server.GameHandle("p0")
+    for i in range(5):
+        handle.add_player(f"p{i}", fake_connection())
+    handle.begin_game()
+    for _ in range(num_spectators):
+        handle.spectators.subscribe(Socket())
+    return handle
+
+
+async def run(num_actions: int, num_spectators: int) -> None:
+    rng = random.Random(0)
+    handle = new_game(num_spectators)
+    (action_time, delivery_time, longest_slice, num_deliveries) = (0.0, 0.0, 0.0, 0)
+    for _ in range(num_actions):
+        if handle.is_over() or not handle.prompts:
+            handle = new_game(num_spectators)
+        player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+        prompt = handle.prompts[player]
+        start = time.perf_counter()
+        try:
+            handle.perform_action(handle.ids[player], prompt.method, rng.choice(prompt.choices))
+        except (GameError, server.RequestError):
+            pass
+        action_time += time.perf_counter() - start
+        # run the delivery, timing every slice of it between two yields to the IOLoop
+        delivering = handle.spectators.delivering
+        start = time.perf_counter()
+        while handle.spectators.delivering:
+            slice_start = time.perf_counter()
+            await asyncio.sleep(0)
+            longest_slice = max(longest_slice, time.perf_counter() - slice_start)
+        if delivering:
+            delivery_time += time.perf_counter() - start
+            num_deliveries += 1
+    print(f"{num_spectators:6d} spectators: {action_time / num_actions * 1e6:7.1f} us/action  "
+          f"{delivery_time / max(1, num_deliveries) * 1e3:7.2f} ms/delivery  "
+          f"longest IOLoop slice {longest_slice * 1e3:6.2f} ms")
+
+
+if __name__ == "__main__":
+    server_log.disable()
+    num_actions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for num_spectators in [int(n) for n in sys.argv[2:]] or [0, 100, 1000, 10000]:
+        spectators.num_spectators = 0
+        asyncio.run(run(num_actions, num_spectators))
@@ -0,0 +1,268 @@
+"""Benchmark suite for the hot paths of the engine and the server, with results saved as JSON
+
+Measures, for every player count in NUM_PLAYERS_TO_BOARD_CONFIG where it applies:
+- full-game throughput of secret_hitler.sim and of Game.perform_action driven by random choices
+  (7+ player games stop at presidential powers that are not implemented yet, counted as finished)
+- Board.extract_updates of the properties changed by a legislative session, and Board.get_full_state
+- RevealIdentities.prompts
+- Stage.perform_action dispatch, next to calling the action handler directly
+- the timer wheel behind turn timers: a tick and re-arming a timer, with many timers pending
+- WebSocket round trips against a server in this process: a request answered with an error, and whole games
+
+Every result is the best of several repeats, so background noise inflates it as little as possible.
+`compare` prints the change of every result between two saved runs, e.g. from two releases.
+
+Usage: python benchmarks/suite.py [output.json] [scale]
+       python benchmarks/suite.py compare <baseline.json> <current.json>
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Optional
+
+import tornado.httpserver
+import tornado.testing
+
+from secret_hitler.board import Board, NUM_PLAYERS_TO_BOARD_CONFIG
+from secret_hitler.exceptions import GameError, UnimplementedFeature
+from secret_hitler.game import Game
+from secret_hitler.prompts import Prompt
+from secret_hitler.sim import simulate
+from secret_hitler.stages import GameOver, IllegalActionError, RevealIdentities
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web_server"))
+import server  # noqa: E402
+import server_log  # noqa: E402
+from sim_client import SimClient, play_game  # noqa: E402
+from timer_wheel import TimerWheel  # noqa: E402
+
+PLAYER_COUNTS = sorted(NUM_PLAYERS_TO_BOARD_CONFIG)
+REPEATS = 5
+# properties changed by a typical legislative session
+SESSION_UPDATES = ["president_idx", "chancellor", "unused_tiles", "discarded_tiles", "liberal_progress",
+                   "election_tracker"]
+
+
+class Results:
+    def __init__(self):
+        self.results: List[Dict] = []
+
+    def add(self, name: str, params: Dict, value: float, unit: str) -> None:
+        self.results.append({"name": name, "params": params, "value": value, "unit": unit})
+        params_str = " ".join(f"{k}={v}" for (k, v) in params.items())
+        print(f"{name:32s} {params_str:24s} {value:14.3f} {unit}")
+
+
+def best_time_per_call(fn: Callable[[], object], scale: float) -> float:
+    """seconds per call of fn, best of REPEATS runs of at least 0.2 * scale seconds"""
+    timer = timeit.Timer(fn)
+    (number, _) = timer.autorange()
+    number = max(1, int(number * scale))
+    return min(timer.repeat(REPEATS, number)) / number
+
+
+def play_random_game(seed: int, num_players: int, max_actions: Optional[int] = None) -> Game:
+    """play a game with random choices until it is over, reaches an unimplemented feature or max_actions"""
+    rng = random.Random(seed)
+    game = Game(random.Random(seed))
+    for i in range(num_players):
+        game.add_player(f"p{i}")
+    prompts: Optional[Dict[str, Prompt]] = game.begin_game()[0]
+    num_actions = 0
+    while prompts and (max_actions is None or num_actions < max_actions):
+        prompt = prompts[rng.choice(sorted(prompts))]
+        choices = list(prompt.choices)
+        rng.shuffle(choices)
+        for choice in choices:
+            try:
+                (new_prompts, _) = game.perform_action(prompt.method, choice)
+            except IllegalActionError:
+                continue
+            except UnimplementedFeature:
+                return game
+            num_actions += 1
+            prompts = new_prompts or prompts
+            break
+        else:
+            return game
+        if type(game.stage) is GameOver:
+            break
+    return game
+
+
+def mid_game_board(num_players: int) -> Board:
+    return play_random_game(0, num_players, max_actions=4 * num_players).board
+
+
+def bench_full_games(results: Results, scale: float) -> None:
+    for num_players in PLAYER_COUNTS:
+        num_games = max(1, int(200 * scale))
+        start = time.perf_counter()
+        simulate(range(num_games), num_players)
+        results.add("sim_full_game", {"players": num_players}, num_games / (time.perf_counter() - start), "games/s")
+    for num_players in PLAYER_COUNTS:
+        num_games = max(1, int(50 * scale))
+        start = time.perf_counter()
+        for seed in range(num_games):
+            play_random_game(seed, num_players)
+        results.add("engine_full_game", {"players": num_players}, num_games / (time.perf_counter() - start),
+                    "games/s")
+
+
+def bench_board(results: Results, scale: float) -> None:
+    for num_players in PLAYER_COUNTS:
+        board = mid_game_board(num_players)
+        results.add("board_extract_updates", {"players": num_players},
+                    best_time_per_call(lambda: board.extract_updates(SESSION_UPDATES), scale) * 1e6, "us")
+        results.add("board_get_full_state", {"players": num_players},
+                    best_time_per_call(board.get_full_state, scale) * 1e6, "us")
+
+
+def bench_prompts(results: Results, scale: float) -> None:
+    for num_players in PLAYER_COUNTS:
+        game = play_random_game(0, num_players, max_actions=0)
+        stage = game.stage
+        assert type(stage) is RevealIdentities
+        results.add("reveal_identities_prompts", {"players": num_players},
+                    best_time_per_call(stage.prompts, scale) * 1e6, "us")
+
+
+def bench_dispatch(results: Results, scale: float) -> None:
+    # acks of all but the last player leave RevealIdentities in place
+    game = play_random_game(0, 10, max_actions=0)
+    stage = game.stage
+    assert type(stage) is RevealIdentities
+    num_acks = len(game.board.players) - 1
+
+    def dispatched():
+        stage.num_identity_acks = 0
+        for _ in range(num_acks):
+            stage.perform_action("ack_identity", "Got it!")
+
+    def direct():
+        stage.num_identity_acks = 0
+        for _ in range(num_acks):
+            stage.ack_identity("Got it!")
+
+    def unknown_action():
+        try:
+            stage.perform_action("no_such_action", "Got it!")
+        except GameError:
+            pass
+
+    results.add("stage_perform_action", {}, best_time_per_call(dispatched, scale) / num_acks * 1e9, "ns")
+    results.add("stage_action_direct_call", {}, best_time_per_call(direct, scale) / num_acks * 1e9, "ns")
+    results.add("stage_perform_unknown_action", {}, best_time_per_call(unknown_action, scale) * 1e9, "ns")
+
+
+def bench_timers(results: Results, scale: float) -> None:
+    for num_timers in (1000, 100000):
+        clock = [0.0]
+        wheel = TimerWheel(server.TIMER_TICK, clock=lambda: clock[0])
+        rng = random.Random(0)
+        # pending turn timers, far enough out not to fire while measuring
+        pending = [wheel.schedule(rng.uniform(3600, 7200), lambda: None) for _ in range(num_timers)]
+
+        def tick():
+            clock[0] += server.TIMER_TICK
+            wheel.advance()
+
+        def rearm():
+            i = rng.randrange(num_timers)
+            wheel.cancel(pending[i])
+            pending[i] = wheel.schedule(60, pending[i].callback)
+
+        results.add("timer_wheel_tick", {"timers": num_timers}, best_time_per_call(tick, scale) * 1e9, "ns")
+        results.add("timer_wheel_rearm", {"timers": num_timers}, best_time_per_call(rearm, scale) * 1e9, "ns")
+
+
+async def bench_websocket(results: Results, scale: float) -> None:
+    server.games.game_over_ttl = 0
+    (sock, port) = tornado.testing.bind_unused_port()
+    http_server = tornado.httpserver.HTTPServer(server.application)
+    http_server.add_sockets([sock])
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    client = SimClient(url, "probe", random.Random(0))
+    await client.connect()
+    latencies = []
+    for _ in range(max(10, int(2000 * scale))):
+        start = time.perf_counter()
+        client.send({"type": "join_game", "game_id": "missing", "player_name": "probe"})
+        await client.receive_until("error")
+        latencies.append(time.perf_counter() - start)
+    client.close()
+    latencies.sort()
+    results.add("ws_round_trip_p50", {}, latencies[len(latencies) // 2] * 1e6, "us")
+    results.add("ws_round_trip_p99", {}, latencies[int(len(latencies) * 0.99)] * 1e6, "us")
+
+    rng = random.Random(0)
+    num_games = max(1, int(20 * scale))
+    start = time.perf_counter()
+    for _ in range(num_games):
+        await play_game(url, 5, rng)
+    results.add("ws_full_game", {"players": 5}, num_games / (time.perf_counter() - start), "games/s")
+    http_server.stop()
+    server.games.games.clear()
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(output: str, scale: float) -> None:
+    server_log.disable()
+    results = Results()
+    bench_full_games(results, scale)
+    bench_board(results, scale)
+    bench_prompts(results, scale)
+    bench_dispatch(results, scale)
+    bench_timers(results, scale)
+    asyncio.run(bench_websocket(results, scale))
+    with open(output, "w") as f:
+        json.dump({"metadata": metadata(), "scale": scale, "results": results.results}, f, indent=2)
+    print(f"results written to {output}")
+
+
+def compare(baseline_path: str, current_path: str) -> None:
+    """print current results relative to baseline. Throughputs (/s) are better higher, times lower"""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+    for result in current:
+        old = baseline.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None or not old["value"]:
+            continue
+        change = result["value"] / old["value"] - 1
+        better = change > 0 if result["unit"].endswith("/s") else change < 0
+        params_str = " ".join(f"{k}={v}" for (k, v) in result["params"].items())
+        print(f"{result['name']:32s} {params_str:24s} {old['value']:12.3f} -> {result['value']:12.3f} "
+              f"{result['unit']:8s} {change:+7.1%} {'better' if better else 'worse'}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        compare(sys.argv[2], sys.argv[3])
+    else:
+        run(sys.argv[1] if len(sys.argv) > 1 else "benchmark_results.json",
+            float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
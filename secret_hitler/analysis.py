@@ -0,0 +1,76 @@
+"""secret_hitler.analysis
+
+Exact probabilities of upcoming policy tiles, computed from the tile counts of a board.
+Only the number of each kind of unused and discarded tile is used, i.e. what a spectator knows.
+Results are memoized on the tile counts, so repeated queries are cheap.
+"""
+
+from functools import lru_cache
+from math import comb
+from typing import Dict, List, Tuple
+
+from secret_hitler.board import Board, Tile, LIBERAL_WINNING_PROGRESS, FASCIST_WINNING_PROGRESS
+from secret_hitler.exceptions import UnreachableStateError
+
+# (unused liberal, unused fascist, discarded liberal, discarded fascist)
+TileCounts = Tuple[int, int, int, int]
+
+
+def tile_counts(board: Board) -> TileCounts:
+    unused_fascist = board.unused_tiles.count(Tile.FASCIST_POLICY)
+    discarded_fascist = board.discarded_tiles.count(Tile.FASCIST_POLICY)
+    return (len(board.unused_tiles) - unused_fascist, unused_fascist,
+            len(board.discarded_tiles) - discarded_fascist, discarded_fascist)
+
+
+def hypergeometric(num_liberal: int, num_fascist: int, num_drawn: int) -> List[float]:
+    """chance of drawing k fascist tiles, for each k in 0..num_drawn"""
+    total = comb(num_liberal + num_fascist, num_drawn)
+    return [comb(num_fascist, k) * comb(num_liberal, num_drawn - k) / total for k in range(num_drawn + 1)]
+
+
+@lru_cache(maxsize=4096)
+def draw_distribution(counts: TileCounts) -> Tuple[float, float, float, float]:
+    """chance that the next three drawn tiles hold 0, 1, 2 or 3 fascist tiles"""
+    (unused_liberal, unused_fascist, discarded_liberal, discarded_fascist) = counts
+    num_unused = unused_liberal + unused_fascist
+    if num_unused >= 3:
+        distribution = hypergeometric(unused_liberal, unused_fascist, 3)
+        return (distribution[0], distribution[1], distribution[2], distribution[3])
+
+    # draw_three_tiles recycles first: every unused tile is drawn, the rest comes from the shuffled discards
+    if num_unused + discarded_liberal + discarded_fascist < 3:
+        raise UnreachableStateError(f"Not enough tiles left to draw: {counts}")
+    distribution = [0.0] * 4
+    for (k, p) in enumerate(hypergeometric(discarded_liberal, discarded_fascist, 3 - num_unused)):
+        distribution[unused_fascist + k] += p
+    return (distribution[0], distribution[1], distribution[2], distribution[3])
+
+
+@lru_cache(maxsize=4096)
+def chaos_distribution(counts: TileCounts) -> Tuple[float, float]:
+    """chance that the tile enacted by chaos is liberal or fascist"""
+    (unused_liberal, unused_fascist, discarded_liberal, discarded_fascist) = counts
+    if unused_liberal + unused_fascist == 0:
+        # enter_chaos recycles first
+        (unused_liberal, unused_fascist) = (discarded_liberal, discarded_fascist)
+    total = unused_liberal + unused_fascist
+    if total == 0:
+        raise UnreachableStateError(f"No tiles left to enact: {counts}")
+    return (unused_liberal / total, unused_fascist / total)
+
+
+def get_statistics(board: Board) -> Dict:
+    """deck statistics of board, e.g. for a spectator overlay"""
+    counts = tile_counts(board)
+    (chaos_liberal, chaos_fascist) = chaos_distribution(counts)
+    chaos_win = 0.0
+    if board.liberal_progress == LIBERAL_WINNING_PROGRESS - 1:
+        chaos_win += chaos_liberal
+    if board.fascist_progress == FASCIST_WINNING_PROGRESS - 1:
+        chaos_win += chaos_fascist
+    return {
+        "draw_fascist_count": list(draw_distribution(counts)),
+        "chaos_fascist": chaos_fascist,
+        "chaos_win": chaos_win,
+    }
@@ -5,8 +5,9 @@ Also keeps track of changes to the game state for partially updating game client
 """
 
 from enum import Enum
+import logging
 import random
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from secret_hitler.exceptions import GameError, UnreachableStateError
 from secret_hitler.player import Player, Identity
@@ -146,15 +147,32 @@ FASCIST_WINNING_PROGRESS = 6
 # Main board class
 
 
+class BoardSnapshot:
+    """Board properties and PRNG state captured by Board.snapshot. Player objects are shared with the board."""
+    __slots__ = ("state", "rng_state")
+
+    def __init__(self, state: Dict, rng_state: Tuple):
+        self.state: Dict = state
+        self.rng_state: Tuple = rng_state
+
+
 class Board:
-    def __init__(self):
+    logger: logging.Logger = logging.getLogger(__name__)
+
+    def __init__(self, rng=None):
+        # every shuffle of this board draws from its own PRNG (random.Random).
+        # If none is given, it is seeded from the module-level PRNG.
+        self.rng: random.Random = rng if rng is not None else random.Random(random.getrandbits(64))
         self.players: List[Player] = []  # active players only
         self.eliminated_players: List[Player] = []
+        self.player_index: Dict[str, int] = dict()  # player name -> index in players
+        self.all_players: Dict[str, Player] = dict()  # player name -> player, including eliminated players
+        self.player_names: Optional[Tuple[str, ...]] = None  # names of players, see get_player_names
         self.president_idx: int = 0
-        self.chancellor: Player = None
+        self.chancellor: Optional[Player] = None
         self.prev_president: Optional[Player] = None
         self.prev_chancellor: Optional[Player] = None
-        self.nominated_chancellor: Player = None
+        self.nominated_chancellor: Optional[Player] = None
         self.unused_tiles: List[Tile] = [Tile.LIBERAL_POLICY] * 6 + [Tile.FASCIST_POLICY] * 11
         self.discarded_tiles: List[Tile] = []
         self.election_tracker: int = 0
@@ -164,8 +182,10 @@ class Board:
 
         # keeps track of updated properties
         self.updates = set()
+        # property -> its public value, as of its last update (see extract_updates)
+        self.public_state: Dict[str, Any] = dict()
 
-        random.shuffle(self.unused_tiles)
+        self.rng.shuffle(self.unused_tiles)
 
     # State update tracking
     private_state_translations = {
@@ -181,23 +201,32 @@ class Board:
         "fascist_powers": (lambda me, l: [p.description() if p else "" for p in l]),
     }
 
+    # property -> (public name, translation or None to publish the value as is)
+    public_projections = {prop: (translation if type(translation) is tuple else (prop, translation))
+                          for (prop, translation) in private_state_translations.items()}
+
     def register_update(self, prop):
         self.updates.add(prop)
+        # public values are translated again only once their property changed
+        self.public_state.pop(prop, None)
+        if prop == "players":
+            # the president is looked up by index in players
+            self.public_state.pop("president_idx", None)
 
     def extract_updates(self, custom_updates=None):
         new_updates = custom_updates or self.updates
         response = dict()
+        public_state = self.public_state
         for prop in new_updates:
-            if prop not in Board.private_state_translations:
+            projection = Board.public_projections.get(prop)
+            if projection is None:
                 continue
-
-            elif Board.private_state_translations[prop] is None:
-                response[prop] = getattr(self, prop)
-            elif type(Board.private_state_translations[prop]) is not tuple:
-                response[prop] = Board.private_state_translations[prop](self, getattr(self, prop))
+            (alias, transformer) = projection
+            if prop in public_state:
+                response[alias] = public_state[prop]
             else:
-                (alias, transformer) = Board.private_state_translations[prop]
-                response[alias] = transformer(self, getattr(self, prop))
+                value = getattr(self, prop)
+                response[alias] = public_state[prop] = value if transformer is None else transformer(self, value)
 
         self.updates = set()
         return response
@@ -205,18 +234,61 @@ class Board:
     def get_full_state(self):
         return self.extract_updates(Board.private_state_translations.keys())
 
+    # Snapshots
+    # properties holding containers that are mutated in place
+    mutable_state = ("players", "eliminated_players", "player_index", "all_players",
+                     "unused_tiles", "discarded_tiles", "updates", "public_state")
+
+    def snapshot(self) -> "BoardSnapshot":
+        state = self.__dict__.copy()
+        for prop in Board.mutable_state:
+            state[prop] = state[prop].copy()
+        return BoardSnapshot(state, self.rng.getstate())
+
+    def restore(self, snapshot: "BoardSnapshot") -> None:
+        """return to the state captured by snapshot. The snapshot can be restored again later."""
+        self.__dict__.clear()
+        self.__dict__.update(snapshot.state)
+        for prop in Board.mutable_state:
+            setattr(self, prop, snapshot.state[prop].copy())
+        self.rng.setstate(snapshot.rng_state)
+
     # Player manipulation
     def add_player(self, name: str) -> None:
         self.register_update("players")
-        if any(p.name == name for p in self.players):
+        if name in self.player_index:
             raise DuplicatePlayerNameError(name)
-        self.players.append(Player(name))
+        player = Player(name)
+        self.player_index[name] = len(self.players)
+        self.all_players[name] = player
+        self.players.append(player)
+        self.player_names = None
+
+    def get_player_names(self) -> Tuple[str, ...]:
+        """names of the live players in order, the same tuple until players change so that prompts can share it"""
+        if self.player_names is None:
+            self.player_names = tuple(p.name for p in self.players)
+        return self.player_names
 
     def get_player(self, name: str) -> Player:
-        for p in self.players:
-            if p.name == name:
-                return p
-        raise NonexistentPlayerNameError(name)
+        """returns the live player called name"""
+        idx = self.player_index.get(name)
+        if idx is None:
+            raise NonexistentPlayerNameError(name)
+        return self.players[idx]
+
+    def lookup_player(self, name: str) -> Player:
+        """returns the player called name, who may have been eliminated"""
+        player = self.all_players.get(name)
+        if player is None:
+            raise NonexistentPlayerNameError(name)
+        return player
+
+    def index_players(self) -> None:
+        """rebuild the player indices after players or eliminated_players were replaced"""
+        self.player_index = {p.name: i for (i, p) in enumerate(self.players)}
+        self.all_players = {p.name: p for p in self.players + self.eliminated_players}
+        self.player_names = None
 
     def begin_game(self) -> None:
         self.register_update("players")
@@ -228,7 +300,7 @@ class Board:
         identities = ([Identity.LIBERAL] * board_config[0]
                       + [Identity.FASCIST] * board_config[1]
                       + [Identity.HITLER])
-        random.shuffle(identities)
+        self.rng.shuffle(identities)
 
         for i in range(len(self.players)):
             self.players[i].identity = identities[i]
@@ -252,7 +324,7 @@ class Board:
 
     def enact_policy(self, policy: Tile) -> None:
         # the enacted tile is destroyed (does not put back into any tile list)
-        print("enacting policy: " + policy.value)
+        self.logger.debug("enacting policy: %s", policy.value)
         if policy == Tile.LIBERAL_POLICY:
             self.liberal_progress += 1
             self.register_update("liberal_progress")
@@ -266,7 +338,7 @@ class Board:
 
     def recycle_used_tiles(self) -> None:
         # shuffle discarded tiles and put under unused tiles
-        random.shuffle(self.discarded_tiles)
+        self.rng.shuffle(self.discarded_tiles)
         self.unused_tiles += self.discarded_tiles
         self.discarded_tiles = []
         self.register_update("unused_tiles")
@@ -277,7 +349,7 @@ class Board:
             self.recycle_used_tiles()
 
         drawn_tiles = self.unused_tiles[:3]
-        self.unused_tiles = self.unused_tiles[3:]
+        del self.unused_tiles[:3]
         self.register_update("unused_tiles")
         return drawn_tiles
 
@@ -297,8 +369,7 @@ class Board:
         # enact the top unused tile
         if len(self.unused_tiles) < 1:
             self.recycle_used_tiles()
-        selected_policy = self.unused_tiles[0]
-        self.unused_tiles = self.unused_tiles[1:]
+        selected_policy = self.unused_tiles.pop(0)
         self.register_update("unused_tiles")
         self.enact_policy(selected_policy)
         # reset election tracker and term limits
@@ -315,7 +386,7 @@ class Board:
             self.winner = Faction.LIBERAL
             self.register_update("winner")
         elif self.fascist_progress == FASCIST_WINNING_PROGRESS:
-            self.winner = Faction.LIBERAL
+            self.winner = Faction.FASCIST
             self.register_update("winner")
         return self.winner
 
@@ -331,16 +402,10 @@ class Board:
 
     # have to be done at the same time due to weird president_idx logic
     def execute_player_and_advance_president(self, player_name: str) -> None:
-        unlucky_person = None
-        unlucky_idx = 0
-        for player in self.players:
-            if player.name == player_name:
-                unlucky_person = player
-                break
-            unlucky_idx += 1
-
-        if unlucky_person is None:
+        unlucky_idx = self.player_index.get(player_name)
+        if unlucky_idx is None:
             raise UnreachableStateError("Cannot execute non-live player: " + player_name)
+        unlucky_person = self.players[unlucky_idx]
 
         # save prev president and chancellor
         self.register_update("president_idx")
@@ -356,8 +421,9 @@ class Board:
         next_president_idx = next_president_idx % (len(self.players) - 1)
 
         # actually eliminate the unlucky person
-        self.players.remove(unlucky_person)
+        del self.players[unlucky_idx]
         self.eliminated_players.append(unlucky_person)
+        self.index_players()
         self.register_update("players")
         self.register_update("eliminated_players")
 
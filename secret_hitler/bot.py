@@ -0,0 +1,232 @@
+"""secret_hitler.bot
+
+Computer players. MCTSBot picks among a Prompt's choices with information-set Monte Carlo tree search:
+every iteration deals the identities the bot cannot see and the order of the unused tiles at random,
+then plays the game forward through the stages with random rollouts.
+"""
+
+import math
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from secret_hitler import stages
+from secret_hitler.board import Board, Faction
+from secret_hitler.compact import CompactState
+from secret_hitler.exceptions import GameError, UnreachableStateError
+from secret_hitler.game import Game
+from secret_hitler.player import Identity, Player
+from secret_hitler.prompts import Prompt
+from secret_hitler.sim import NoLegalChoiceError, PENDING_ACTIONS, SimBoard
+
+LIBERAL = 0
+FASCIST = 1
+DRAW = (0.5, 0.5)
+
+
+def faction_of(player: Player) -> int:
+    return LIBERAL if player.identity == Identity.LIBERAL else FASCIST
+
+
+class SearchStats(NamedTuple):
+    iterations: int
+    seconds: float
+
+    @property
+    def rollouts_per_second(self) -> float:
+        return self.iterations / self.seconds if self.seconds > 0 else 0.0
+
+
+class Node:
+    """Information set of the searching player: reached by a sequence of choices from the root"""
+    __slots__ = ("children", "visits", "availability", "rewards", "illegal")
+
+    def __init__(self):
+        self.children: Dict[str, Node] = dict()
+        self.visits: int = 0
+        self.availability: int = 0          # number of times this node's choice was legal when its parent was visited
+        self.rewards: List[float] = [0.0, 0.0]
+        self.illegal: bool = False          # choice rejected by the stage rules (does not depend on hidden state)
+
+    def ucb(self, faction: int, exploration: float) -> float:
+        if self.visits == 0:
+            return math.inf
+        return (self.rewards[faction] / self.visits
+                + exploration * math.sqrt(math.log(self.availability) / self.visits))
+
+
+class Position:
+    """One determinized game being played forward during an iteration"""
+    def __init__(self, board: Board, stage: stages.Stage, first_actor: Optional[str] = None):
+        self.board: Board = board
+        self.stage: stages.Stage = stage
+        self.actors: List[Player] = []
+        self.action: str = ""
+        self.choices: Sequence[str] = ()
+        self.load_pending_actions(first_actor)
+
+    def load_pending_actions(self, first_actor: Optional[str] = None) -> None:
+        if type(self.stage) is stages.GameOver:
+            self.actors = []
+            return
+        (actors, self.action, self.choices) = PENDING_ACTIONS[type(self.stage)](self.stage)
+        # players that already acted in a stage waiting on everyone are not tracked by name, only counted
+        if type(self.stage) is stages.ChancellorNominated:
+            num_done = len(self.stage.votes)
+        elif type(self.stage) is stages.RevealIdentities:
+            num_done = self.stage.num_identity_acks
+        else:
+            num_done = 0
+        actors = list(actors)
+        if first_actor is not None:
+            actors.sort(key=lambda p: p.name != first_actor)
+        self.actors = actors[:len(actors) - num_done]
+
+    def is_over(self) -> bool:
+        return not self.actors
+
+    def actor(self) -> Player:
+        return self.actors[0]
+
+    def play(self, choice: str) -> None:
+        """raises IllegalActionError if choice is not allowed"""
+        next_stage = self.stage.perform_action(self.action, choice)
+        if next_stage is self.stage:
+            self.actors.pop(0)
+        else:
+            self.stage = next_stage
+            self.load_pending_actions()
+
+    def play_random(self, rng: random.Random) -> None:
+        remaining = self.choices
+        while remaining:
+            choice = remaining[int(rng.random() * len(remaining))]
+            try:
+                return self.play(choice)
+            except stages.IllegalActionError:
+                remaining = [c for c in remaining if c != choice]
+        raise NoLegalChoiceError(self.action)
+
+    def rewards(self) -> Tuple[float, float]:
+        winner = getattr(self.board, "winner", None)
+        if winner == Faction.LIBERAL:
+            return (1.0, 0.0)
+        elif winner == Faction.FASCIST:
+            return (0.0, 1.0)
+        return DRAW
+
+
+class MCTSBot:
+    """Chooses actions for the player called name.
+    Searches until either max_iterations iterations are done or time_budget seconds have passed.
+    """
+    def __init__(self, name: str, time_budget: float = 0.15, max_iterations: Optional[int] = None,
+                 exploration: float = 0.7, seed: Optional[int] = None):
+        self.name: str = name
+        self.time_budget: float = time_budget
+        self.max_iterations: Optional[int] = max_iterations
+        self.exploration: float = exploration
+        self.rng: random.Random = random.Random(seed)
+        self.last_search: SearchStats = SearchStats(0, 0.0)
+
+    def act(self, game: Game, prompt: Prompt):
+        """choose and perform the action for prompt. Returns the result of game.perform_action"""
+        return game.perform_action(prompt.method, self.choose(game, prompt))
+
+    def choose(self, game: Game, prompt: Prompt) -> str:
+        if len(set(prompt.choices)) == 1:
+            self.last_search = SearchStats(0, 0.0)
+            return prompt.choices[0]
+        stage = game.requires_game_started("choose an action")
+        return self.search(CompactState.from_board(game.board, stage), prompt.choices)
+
+    def search(self, state: CompactState, choices: Sequence[str]) -> str:
+        """choose among choices for the pending action of state, which must be this bot's"""
+        me = state.seats.index(self.name)
+        root = Node()
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        iterations = 0
+        while iterations != self.max_iterations and (self.max_iterations is not None or time.perf_counter() < deadline):
+            self.iterate(root, self.determinize(state, me))
+            iterations += 1
+        self.last_search = SearchStats(iterations, time.perf_counter() - start)
+
+        legal = {choice: child for (choice, child) in root.children.items() if not child.illegal}
+        if not legal:
+            return choices[0]
+        return max(legal, key=lambda choice: legal[choice].visits)
+
+    def determinize(self, state: CompactState, me: int) -> CompactState:
+        """a copy of state with everything hidden from the bot dealt at random"""
+        state = state.copy()
+        num_fascists = bin(state.fascist_mask).count("1")
+        my_identity = (Identity.HITLER if me == state.hitler_seat
+                       else Identity.FASCIST if state.fascist_mask & (1 << me) else Identity.LIBERAL)
+        # fascists know every identity, so does Hitler when playing with a single fascist
+        knows_all = my_identity == Identity.FASCIST or (my_identity == Identity.HITLER and num_fascists == 1)
+        if not knows_all:
+            others = [i for i in range(len(state.seats)) if i != me]
+            self.rng.shuffle(others)
+            if my_identity == Identity.LIBERAL:
+                state.hitler_seat = others.pop()
+            state.fascist_mask = 0
+            for seat in others[:num_fascists]:
+                state.fascist_mask |= 1 << seat
+        unused = bytearray(state.unused_tiles)
+        self.rng.shuffle(unused)
+        state.unused_tiles = bytes(unused)
+        return state
+
+    def iterate(self, root: Node, state: CompactState) -> None:
+        board = state.to_board(self.rng, SimBoard)
+        stage = state.to_stage(board)
+        if stage is None:
+            raise UnreachableStateError("Cannot search a game that has not begun")
+        path = [root]
+        node = root
+        try:
+            position = Position(board, stage, self.name)
+            # selection and expansion
+            while not position.is_over():
+                (node, expanded) = self.descend(node, position, faction_of(position.actor()))
+                path.append(node)
+                if expanded:
+                    break
+            # rollout
+            while not position.is_over():
+                position.play_random(self.rng)
+            rewards = position.rewards()
+        except GameError:
+            # e.g. presidential powers that are not implemented yet
+            rewards = DRAW
+
+        for visited in path:
+            visited.visits += 1
+            visited.rewards[LIBERAL] += rewards[LIBERAL]
+            visited.rewards[FASCIST] += rewards[FASCIST]
+
+    def descend(self, node: Node, position: Position, faction: int) -> Tuple[Node, bool]:
+        """play one choice in position, returns the child node and whether it was newly expanded"""
+        available = [c for c in dict.fromkeys(position.choices)
+                     if c not in node.children or not node.children[c].illegal]
+        for choice in available:
+            if choice in node.children:
+                node.children[choice].availability += 1
+        untried = [c for c in available if c not in node.children]
+        while untried:
+            choice = untried.pop(int(self.rng.random() * len(untried)))
+            child = node.children[choice] = Node()
+            child.availability = 1
+            try:
+                position.play(choice)
+                return (child, True)
+            except stages.IllegalActionError:
+                child.illegal = True
+        if all(node.children[c].illegal for c in available):
+            raise NoLegalChoiceError(position.action)
+        best = max((node.children[c] for c in available if not node.children[c].illegal),
+                   key=lambda child: child.ucb(faction, self.exploration))
+        choice = next(c for c in available if node.children[c] is best)
+        position.play(choice)
+        return (best, False)
@@ -0,0 +1,212 @@
+"""secret_hitler.compact
+
+Compact representation of a game state (board and current stage) for holding large numbers of
+mid-game states, e.g. during search. Tiles are stored as bytes, players as seat indices and
+identities as bitmasks. States are converted back to a Board and Stage to continue playing.
+"""
+
+import random
+from typing import List, Optional, Tuple, Type
+
+from secret_hitler import stages
+from secret_hitler.board import Board, Faction, NUM_PLAYERS_TO_BOARD_CONFIG, PresidentialPower, Tile, Vote
+from secret_hitler.exceptions import UnreachableStateError
+from secret_hitler.player import Identity, Player
+
+NO_SEAT = 255
+
+TILES: Tuple[Tile, ...] = (Tile.LIBERAL_POLICY, Tile.FASCIST_POLICY)
+TILE_CODES = {tile: code for (code, tile) in enumerate(TILES)}
+
+WINNERS: Tuple[Optional[Faction], ...] = (None, Faction.LIBERAL, Faction.FASCIST)
+WINNER_CODES = {winner: code for (code, winner) in enumerate(WINNERS)}
+
+VOTES: Tuple[Vote, ...] = (Vote.NEIN, Vote.JA)
+VOTE_CODES = {vote: code for (code, vote) in enumerate(VOTES)}
+
+POWERS: Tuple[PresidentialPower, ...] = tuple(PresidentialPower)
+
+# stage classes are referred to by their index in Stage.all_stages
+STAGE_CODES = {cls: code for (code, cls) in enumerate(stages.Stage.all_stages)}
+
+
+def encode_tiles(tiles: List[Tile]) -> bytes:
+    return bytes(TILE_CODES[t] for t in tiles)
+
+
+def decode_tiles(data: bytes) -> List[Tile]:
+    return [TILES[code] for code in data]
+
+
+class CompactState:
+    """Packed board state, plus the state of the current stage if there is one.
+
+    Seats are the active players in turn order, followed by the eliminated players in order of elimination.
+    Seat-valued fields hold NO_SEAT when unset.
+    """
+    __slots__ = ("seats", "num_active", "fascist_mask", "hitler_seat",
+                 "president_idx", "chancellor", "prev_president", "prev_chancellor", "nominated_chancellor",
+                 "unused_tiles", "discarded_tiles",
+                 "election_tracker", "liberal_progress", "fascist_progress", "winner",
+                 "stage", "stage_data")
+
+    def __init__(self):
+        self.seats: Tuple[str, ...] = ()
+        self.num_active: int = 0
+        self.fascist_mask: int = 0              # bit i is set if seat i is a (non-Hitler) fascist
+        self.hitler_seat: int = NO_SEAT         # NO_SEAT until identities are dealt
+        self.president_idx: int = 0
+        self.chancellor: int = NO_SEAT
+        self.prev_president: int = NO_SEAT
+        self.prev_chancellor: int = NO_SEAT
+        self.nominated_chancellor: int = NO_SEAT
+        self.unused_tiles: bytes = b""
+        self.discarded_tiles: bytes = b""
+        self.election_tracker: int = 0
+        self.liberal_progress: int = 0
+        self.fascist_progress: int = 0
+        self.winner: int = 0                    # index into WINNERS
+        self.stage: int = NO_SEAT               # index into Stage.all_stages
+        self.stage_data: bytes = b""
+
+    def __eq__(self, other):
+        return (isinstance(other, CompactState)
+                and all(getattr(self, slot) == getattr(other, slot) for slot in CompactState.__slots__))
+
+    def pack(self) -> Tuple:
+        """the state as a tuple of plain values, in the order of __slots__, e.g. to persist it.
+        Changing the slots or the stage data changes this layout, which game log snapshots rely on
+        (see SNAPSHOT_VERSION in web_server/game_log.py).
+        """
+        return tuple(getattr(self, slot) for slot in CompactState.__slots__)
+
+    @staticmethod
+    def unpack(values: Tuple) -> "CompactState":
+        """inverse of pack"""
+        state = CompactState.__new__(CompactState)
+        for (slot, value) in zip(CompactState.__slots__, values):
+            setattr(state, slot, value)
+        return state
+
+    def copy(self) -> "CompactState":
+        clone = CompactState.__new__(CompactState)
+        for slot in CompactState.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        return clone
+
+    # Board conversion
+    @staticmethod
+    def from_board(board: Board, stage: Optional[stages.Stage] = None) -> "CompactState":
+        state = CompactState()
+        players = board.players + board.eliminated_players
+        state.seats = tuple(p.name for p in players)
+        state.num_active = len(board.players)
+        seat_of = {p.name: i for (i, p) in enumerate(players)}
+
+        def seat(player: Optional[Player]) -> int:
+            return NO_SEAT if player is None else seat_of[player.name]
+
+        for (i, p) in enumerate(players):
+            if p.identity == Identity.FASCIST:
+                state.fascist_mask |= 1 << i
+            elif p.identity == Identity.HITLER:
+                state.hitler_seat = i
+        state.president_idx = board.president_idx
+        state.chancellor = seat(board.chancellor)
+        state.prev_president = seat(board.prev_president)
+        state.prev_chancellor = seat(board.prev_chancellor)
+        state.nominated_chancellor = seat(board.nominated_chancellor)
+        state.unused_tiles = encode_tiles(board.unused_tiles)
+        state.discarded_tiles = encode_tiles(board.discarded_tiles)
+        state.election_tracker = board.election_tracker
+        state.liberal_progress = board.liberal_progress
+        state.fascist_progress = board.fascist_progress
+        state.winner = WINNER_CODES[getattr(board, "winner", None)]
+        if stage is not None:
+            state.stage = STAGE_CODES[type(stage)]
+            state.stage_data = encode_stage_data(stage, seat)
+        return state
+
+    def to_board(self, rng=None, board_type: Type[Board] = Board) -> Board:
+        """returns a new board_type (Board or a subclass) in this state. Update tracking starts out empty."""
+        # bypass __init__, which would shuffle a fresh deck using rng
+        board = board_type.__new__(board_type)
+        board.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        board.updates = set()
+        board.public_state = dict()
+        board.fascist_powers = []
+        players = [Player(name) for name in self.seats]
+        if self.hitler_seat != NO_SEAT:
+            for (i, p) in enumerate(players):
+                if i == self.hitler_seat:
+                    p.identity = Identity.HITLER
+                elif self.fascist_mask & (1 << i):
+                    p.identity = Identity.FASCIST
+                else:
+                    p.identity = Identity.LIBERAL
+            board.fascist_powers = NUM_PLAYERS_TO_BOARD_CONFIG[len(players)][2]
+
+        def player(seat: int) -> Optional[Player]:
+            return None if seat == NO_SEAT else players[seat]
+
+        board.players = players[:self.num_active]
+        board.eliminated_players = players[self.num_active:]
+        board.index_players()
+        board.president_idx = self.president_idx
+        board.chancellor = player(self.chancellor)
+        board.prev_president = player(self.prev_president)
+        board.prev_chancellor = player(self.prev_chancellor)
+        board.nominated_chancellor = player(self.nominated_chancellor)
+        board.unused_tiles = decode_tiles(self.unused_tiles)
+        board.discarded_tiles = decode_tiles(self.discarded_tiles)
+        board.election_tracker = self.election_tracker
+        board.liberal_progress = self.liberal_progress
+        board.fascist_progress = self.fascist_progress
+        if self.winner:
+            board.winner = WINNERS[self.winner]
+        return board
+
+    def to_stage(self, board: Board) -> Optional[stages.Stage]:
+        """returns the packed stage, acting on board (which should come from to_board)"""
+        if self.stage == NO_SEAT:
+            return None
+        cls = stages.Stage.all_stages[self.stage]
+        # bypass __init__, which may mutate the board (e.g. advance the president or draw tiles)
+        stage = cls.__new__(cls)
+        stages.Stage.__init__(stage, board)
+        decode_stage_data(stage, self.stage_data, board.players + board.eliminated_players)
+        return stage
+
+
+# Stage conversion
+def encode_stage_data(stage: stages.Stage, seat) -> bytes:
+    if isinstance(stage, stages.RevealIdentities):
+        return bytes([stage.num_identity_acks])
+    elif isinstance(stage, stages.ChancellorNominated):
+        return bytes([seat(stage.nominee)]) + bytes(VOTE_CODES[v] for v in stage.votes)
+    elif isinstance(stage, stages.PresidentDecidesLegislation):
+        return encode_tiles(stage.drawn_tiles)
+    elif isinstance(stage, stages.ChancellorDecidesLegislation):
+        return encode_tiles(stage.remaining_tiles)
+    elif isinstance(stage, stages.PerformPresidentialPower):
+        return bytes([POWERS.index(stage.power)])
+    elif isinstance(stage, (stages.NewPresident, stages.GameOver)):
+        return b""
+    raise UnreachableStateError("Cannot encode stage: " + type(stage).__name__)
+
+
+def decode_stage_data(stage: stages.Stage, data: bytes, seats: List[Player]) -> None:
+    if isinstance(stage, stages.RevealIdentities):
+        stage.num_identity_acks = data[0]
+    elif isinstance(stage, stages.ChancellorNominated):
+        stage.nominee = seats[data[0]]
+        stage.votes = [VOTES[code] for code in data[1:]]
+        stage.num_ja = stage.votes.count(Vote.JA)
+    elif isinstance(stage, stages.PresidentDecidesLegislation):
+        stage.drawn_tiles = decode_tiles(data)
+    elif isinstance(stage, stages.ChancellorDecidesLegislation):
+        stage.remaining_tiles = decode_tiles(data)
+    elif isinstance(stage, stages.PerformPresidentialPower):
+        stage.power = POWERS[data[0]]
+    elif not isinstance(stage, (stages.NewPresident, stages.GameOver)):
+        raise UnreachableStateError("Cannot decode stage: " + type(stage).__name__)
@@ -2,22 +2,32 @@
 
 Main game handle. Provides an external interface for the game.
 """
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Sequence, Tuple
 
 from secret_hitler import stages
-from secret_hitler.board import Board
+from secret_hitler.board import Board, BoardSnapshot
 from secret_hitler.exceptions import GameError
 from secret_hitler.prompts import Prompt
 
 
+class GameSnapshot:
+    """State of a Game captured by Game.snapshot"""
+    __slots__ = ("board", "stage")
+
+    def __init__(self, board: BoardSnapshot, stage: Optional[stages.Stage]):
+        self.board: BoardSnapshot = board
+        self.stage: Optional[stages.Stage] = stage
+
+
 class Game:
-    def __init__(self):
-        self.board: Board = Board()
-        self.stage: stages.Stage = None
+    def __init__(self, rng=None):
+        self.board: Board = Board(rng)
+        self.stage: Optional[stages.Stage] = None
 
-    def requires_game_started(self, attempt: str):
+    def requires_game_started(self, attempt: str) -> stages.Stage:
         if self.stage is None:
             raise GameError(f"Requires game to have begun to {attempt}")
+        return self.stage
 
     def requires_game_not_started(self, attempt: str):
         if self.stage is not None:
@@ -29,7 +39,7 @@ class Game:
 
     def get_identity(self, name) -> str:
         self.requires_game_started("get player identity")
-        return self.board.get_player(name).identity.value
+        return self.board.lookup_player(name).identity.value
 
     def add_player(self, name: str) -> None:
         self.requires_game_not_started("add a player")
@@ -42,11 +52,48 @@ class Game:
         return (self.stage.prompts().get_dict(), self.board.extract_updates())
 
     def perform_action(self, action, choice) -> Tuple[Optional[Dict[str, Prompt]], Dict]:
-        next_stage = self.stage.perform_action(action, choice)
-        if next_stage == self.stage:
+        stage = self.requires_game_started("perform an action")
+        next_stage = stage.perform_action(action, choice)
+        if next_stage == stage:
             # this stage not done yet
             return (None, self.board.extract_updates())
 
         # state done
         self.stage = next_stage
-        return (self.stage.prompts().get_dict(), self.board.extract_updates())
+        return (next_stage.prompts().get_dict(), self.board.extract_updates())
+
+    def perform_actions(self, actions: Sequence[Tuple[str, str, str]]) -> Tuple[Optional[Dict[str, Prompt]], Dict]:
+        """perform several (player, action, choice) in one step, e.g. the votes of every player.
+        Each player must be live and act at most once. As for perform_action, callers check that players were
+        prompted for their actions.
+        Returns the prompts of the stage reached (None if it is still the same) and the updates of all the actions.
+        Either all actions are performed or none: if one fails, the game is restored to before the first one.
+        """
+        stage = self.requires_game_started("perform actions")
+        players = [player for (player, _, _) in actions]
+        for player in players:
+            self.board.get_player(player)
+        if len(set(players)) != len(players):
+            raise GameError(f"Players can only act once in a batch of actions: {players}")
+        before = self.snapshot()
+        prompts = None
+        try:
+            for (_, action, choice) in actions:
+                next_stage = stage.perform_action(action, choice)
+                if next_stage != stage:
+                    # as in perform_action, a stage's prompts are built once it is reached
+                    self.stage = stage = next_stage
+                    prompts = next_stage.prompts().get_dict()
+        except Exception:
+            self.restore(before)
+            raise
+        return (prompts, self.board.extract_updates())
+
+    def snapshot(self) -> GameSnapshot:
+        """captures board, current stage and PRNG state, e.g. for branching in a tree search"""
+        return GameSnapshot(self.board.snapshot(), self.stage and self.stage.copy())
+
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """returns this game to a snapshot previously taken from it"""
+        self.board.restore(snapshot.board)
+        self.stage = snapshot.stage and snapshot.stage.copy()
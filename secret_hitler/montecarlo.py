@@ -0,0 +1,218 @@
+"""secret_hitler.montecarlo
+
+Vectorized Monte Carlo estimates over the policy deck, simulating many games at once with NumPy.
+Follows the same rules as Board (draw_three_tiles, recycle_used_tiles, enter_chaos, ...), with each
+game's deck held as one row of an integer array.
+
+Requires numpy.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from secret_hitler.board import (Board, Faction, NUM_PLAYERS_TO_BOARD_CONFIG, PresidentialPower, Tile,
+                                 LIBERAL_WINNING_PROGRESS, FASCIST_WINNING_PROGRESS)
+from secret_hitler.compact import TILE_CODES
+from secret_hitler.exceptions import UnimplementedFeature
+
+LIBERAL = TILE_CODES[Tile.LIBERAL_POLICY]
+FASCIST = TILE_CODES[Tile.FASCIST_POLICY]
+NO_TILE = -1
+
+DECK_SIZE = 17
+INITIAL_TILES = {LIBERAL: 6, FASCIST: 11}
+
+
+class DeckBatch:
+    """Policy decks of num_games independent games.
+    Game i's unused tiles are tiles[i, start[i]:end[i]], top of the deck first.
+    Discarded tiles are kept as counts since they are always shuffled before being used again.
+    """
+    def __init__(self, tiles: np.ndarray, start: np.ndarray, end: np.ndarray, discarded: np.ndarray,
+                 rng: np.random.Generator):
+        self.tiles: np.ndarray = tiles              # (num_games, DECK_SIZE) int8
+        self.start: np.ndarray = start              # (num_games,) int
+        self.end: np.ndarray = end                  # (num_games,) int
+        self.discarded: np.ndarray = discarded      # (num_games, 2) int, discarded counts by tile code
+        self.rng: np.random.Generator = rng
+        self.rows: np.ndarray = np.arange(len(tiles))
+
+    @staticmethod
+    def new(num_games: int, rng: np.random.Generator) -> "DeckBatch":
+        """fresh shuffled decks, as dealt by Board.__init__"""
+        counts = np.tile([INITIAL_TILES[LIBERAL], INITIAL_TILES[FASCIST]], (num_games, 1))
+        return DeckBatch(shuffled_tiles(counts, rng),
+                         np.zeros(num_games, dtype=np.int64),
+                         np.full(num_games, DECK_SIZE, dtype=np.int64),
+                         np.zeros((num_games, 2), dtype=np.int64),
+                         rng)
+
+    @staticmethod
+    def from_board(board: Board, num_games: int, rng: np.random.Generator, shuffle_unused: bool = True) -> "DeckBatch":
+        """num_games copies of board's deck.
+        With shuffle_unused, the order of the unused tiles is re-drawn for every game, i.e. the board is seen
+        by an observer who only knows which tiles have not been used yet.
+        """
+        unused = np.array([TILE_CODES[t] for t in board.unused_tiles], dtype=np.int8)
+        discarded = np.bincount([TILE_CODES[t] for t in board.discarded_tiles], minlength=2)
+        tiles = np.full((num_games, DECK_SIZE), NO_TILE, dtype=np.int8)
+        if shuffle_unused:
+            counts = np.tile(np.bincount(unused, minlength=2), (num_games, 1))
+            tiles[:, :len(unused)] = shuffled_tiles(counts, rng)[:, :len(unused)]
+        else:
+            tiles[:, :len(unused)] = unused
+        return DeckBatch(tiles,
+                         np.zeros(num_games, dtype=np.int64),
+                         np.full(num_games, len(unused), dtype=np.int64),
+                         np.tile(discarded, (num_games, 1)),
+                         rng)
+
+    def num_unused(self) -> np.ndarray:
+        return self.end - self.start
+
+    def recycle_used_tiles(self, mask: np.ndarray) -> None:
+        """for games in mask, shuffle discarded tiles and put under unused tiles"""
+        games = self.rows[mask]
+        if len(games) == 0:
+            return
+        remaining = self.num_unused()[games]
+        # move the remaining unused tiles to the front of the row
+        new_tiles = np.full((len(games), DECK_SIZE), NO_TILE, dtype=np.int8)
+        cols = np.arange(DECK_SIZE)
+        src = np.minimum(self.start[games, None] + cols, DECK_SIZE - 1)
+        keep = cols < remaining[:, None]
+        new_tiles[keep] = self.tiles[games[:, None], src][keep]
+        # then the shuffled discards
+        shuffled = shuffled_tiles(self.discarded[games], self.rng)
+        num_discarded = self.discarded[games].sum(axis=1)
+        dst = remaining[:, None] + cols
+        place = cols < num_discarded[:, None]
+        new_tiles[np.broadcast_to(np.arange(len(games))[:, None], dst.shape)[place], dst[place]] = shuffled[place]
+
+        self.tiles[games] = new_tiles
+        self.start[games] = 0
+        self.end[games] = remaining + num_discarded
+        self.discarded[games] = 0
+
+    def draw(self, num_tiles: int, mask: np.ndarray) -> np.ndarray:
+        """draw num_tiles from the top of the deck of each game in mask.
+        Returns (num_games, num_tiles) tile codes, NO_TILE for games outside mask.
+        """
+        self.recycle_used_tiles(mask & (self.num_unused() < num_tiles))
+        cols = np.minimum(self.start[:, None] + np.arange(num_tiles), DECK_SIZE - 1)
+        drawn = np.where(mask[:, None], self.tiles[self.rows[:, None], cols], NO_TILE).astype(np.int8)
+        self.start += np.where(mask, num_tiles, 0)
+        return drawn
+
+    def draw_three_tiles(self, mask: np.ndarray) -> np.ndarray:
+        return self.draw(3, mask)
+
+    def peek_top_three_tiles(self, mask: np.ndarray) -> None:
+        # peeking does not change the order of the tiles, but may trigger a recycle
+        self.recycle_used_tiles(mask & (self.num_unused() < 3))
+
+    def enter_chaos(self, mask: np.ndarray) -> np.ndarray:
+        """returns the top tile of each game in mask, which is to be enacted"""
+        return self.draw(1, mask)[:, 0]
+
+    def discard(self, tiles: np.ndarray, mask: np.ndarray) -> None:
+        for code in (LIBERAL, FASCIST):
+            self.discarded[:, code] += mask & (tiles == code)
+
+
+def shuffled_tiles(counts: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """(num_games, DECK_SIZE) rows each holding a random permutation of the tiles in counts[i], padded with NO_TILE"""
+    num_games = len(counts)
+    cols = np.arange(DECK_SIZE)
+    ordered = np.where(cols < counts[:, LIBERAL, None], LIBERAL,
+                       np.where(cols < counts.sum(axis=1)[:, None], FASCIST, NO_TILE))
+    keys = rng.random((num_games, DECK_SIZE))
+    keys[ordered == NO_TILE] = np.inf
+    return np.take_along_axis(ordered, np.argsort(keys, axis=1), axis=1).astype(np.int8)
+
+
+# Estimators
+def prob_next_draw(board: Board, min_fascist: int, num_games: int = 100000, seed: Optional[int] = None) -> float:
+    """estimated chance that the next three tiles drawn from board contain at least min_fascist fascist tiles,
+    given only which tiles are unused and discarded
+    """
+    deck = DeckBatch.from_board(board, num_games, np.random.default_rng(seed))
+    drawn = deck.draw_three_tiles(np.ones(num_games, dtype=bool))
+    return float(np.mean((drawn == FASCIST).sum(axis=1) >= min_fascist))
+
+
+class RandomPlayOutcomes(NamedTuple):
+    winner: np.ndarray              # (num_games,) tile code of the winning faction
+    num_presidencies: np.ndarray    # (num_games,)
+    liberal_progress: np.ndarray
+    fascist_progress: np.ndarray
+
+    def win_rate(self, faction: Faction) -> float:
+        code = LIBERAL if faction == Faction.LIBERAL else FASCIST
+        return float(np.mean(self.winner == code))
+
+    def presidencies_distribution(self, faction: Optional[Faction] = None) -> np.ndarray:
+        """histogram of the number of presidencies until the game ended (optionally, until faction won)"""
+        presidencies = self.num_presidencies
+        if faction is not None:
+            presidencies = presidencies[self.winner == (LIBERAL if faction == Faction.LIBERAL else FASCIST)]
+        return np.bincount(presidencies)
+
+
+def simulate_random_play(num_players: int, num_games: int, seed: Optional[int] = None) -> RandomPlayOutcomes:
+    """policy outcomes of num_games games where every choice is made uniformly at random
+    (the policy deck evolution of secret_hitler.sim.random_policy games)
+    """
+    powers = NUM_PLAYERS_TO_BOARD_CONFIG[num_players][2]
+    for p in powers:
+        if p not in (None, PresidentialPower.POLICY_PEEK, PresidentialPower.EXECUTION):
+            raise UnimplementedFeature(f"Presidential Power: {p}")
+    # code of the power unlocked by each fascist progress, 0 for none
+    power_by_progress = np.array([0] + [0 if p is None else p.value + 1 for p in powers])
+
+    rng = np.random.default_rng(seed)
+    deck = DeckBatch.new(num_games, rng)
+    rows = np.arange(num_games)
+    num_active = np.full(num_games, num_players)
+    election_tracker = np.zeros(num_games, dtype=np.int64)
+    progress = np.zeros((num_games, 2), dtype=np.int64)
+    presidencies = np.zeros(num_games, dtype=np.int64)
+    playing = np.ones(num_games, dtype=bool)
+
+    while playing.any():
+        presidencies += playing
+        # everyone votes ja or nein
+        num_ja = rng.binomial(num_active, 0.5)
+        passed = playing & (num_ja > num_active // 2)
+        failed = playing & ~passed
+
+        # president discards one of three, chancellor one of the remaining two, the last one is enacted
+        drawn = deck.draw_three_tiles(passed)
+        president_discard = rng.integers(0, 3, num_games)
+        deck.discard(drawn[rows, president_discard], passed)
+        remaining = drawn[rows[:, None], (president_discard[:, None] + np.array([1, 2])) % 3]
+        chancellor_discard = rng.integers(0, 2, num_games)
+        deck.discard(remaining[rows, chancellor_discard], passed)
+        enacted = np.where(passed, remaining[rows, 1 - chancellor_discard], NO_TILE)
+        election_tracker[passed] = 0
+
+        # failed votes advance the election tracker, the third one enacts the top tile
+        election_tracker += failed
+        chaos = election_tracker == 3
+        enacted = np.where(chaos, deck.enter_chaos(chaos), enacted)
+        election_tracker[chaos] = 0
+
+        for code in (LIBERAL, FASCIST):
+            progress[:, code] += enacted == code
+        won = (progress[:, LIBERAL] == LIBERAL_WINNING_PROGRESS) | (progress[:, FASCIST] == FASCIST_WINNING_PROGRESS)
+
+        # presidential powers only follow passed legislation
+        power = np.where(passed & ~won & (enacted == FASCIST), power_by_progress[progress[:, FASCIST]], 0)
+        deck.peek_top_three_tiles(power == PresidentialPower.POLICY_PEEK.value + 1)
+        num_active -= power == PresidentialPower.EXECUTION.value + 1
+
+        playing &= ~won
+
+    winner = np.where(progress[:, LIBERAL] == LIBERAL_WINNING_PROGRESS, LIBERAL, FASCIST)
+    return RandomPlayOutcomes(winner, presidencies, progress[:, LIBERAL], progress[:, FASCIST])
@@ -13,6 +13,8 @@ class Identity(Enum):
 
 
 class Player:
+    __slots__ = ("name", "identity")
+
     def __init__(self, name):
         self.name = name        # unique identifier
         self.identity = None
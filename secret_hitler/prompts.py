@@ -1,29 +1,69 @@
 """secret_hitler.prompts
 
 A Prompt encapsulates a request for user action, along with the available choices the user can respond with.
+
+The text of a prompt is given as a template id plus the arguments to fill it in with, and only rendered when it
+is asked for, which simulations and bots never do. Prompts are immutable, so players given the same prompt (e.g.
+to vote) share one, and their choices are tuples that can be shared with everything else offering the same choices.
 """
 
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Optional, Sequence, Tuple
 
+from secret_hitler.exceptions import UnreachableStateError
 from secret_hitler.player import Player
 
+# template id -> text of the prompt, formatted with its arguments
+PROMPT_TEMPLATES: Dict[str, str] = {
+    "identity": "You are: {0}.",
+    "identity_fascist": "You are: {0}. Hitler is: {1}.",
+    "identity_fascist_team": "You are: {0}. Hitler is: {1}. Your team: {2}",
+    "identity_hitler_teammate": "You are: {0}. Your teammate is: {1}",
+    "nominate_chancellor": "Nominate your chancellor",
+    "vote_for_chancellor": "Vote for chancellor: {0}",
+    "discard_tile": "Discard a policy tile",
+    "policy_peek": "The top three tiles are: {0}",
+    "execute_player": "Execute one a player",
+}
+
+ACK_CHOICES = ("Got it!",)
+VOTE_CHOICES = ("ja", "nein")
+
 
 class Prompt:
-    def __init__(self, method: str, prompt_str: str, choices: List[str]):
+    __slots__ = ("method", "template", "args", "choices", "rendered")
+
+    def __init__(self, method: str, template: str, choices: Sequence[str], args: Tuple[str, ...] = ()):
         self.method = method
-        self.prompt_str = prompt_str
+        self.template = template    # key of PROMPT_TEMPLATES
+        self.args = args
         self.choices = choices
+        self.rendered: Optional[str] = None     # prompt_str, once rendered
+
+    @property
+    def prompt_str(self) -> str:
+        if self.rendered is None:
+            self.rendered = PROMPT_TEMPLATES[self.template].format(*self.args)
+        return self.rendered
 
     def __str__(self):
-        return f"{self.method}({self.prompt_str}): {str(self.choices)}"
+        return f"{self.method}({self.prompt_str}): {str(list(self.choices))}"
 
 
 class Prompts:
     def __init__(self):
         self.prompts: Dict[str, Prompt] = dict()
 
-    def add(self, player: Player, method: Callable, prompt_str: str, choices: List[str]) -> None:
-        self.prompts[player.name] = Prompt(method.__name__, prompt_str, choices)
+    def add(self, player: Player, method: Callable, template: str, choices: Sequence[str],
+            args: Tuple[str, ...] = ()) -> Prompt:
+        """method: user action of a stage, bound to it (e.g. self.ack_identity). Returns the prompt, for share"""
+        if method.__name__ not in method.__self__.user_actions:  # type: ignore
+            raise UnreachableStateError(f"Prompt for {method.__name__}, which is not a user action")
+        prompt = self.prompts[player.name] = Prompt(method.__name__, template, choices, args)
+        return prompt
+
+    def share(self, player: Player, prompt: Prompt) -> None:
+        """give player a prompt already added for another player"""
+        self.prompts[player.name] = prompt
 
     def get_dict(self) -> Dict[str, Prompt]:
         return self.prompts
@@ -0,0 +1,252 @@
+"""secret_hitler.sim
+
+Headless game simulation engine. Plays many complete games against pluggable policies,
+reusing the Board and stages rules but skipping prompt construction and update tracking.
+Batches of games can be spread across processes; every game is seeded independently so
+results do not depend on how the games are split.
+"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import random
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from secret_hitler import stages
+from secret_hitler.board import Board, Faction, PresidentialPower
+from secret_hitler.exceptions import GameError, UnreachableStateError
+from secret_hitler.player import Identity, Player
+from secret_hitler.prompts import ACK_CHOICES, VOTE_CHOICES
+
+
+class NoLegalChoiceError(GameError):
+    def __init__(self, action: str):
+        self.action = action
+        super().__init__(f"No legal choice remains for action {action}")
+
+
+# type alias for simulation policies.
+# A policy receives (board, acting player, action name, choices, rng) and returns one of the choices.
+Policy = Callable[[Board, Player, str, Sequence[str], random.Random], str]
+
+
+def random_policy(board: Board, player: Player, action: str, choices: Sequence[str], rng: random.Random) -> str:
+    return choices[int(rng.random() * len(choices))]
+
+
+def first_choice_policy(board: Board, player: Player, action: str, choices: Sequence[str], rng: random.Random) -> str:
+    return choices[0]
+
+
+class GameResult(NamedTuple):
+    seed: int
+    num_players: int
+    winner: Optional[Faction]
+    liberal_progress: int
+    fascist_progress: int
+    num_presidencies: int
+    num_actions: int
+    num_executions: int
+    error: Optional[str]            # set if the game could not be played to completion
+
+
+# simulated games are not logged, whatever the level of the secret_hitler loggers
+quiet_logger = logging.getLogger(__name__ + ".quiet")
+quiet_logger.setLevel(logging.CRITICAL + 1)
+quiet_logger.propagate = False
+
+
+class SimBoard(Board):
+    """Board that neither keeps track of updated properties nor logs, so its public state is not kept up to date"""
+    logger = quiet_logger
+
+    def register_update(self, prop):
+        pass
+
+
+# Pending actions of each stage: (acting players, action name, choices).
+# Mirrors the prompts() of each stage without building any prompts, but only offers the choices the stage accepts
+# where the prompt offers more (e.g. nominees), so that policies need not be asked again.
+PendingActions = Tuple[List[Player], str, Sequence[str]]
+
+
+def _pending_presidential_power(stage: stages.PerformPresidentialPower) -> PendingActions:
+    board = stage.board
+    if stage.power == PresidentialPower.POLICY_PEEK:
+        board.peek_top_three_tiles()
+        return ([board.get_president()], "done_policy_peek", ACK_CHOICES)
+    elif stage.power == PresidentialPower.EXECUTION:
+        return ([board.get_president()], "execute_player", board.get_player_names())
+    # let the stage raise its own error for powers that are not implemented yet
+    stage.prompts()
+    raise UnreachableStateError("Invalid presidential power: " + str(stage.power))
+
+
+PENDING_ACTIONS: Dict[type, Callable[..., PendingActions]] = {
+    stages.RevealIdentities: (lambda s: (s.board.players, "ack_identity", ACK_CHOICES)),
+    stages.NewPresident: (lambda s: ([s.board.get_president()], "nominate_chancellor", s.eligible_nominees())),
+    stages.ChancellorNominated: (lambda s: (s.board.players, "vote_for_chancellor", VOTE_CHOICES)),
+    stages.PresidentDecidesLegislation: (lambda s: ([s.board.get_president()], "president_discards_tile",
+                                                    [t.value for t in s.drawn_tiles])),
+    stages.ChancellorDecidesLegislation: (lambda s: ([s.board.chancellor], "chancellor_discards_tile",
+                                                     [t.value for t in s.remaining_tiles])),
+    stages.PerformPresidentialPower: _pending_presidential_power,
+}
+
+
+class Simulator:
+    """Plays full games from a list of seeds.
+    policy is either a single Policy used by every player, or a mapping from Identity to Policy.
+    """
+    def __init__(self, num_players: int, policy: Union[Policy, Dict[Identity, Policy]] = random_policy):
+        self.num_players: int = num_players
+        self.player_names: List[str] = [f"p{i}" for i in range(num_players)]
+        if callable(policy):
+            self.policies: Dict[Identity, Policy] = {identity: policy for identity in Identity}
+        else:
+            self.policies = dict(policy)
+
+    def play(self, seed: int) -> GameResult:
+        # the same PRNG drives both the board shuffles and the policies
+        rng = random.Random(seed)
+        board = SimBoard(rng)
+        for name in self.player_names:
+            board.add_player(name)
+        board.begin_game()
+        policies = {player: self.policies[player.identity] for player in board.players}
+
+        stage: stages.Stage = stages.RevealIdentities(board)
+        num_presidencies = 0
+        num_actions = 0
+        error = None
+        try:
+            while type(stage) is not stages.GameOver:
+                stage_type = type(stage)
+                if stage_type is stages.NewPresident:
+                    num_presidencies += 1
+                (actors, action, choices) = PENDING_ACTIONS[stage_type](stage)
+                # resolve the action handler once for all actors of this stage
+                handler = stage.user_actions[action]
+                stage._current_action = handler
+                # every actor of a stage acts on it, e.g. voters, which it counts once the last vote is in
+                for actor in actors:
+                    next_stage = self.act(stage, handler, policies[actor], actor, choices, rng)
+                    num_actions += 1
+                    if next_stage is not stage:
+                        break
+                stage = next_stage
+        except GameError as err:
+            error = str(err)
+
+        return GameResult(seed=seed,
+                          num_players=self.num_players,
+                          winner=getattr(board, "winner", None),
+                          liberal_progress=board.liberal_progress,
+                          fascist_progress=board.fascist_progress,
+                          num_presidencies=num_presidencies,
+                          num_actions=num_actions,
+                          num_executions=len(board.eliminated_players),
+                          error=error)
+
+    def act(self, stage: stages.Stage, handler: stages.ActionHandler, policy: Policy, actor: Player,
+            choices: Sequence[str], rng: random.Random) -> stages.Stage:
+        """perform action on behalf of actor. Policies are only asked when there is a choice, and only offered
+        legal choices, so asking again when a choice is illegal is the exception rather than the rule.
+        """
+        if len(choices) == 1:
+            return handler(stage, choices[0])
+        remaining = choices
+        while remaining:
+            choice = policy(stage.board, actor, handler.__name__, remaining, rng)
+            try:
+                return handler(stage, choice)
+            except stages.IllegalActionError:
+                if choice not in remaining:
+                    # not one of the choices offered, so asking again would not help
+                    raise
+                remaining = [c for c in remaining if c != choice]
+        raise NoLegalChoiceError(handler.__name__)
+
+
+def simulate(seeds: Iterable[int], num_players: int,
+             policy: Union[Policy, Dict[Identity, Policy]] = random_policy) -> List[GameResult]:
+    """play one game per seed and return the outcomes in the same order"""
+    simulator = Simulator(num_players, policy)
+    return [simulator.play(seed) for seed in seeds]
+
+
+# Parallel simulation
+
+
+def derive_seed(master_seed: int, game_index: int) -> int:
+    """seed of the game_index-th game of a run"""
+    return random.Random(f"{master_seed}:{game_index}").getrandbits(64)
+
+
+class SimStats:
+    """Aggregated outcomes of a set of simulated games. Stats of disjoint sets of games can be merged."""
+    def __init__(self):
+        self.num_games: int = 0
+        self.num_errors: int = 0
+        self.wins: Counter = Counter()                       # Faction -> number of games won
+        self.presidencies: Counter = Counter()               # num_presidencies -> number of games
+        self.total_actions: int = 0
+        self.total_executions: int = 0
+
+    def add(self, result: GameResult) -> None:
+        self.num_games += 1
+        if result.error is not None:
+            self.num_errors += 1
+        if result.winner is not None:
+            self.wins[result.winner] += 1
+        self.presidencies[result.num_presidencies] += 1
+        self.total_actions += result.num_actions
+        self.total_executions += result.num_executions
+
+    def merge(self, other: "SimStats") -> None:
+        self.num_games += other.num_games
+        self.num_errors += other.num_errors
+        self.wins.update(other.wins)
+        self.presidencies.update(other.presidencies)
+        self.total_actions += other.total_actions
+        self.total_executions += other.total_executions
+
+    def get_dict(self) -> Dict:
+        return {
+            "num_games": self.num_games,
+            "num_errors": self.num_errors,
+            "wins": {faction.value: self.wins[faction] for faction in Faction},
+            "presidencies": {n: self.presidencies[n] for n in sorted(self.presidencies)},
+            "total_actions": self.total_actions,
+            "total_executions": self.total_executions,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, SimStats) and self.get_dict() == other.get_dict()
+
+
+def simulate_batch(master_seed: int, start: int, stop: int, num_players: int,
+                   policy: Union[Policy, Dict[Identity, Policy]] = random_policy) -> SimStats:
+    """play games start..stop-1 of the run identified by master_seed"""
+    simulator = Simulator(num_players, policy)
+    stats = SimStats()
+    for game_index in range(start, stop):
+        stats.add(simulator.play(derive_seed(master_seed, game_index)))
+    return stats
+
+
+def run_parallel(master_seed: int, num_games: int, num_players: int,
+                 policy: Union[Policy, Dict[Identity, Policy]] = random_policy,
+                 max_workers: Optional[int] = None, batch_size: int = 500) -> SimStats:
+    """play num_games games across a pool of worker processes.
+    The result only depends on (master_seed, num_games, num_players, policy), never on the number of workers.
+    policy must be picklable (e.g. a module-level function).
+    """
+    stats = SimStats()
+    with ProcessPoolExecutor(max_workers) as executor:
+        batches = [executor.submit(simulate_batch, master_seed, start, min(start + batch_size, num_games),
+                                   num_players, policy)
+                   for start in range(0, num_games, batch_size)]
+        for batch in batches:
+            stats.merge(batch.result())
+    return stats
@@ -3,12 +3,13 @@
 Describes the various stages of the game and the user actions that can be performed at each stage.
 """
 
-from typing import Callable, List
+import copy
+from typing import Callable, Dict, List, Optional, Tuple, Type
 
 from secret_hitler.board import Board, Tile, Faction, Vote, PresidentialPower
 from secret_hitler.exceptions import GameError, UnreachableStateError, UnimplementedFeature
 from secret_hitler.player import Player, Identity
-from secret_hitler.prompts import Prompts
+from secret_hitler.prompts import ACK_CHOICES, Prompt, Prompts, VOTE_CHOICES
 
 
 class IllegalActionError(GameError):
@@ -21,7 +22,7 @@ class IllegalActionError(GameError):
 
 
 # type alias for user action handler methods
-ActionHandler = Callable[["Stage", str, str], "Stage"]
+ActionHandler = Callable[["Stage", str], "Stage"]
 
 
 class Stage:
@@ -31,17 +32,19 @@ class Stage:
     - override the prompts method
     - implement user actions
     """
-    all_stages: List["Stage"] = []
-    user_actions: List[ActionHandler] = []
+    all_stages: List[Type["Stage"]] = []
+    user_actions: Dict[str, ActionHandler] = dict()     # action name -> handler, built by game_stage
+    _current_action: Optional[Callable[..., "Stage"]] = None  # handler of the action being performed
 
     def __init__(self, board: Board):
         self.board: Board = board
 
     def perform_action(self, action: str, choice: str) -> "Stage":
-        if (not hasattr(self, action)) or (getattr(self, action).__func__ not in self.user_actions):
+        handler = self.user_actions.get(action)
+        if handler is None:
             raise IllegalActionError(self, action, "Action does not exist")
-        self._current_action = getattr(self, action)
-        return self._current_action(choice)
+        self._current_action = handler
+        return handler(self, choice)
 
     def signal_illegal_action(self, reason: str):
         raise IllegalActionError(self, self._current_action.__name__ if self._current_action else "", reason)
@@ -52,15 +55,23 @@ class Stage:
         """
         return Prompts()
 
+    def copy(self) -> "Stage":
+        """Returns a copy of this stage acting on the same board.
+        Lists held by the stage (e.g. votes, drawn tiles) are copied, everything else is shared.
+        """
+        clone = copy.copy(self)
+        for (attr, value) in vars(clone).items():
+            if type(value) is list:
+                setattr(clone, attr, list(value))
+        return clone
+
 
 # decorators for registering stages and their actions
 def game_stage(cls):
     """register cls as a game stage and register its user actions"""
     Stage.all_stages.append(cls)
-    cls.user_actions = []
-    for method in cls.__dict__.values():
-        if hasattr(method, "is_user_action"):
-            cls.user_actions.append(method)
+    # dispatch table, so performing an action is a single lookup
+    cls.user_actions = {name: method for (name, method) in cls.__dict__.items() if hasattr(method, "is_user_action")}
     return cls
 
 
@@ -87,20 +98,34 @@ class RevealIdentities(Stage):
                 fascist_player_names.append(player.name)
             elif player.identity == Identity.HITLER:
                 hitler_name = player.name
-        # announce identites and teammates
+        # announce identites and teammates. Everyone on the same side gets the same prompt
+        fascist_args: Tuple[str, Tuple[str, ...]]
+        hitler_args: Tuple[str, Tuple[str, ...]]
+        if len(fascist_player_names) > 1:
+            fascist_args = ("identity_fascist_team", (Identity.FASCIST.value, hitler_name, ", ".join(fascist_player_names)))
+        else:
+            fascist_args = ("identity_fascist", (Identity.FASCIST.value, hitler_name))
+        if len(fascist_player_names) == 1:
+            hitler_args = ("identity_hitler_teammate", (Identity.HITLER.value, fascist_player_names[0]))
+        else:
+            hitler_args = ("identity", (Identity.HITLER.value,))
+        templates = {
+            Identity.LIBERAL: ("identity", (Identity.LIBERAL.value,)),
+            Identity.FASCIST: fascist_args,
+            Identity.HITLER: hitler_args,
+        }
+        shared: Dict[Identity, Prompt] = dict()
         for player in self.board.players:
-            teammate_info = ""
-            if player.identity == Identity.FASCIST:
-                teammate_info += f" Hitler is: {hitler_name}."
-                if len(fascist_player_names) > 1:
-                    fascists_name_list = ", ".join(fascist_player_names)
-                    teammate_info += f" Your team: {fascists_name_list}"
-            elif player.identity == Identity.HITLER and len(fascist_player_names) == 1:
-                teammate_info += f" Your teammate is: {fascist_player_names[0]}"
-            prompts.add(player,
-                        method=self.ack_identity,
-                        prompt_str=f"You are: {player.identity.value}." + teammate_info,
-                        choices=["Got it!"])
+            prompt = shared.get(player.identity)
+            if prompt is not None:
+                prompts.share(player, prompt)
+                continue
+            (template, args) = templates[player.identity]
+            shared[player.identity] = prompts.add(player,
+                                                  method=self.ack_identity,
+                                                  template=template,
+                                                  choices=ACK_CHOICES,
+                                                  args=args)
         return prompts
 
     @user_action
@@ -123,18 +148,31 @@ class NewPresident(Stage):
         # president nominate chancellor
         prompts.add(self.board.get_president(),
                     method=self.nominate_chancellor,
-                    prompt_str="Nominate your chancellor",
-                    choices=[p.name for p in self.board.players])
+                    template="nominate_chancellor",
+                    choices=self.board.get_player_names())
         return prompts
 
+    def ineligible_nominees(self) -> Dict[str, str]:
+        """name -> why the player cannot be nominated, for every such player"""
+        ineligible = dict()
+        # later reasons take precedence over earlier ones
+        if self.board.prev_president and len(self.board.players) > 5:
+            ineligible[self.board.prev_president.name] = "Chancellor cannot be the same as previous president"
+        if self.board.prev_chancellor:
+            ineligible[self.board.prev_chancellor.name] = "Chancellor cannot be the same as previous chancellor"
+        ineligible[self.board.get_president().name] = "Chancellor cannot be the same as current president"
+        return ineligible
+
+    def eligible_nominees(self) -> List[str]:
+        """names of the players nominate_chancellor accepts"""
+        ineligible = self.ineligible_nominees()
+        return [name for name in self.board.get_player_names() if name not in ineligible]
+
     @user_action
     def nominate_chancellor(self, nominee: str) -> Stage:
-        if nominee == self.board.get_president().name:
-            self.signal_illegal_action("Chancellor cannot be the same as current president")
-        if self.board.prev_chancellor and nominee == self.board.prev_chancellor.name:
-            self.signal_illegal_action("Chancellor cannot be the same as previous chancellor")
-        if self.board.prev_president and nominee == self.board.prev_president.name and len(self.board.players) > 5:
-            self.signal_illegal_action("Chancellor cannot be the same as previous president")
+        reason = self.ineligible_nominees().get(nominee)
+        if reason is not None:
+            self.signal_illegal_action(reason)
         nominated_chancellor = self.board.get_player(nominee)
         return ChancellorNominated(self.board, nominated_chancellor)
 
@@ -145,27 +183,41 @@ class ChancellorNominated(Stage):
         super().__init__(board)
         self.nominee: Player = nominee
         self.votes: List[Vote] = []
+        self.num_ja: int = 0        # running tally of JA among votes
 
     def prompts(self) -> Prompts:
         prompts = Prompts()
         # everyone votes
+        prompt = None
         for player in self.board.players:
-            prompts.add(player,
-                        method=self.vote_for_chancellor,
-                        prompt_str=f"Vote for chancellor: {self.nominee.name}",
-                        choices=["ja", "nein"])
+            if prompt is None:
+                prompt = prompts.add(player,
+                                     method=self.vote_for_chancellor,
+                                     template="vote_for_chancellor",
+                                     choices=VOTE_CHOICES,
+                                     args=(self.nominee.name,))
+            else:
+                prompts.share(player, prompt)
         return prompts
 
     @user_action
     def vote_for_chancellor(self, vote: str) -> Stage:
-        self.votes.append(Vote(vote))
+        if vote == "ja":
+            self.votes.append(Vote.JA)
+            self.num_ja += 1
+        elif vote == "nein":
+            self.votes.append(Vote.NEIN)
+        else:
+            self.signal_illegal_action(f"{vote} is not a vote")
 
         if len(self.votes) < len(self.board.players):
             # NOT done voting
             return self
+        return self.count_votes()
 
-        # done voting
-        if self.votes.count(Vote.JA) > (len(self.board.players) // 2):
+    def count_votes(self) -> Stage:
+        """the stage after everyone has voted"""
+        if self.num_ja > (len(self.board.players) // 2):
             # vote passed
             self.board.establish_new_chancellor(self.nominee)
             return PresidentDecidesLegislation(self.board)
@@ -192,7 +244,7 @@ class PresidentDecidesLegislation(Stage):
         # president discards a tile
         prompts.add(self.board.get_president(),
                     method=self.president_discards_tile,
-                    prompt_str="Discard a policy tile",
+                    template="discard_tile",
                     choices=[t.value for t in self.drawn_tiles])
         return prompts
 
@@ -210,10 +262,12 @@ class ChancellorDecidesLegislation(Stage):
 
     def prompts(self) -> Prompts:
         prompts = Prompts()
+        if self.board.chancellor is None:
+            raise UnreachableStateError("Unexpectedly entered chancellor legislation without a chancellor")
         # chancellor discards a tile
         prompts.add(self.board.chancellor,
                     method=self.chancellor_discards_tile,
-                    prompt_str="Discard a policy tile",
+                    template="discard_tile",
                     choices=[t.value for t in self.remaining_tiles])
         return prompts
 
@@ -259,13 +313,14 @@ class PerformPresidentialPower(Stage):
             top_three_tiles_str = ", ".join([t.value for t in self.board.peek_top_three_tiles()])
             prompts.add(self.board.get_president(),
                         method=self.done_policy_peek,
-                        prompt_str=f"The top three tiles are: {top_three_tiles_str}",
-                        choices=["Got it!"])
+                        template="policy_peek",
+                        choices=ACK_CHOICES,
+                        args=(top_three_tiles_str,))
         elif self.power == PresidentialPower.EXECUTION:
             prompts.add(self.board.get_president(),
                         method=self.execute_player,
-                        prompt_str=f"Execute one a player",
-                        choices=[p.name for p in self.board.players])
+                        template="execute_player",
+                        choices=self.board.get_player_names())
         else:
             raise UnreachableStateError("Invalid presidential power: " + str(self.power))
         return prompts
@@ -282,6 +337,8 @@ class PerformPresidentialPower(Stage):
 
     @user_action
     def execute_player(self, player: str) -> Stage:
+        if player not in self.board.player_index:
+            self.signal_illegal_action("Can only execute a live player")
         self.board.execute_player_and_advance_president(player)
         return NewPresident(self.board, need_advance_president=False)
 
@@ -0,0 +1,52 @@
+"""tests for secret_hitler.analysis, checked against enumerating every deck order"""
+
+from collections import Counter
+from itertools import permutations
+import random
+
+import pytest
+
+from secret_hitler.analysis import chaos_distribution, draw_distribution, get_statistics, tile_counts
+from secret_hitler.board import Board, Tile
+
+L = Tile.LIBERAL_POLICY
+F = Tile.FASCIST_POLICY
+
+
+def enumerate_draws(unused, discarded):
+    """distribution of fascist tiles in the next draw over all orders of the unused and discarded tiles"""
+    draws = Counter()
+    orders = [u + d for u in set(permutations(unused)) for d in set(permutations(discarded))]
+    for order in orders:
+        draws[order[:3].count(F)] += 1
+    return [draws[k] / len(orders) for k in range(4)]
+
+
+@pytest.mark.parametrize("unused, discarded", [
+    ([L, F, F, F, L], []),
+    ([L, L, F, F, F, F], [L, F]),
+    ([F, L], [L, L, F, F]),
+    ([F], [L, F, F]),
+    ([], [L, L, F, F, F]),
+])
+def test_draw_distribution(unused, discarded):
+    board = Board(random.Random(0))
+    board.unused_tiles = unused
+    board.discarded_tiles = discarded
+    assert list(draw_distribution(tile_counts(board))) == pytest.approx(enumerate_draws(unused, discarded))
+
+
+def test_chaos_distribution():
+    assert chaos_distribution((1, 3, 5, 0)) == (0.25, 0.75)
+    assert chaos_distribution((0, 0, 1, 1)) == (0.5, 0.5)
+
+
+def test_statistics_use_cache():
+    board = Board(random.Random(0))
+    board.fascist_progress = 5
+    draw_distribution.cache_clear()
+    stats = get_statistics(board)
+    get_statistics(board)
+    assert draw_distribution.cache_info().hits == 1
+    assert stats["chaos_win"] == stats["chaos_fascist"] == 11 / 17
+    assert sum(stats["draw_fascist_count"]) == pytest.approx(1)
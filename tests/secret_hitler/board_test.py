@@ -0,0 +1,74 @@
+"""tests for secret_hitler.board"""
+
+import random
+
+import pytest
+
+from secret_hitler.board import Board, DuplicatePlayerNameError, NonexistentPlayerNameError
+from secret_hitler.game import Game
+from secret_hitler.stages import GameOver, IllegalActionError
+
+
+def new_board(num_players: int) -> Board:
+    board = Board(random.Random(0))
+    for i in range(num_players):
+        board.add_player(f"p{i}")
+    board.begin_game()
+    return board
+
+
+def test_player_index_follows_eliminations():
+    board = new_board(7)
+    board.execute_player_and_advance_president("p2")
+    board.execute_player_and_advance_president("p5")
+    assert [p.name for p in board.players] == ["p0", "p1", "p3", "p4", "p6"]
+    for (i, p) in enumerate(board.players):
+        assert board.player_index[p.name] == i
+        assert board.get_player(p.name) is p
+    with pytest.raises(NonexistentPlayerNameError):
+        board.get_player("p2")
+    assert board.lookup_player("p2") is board.eliminated_players[0]
+
+
+def test_duplicate_names_rejected():
+    board = Board(random.Random(0))
+    board.add_player("p0")
+    with pytest.raises(DuplicatePlayerNameError):
+        board.add_player("p0")
+
+
+def uncached_full_state(board: Board):
+    cached = board.public_state
+    board.public_state = dict()
+    try:
+        return board.get_full_state()
+    finally:
+        board.public_state = cached
+
+
+@pytest.mark.parametrize("num_players", [5, 6])
+def test_cached_public_state_follows_updates(num_players):
+    rng = random.Random(num_players)
+    game = Game(random.Random(num_players))
+    for i in range(num_players):
+        game.add_player(f"p{i}")
+    (prompts, _) = game.begin_game()
+    board = game.board
+    state = board.get_full_state()
+    snapshot = board.snapshot()
+    while prompts:
+        prompt = prompts[rng.choice(sorted(prompts))]
+        for choice in rng.sample(list(prompt.choices), len(prompt.choices)):
+            try:
+                (new_prompts, updates) = game.perform_action(prompt.method, choice)
+                break
+            except IllegalActionError:
+                pass
+        prompts = new_prompts or prompts
+        # the updates extracted from the cache bring the previous state up to date
+        state.update(updates)
+        assert state == board.get_full_state() == uncached_full_state(board)
+        if type(game.stage) is GameOver:
+            break
+    board.restore(snapshot)
+    assert board.get_full_state() == uncached_full_state(board) != state
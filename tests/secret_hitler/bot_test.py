@@ -0,0 +1,74 @@
+"""tests for secret_hitler.bot"""
+
+import random
+
+import pytest
+
+from secret_hitler.board import Tile
+from secret_hitler.bot import LIBERAL, MCTSBot, Node, Position
+from secret_hitler.game import Game
+from secret_hitler.player import Identity
+from secret_hitler.sim import NoLegalChoiceError
+from secret_hitler.stages import ChancellorDecidesLegislation, GameOver
+
+DECISION_BUDGET = 0.2
+
+
+def new_game(num_players: int, seed: int) -> Game:
+    game = Game(random.Random(seed))
+    for i in range(num_players):
+        game.add_player(f"p{i}")
+    return game
+
+
+@pytest.mark.parametrize("identity, keep", [(Identity.LIBERAL, Tile.LIBERAL_POLICY),
+                                            (Identity.FASCIST, Tile.FASCIST_POLICY)])
+def test_chancellor_enacts_winning_policy(identity, keep):
+    game = new_game(6, seed=1)
+    game.begin_game()
+    board = game.board
+    chancellor = next(p for p in board.players if p.identity == identity)
+    board.chancellor = chancellor
+    board.liberal_progress = 4
+    board.fascist_progress = 5
+    game.stage = ChancellorDecidesLegislation(board, [Tile.LIBERAL_POLICY, Tile.FASCIST_POLICY])
+    prompt = game.stage.prompts().get_dict()[chancellor.name]
+
+    bot = MCTSBot(chancellor.name, max_iterations=200, seed=2)
+    discarded = bot.choose(game, prompt)
+    assert discarded != keep.value
+    assert bot.last_search.iterations == 200
+
+
+def test_bots_play_a_full_game_within_budget():
+    game = new_game(5, seed=3)
+    bots = {name: MCTSBot(name, max_iterations=30, seed=i) for (i, name) in enumerate(p.name for p in game.board.players)}
+    (prompts, _) = game.begin_game()
+    while prompts:
+        (name, prompt) = min(prompts.items())
+        (new_prompts, _) = bots[name].act(game, prompt)
+        # prompts with a single choice are answered without searching
+        assert bots[name].last_search.iterations == (30 if len(set(prompt.choices)) > 1 else 0)
+        # bots must decide within 200 ms so games with bots don't stall; 30 iterations take about 15 ms at most
+        assert bots[name].last_search.seconds < DECISION_BUDGET
+        if new_prompts is None:
+            del prompts[name]
+        else:
+            prompts = dict(new_prompts)
+    assert type(game.stage) is GameOver
+
+
+def test_no_legal_choice_is_a_game_error():
+    game = new_game(5, seed=4)
+    game.begin_game()
+    for _ in game.board.players:
+        game.perform_action("ack_identity", "Got it!")
+    board = game.board
+    president = board.get_president().name
+
+    position = Position(board, game.stage)
+    position.choices = [president]
+    with pytest.raises(NoLegalChoiceError):
+        position.play_random(random.Random(0))
+    with pytest.raises(NoLegalChoiceError):
+        MCTSBot(president, seed=0).descend(Node(), position, LIBERAL)
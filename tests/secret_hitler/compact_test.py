@@ -0,0 +1,43 @@
+"""tests for secret_hitler.compact"""
+
+import random
+
+from secret_hitler.compact import CompactState
+from secret_hitler.game import Game
+from secret_hitler.stages import IllegalActionError
+
+
+def test_round_trip_through_a_game():
+    rng = random.Random(3737)
+    game = Game(random.Random(42))
+    for i in range(6):
+        game.add_player(f"p{i}")
+    (prompts, _) = game.begin_game()
+    while prompts:
+        state = CompactState.from_board(game.board, game.stage)
+        board_rng = random.Random()
+        board_rng.setstate(game.board.rng.getstate())
+        board = state.to_board(board_rng)
+        stage = state.to_stage(board)
+        assert type(stage) is type(game.stage)
+        assert CompactState.from_board(board, stage) == state
+        assert CompactState.unpack(state.pack()) == state
+        assert board.get_full_state() == game.board.get_full_state()
+
+        (user, prompt) = next(iter(prompts.items()))
+        choices = list(prompt.choices)
+        rng.shuffle(choices)
+        for choice in choices:
+            try:
+                (new_prompts, _) = game.perform_action(prompt.method, choice)
+                # the restored state continues exactly like the original
+                next_stage = stage.perform_action(prompt.method, choice)
+                assert CompactState.from_board(board, next_stage) == CompactState.from_board(game.board, game.stage)
+                break
+            except IllegalActionError:
+                pass
+        if new_prompts is not None:
+            prompts = new_prompts
+        else:
+            del prompts[user]
+    assert CompactState.from_board(game.board, game.stage).winner != 0
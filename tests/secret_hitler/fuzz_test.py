@@ -32,7 +32,7 @@ def test_fuzz(cmdseedopt, repeat_id):
         random.shuffle(actionable_users)
         for user in actionable_users:
             action = prompts[user].method
-            choices = prompts[user].choices
+            choices = list(prompts[user].choices)
             # perform action with the first allowable random choice
             random.shuffle(choices)
             able_to_perform_action = False
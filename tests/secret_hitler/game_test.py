@@ -0,0 +1,97 @@
+"""tests for secret_hitler.game"""
+
+import random
+from typing import Dict, List, Tuple
+
+import pytest
+
+from secret_hitler.compact import CompactState
+from secret_hitler.exceptions import GameError
+from secret_hitler.game import Game
+from secret_hitler.stages import IllegalActionError, GameOver
+
+
+def play(game: Game, prompts, rng: random.Random, max_actions=None):
+    """play random legal actions until the game ends. Returns the actions performed and the pending prompts."""
+    actions: List[Tuple[str, str]] = []
+    while prompts and len(actions) != max_actions:
+        (user, prompt) = min(prompts.items())
+        choices = sorted(prompt.choices)
+        rng.shuffle(choices)
+        for choice in choices:
+            try:
+                (new_prompts, _) = game.perform_action(prompt.method, choice)
+                actions.append((prompt.method, choice))
+                break
+            except IllegalActionError:
+                pass
+        if new_prompts is None:
+            del prompts[user]
+        else:
+            prompts = dict(new_prompts)
+    return (actions, prompts)
+
+
+def test_snapshot_restore_replays_identically():
+    game = Game(random.Random(7))
+    for i in range(6):
+        game.add_player(f"p{i}")
+    (prompts, _) = game.begin_game()
+    # the 8th action is the first vote for a chancellor
+    (_, prompts) = play(game, dict(prompts), random.Random(1), max_actions=8)
+    snapshot = game.snapshot()
+    start = CompactState.from_board(game.board, game.stage)
+    assert len(game.stage.votes) == 1
+
+    (first, _) = play(game, dict(prompts), random.Random(2))
+    end = CompactState.from_board(game.board, game.stage)
+    assert type(game.stage) is GameOver
+
+    for _ in range(2):
+        game.restore(snapshot)
+        assert CompactState.from_board(game.board, game.stage) == start
+        assert play(game, dict(prompts), random.Random(2))[0] == first
+        assert CompactState.from_board(game.board, game.stage) == end
+
+
+def test_perform_actions_matches_one_by_one():
+    games = [Game(random.Random(3)) for _ in range(2)]
+    for game in games:
+        for i in range(7):
+            game.add_player(f"p{i}")
+        (prompts, _) = game.begin_game()
+        # acks and the nomination
+        (_, prompts) = play(game, dict(prompts), random.Random(4), max_actions=8)
+        assert {prompt.method for prompt in prompts.values()} == {"vote_for_chancellor"}
+    votes = [(player, "vote_for_chancellor", "ja" if i % 3 else "nein") for (i, player) in enumerate(sorted(prompts))]
+
+    with pytest.raises(IllegalActionError):
+        games[0].perform_action("vote_for_chancellor", "maybe")
+    (batch_prompts, batch_updates) = games[0].perform_actions(votes)
+    updates: Dict = dict()
+    for (_, action, choice) in votes:
+        (one_prompts, one_updates) = games[1].perform_action(action, choice)
+        updates.update(one_updates)
+    assert batch_updates == updates
+    assert {p: str(prompt) for (p, prompt) in batch_prompts.items()} == {p: str(prompt) for (p, prompt) in one_prompts.items()}
+    (batched, one_by_one) = (CompactState.from_board(game.board, game.stage) for game in games)
+    assert batched == one_by_one
+
+
+@pytest.mark.parametrize("bad_vote", [("p3", "vote_for_chancellor", "maybe"), ("p0", "vote_for_chancellor", "ja"),
+                                      ("p7", "vote_for_chancellor", "ja")])
+def test_perform_actions_is_all_or_nothing(bad_vote):
+    game = Game(random.Random(3))
+    for i in range(7):
+        game.add_player(f"p{i}")
+    (prompts, _) = game.begin_game()
+    (_, prompts) = play(game, dict(prompts), random.Random(4), max_actions=8)
+    before = CompactState.from_board(game.board, game.stage)
+    rng_state = game.board.rng.getstate()
+    # one bad vote among good ones: not a vote, a player voting twice, a player not in the game
+    votes = [(player, "vote_for_chancellor", "ja") for player in sorted(prompts)[:-1]] + [bad_vote]
+
+    with pytest.raises(GameError):
+        game.perform_actions(votes)
+    assert CompactState.from_board(game.board, game.stage) == before
+    assert game.board.rng.getstate() == rng_state and game.board.extract_updates() == {}
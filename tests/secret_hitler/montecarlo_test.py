@@ -0,0 +1,55 @@
+"""tests for secret_hitler.montecarlo, validated against the scalar Board rules"""
+
+from math import comb
+import random
+
+import pytest
+
+from secret_hitler.board import Board, Faction, Tile
+from secret_hitler.sim import simulate
+
+np = pytest.importorskip("numpy")
+montecarlo = pytest.importorskip("secret_hitler.montecarlo")
+
+
+def test_next_draw_matches_hypergeometric():
+    board = Board(random.Random(0))
+    # 6 liberal and 11 fascist tiles: P(at least 2 fascist tiles in 3)
+    exact = (comb(11, 2) * comb(6, 1) + comb(11, 3)) / comb(17, 3)
+    assert montecarlo.prob_next_draw(board, 2, 200000, seed=1) == pytest.approx(exact, abs=0.005)
+
+
+def test_next_draw_recycles_discards():
+    board = Board(random.Random(0))
+    board.unused_tiles = [Tile.FASCIST_POLICY]
+    board.discarded_tiles = [Tile.LIBERAL_POLICY, Tile.LIBERAL_POLICY, Tile.FASCIST_POLICY]
+    # the fascist tile on top, then two of the three shuffled discards
+    assert montecarlo.prob_next_draw(board, 2, 200000, seed=1) == pytest.approx(2 / 3, abs=0.005)
+    assert montecarlo.prob_next_draw(board, 3, 200000, seed=1) == 0
+
+
+def test_tiles_are_conserved():
+    deck = montecarlo.DeckBatch.new(1000, np.random.default_rng(3))
+    mask = np.ones(1000, dtype=bool)
+    for _ in range(10):
+        drawn = deck.draw_three_tiles(mask)
+        deck.discard(drawn[:, 0], mask)
+        deck.discard(drawn[:, 1], mask)
+    enacted = 10
+    assert np.all(deck.num_unused() + deck.discarded.sum(axis=1) == montecarlo.DECK_SIZE - enacted)
+
+
+@pytest.mark.parametrize("num_players", [5, 6])
+def test_random_play_matches_simulator(num_players):
+    vectorized = montecarlo.simulate_random_play(num_players, 100000, seed=num_players)
+    scalar = simulate(range(3000), num_players)
+    fascist_rate = sum(r.winner == Faction.FASCIST for r in scalar) / len(scalar)
+    mean_presidencies = sum(r.num_presidencies for r in scalar) / len(scalar)
+    assert vectorized.win_rate(Faction.FASCIST) == pytest.approx(fascist_rate, abs=0.03)
+    assert np.all((vectorized.liberal_progress == 5) | (vectorized.fascist_progress == 6))
+    assert float(vectorized.num_presidencies.mean()) == pytest.approx(mean_presidencies, rel=0.05)
+
+
+def test_unimplemented_powers_are_rejected():
+    with pytest.raises(montecarlo.UnimplementedFeature):
+        montecarlo.simulate_random_play(9, 10)
@@ -0,0 +1,44 @@
+"""tests for secret_hitler.sim"""
+
+from secret_hitler.board import Faction
+from secret_hitler.player import Identity
+from secret_hitler.sim import simulate, simulate_batch, run_parallel, random_policy, first_choice_policy
+
+
+def test_games_reach_a_winner():
+    for num_players in (5, 6):
+        for result in simulate(range(200), num_players):
+            assert result.error is None
+            assert result.winner in (Faction.LIBERAL, Faction.FASCIST)
+
+
+def test_same_seed_same_outcome():
+    assert simulate(range(50), 5) == simulate(range(50), 5)
+
+
+def test_policy_per_identity():
+    policies = {Identity.LIBERAL: random_policy,
+                Identity.FASCIST: first_choice_policy,
+                Identity.HITLER: first_choice_policy}
+    results = simulate(range(50), 6, policies)
+    assert all(r.winner is not None for r in results)
+
+
+def test_votes_follow_the_stage_rules():
+    def maybe_policy(board, player, action, choices, rng):
+        return "maybe" if action == "vote_for_chancellor" else random_policy(board, player, action, choices, rng)
+    results = simulate(range(5), 5, maybe_policy)
+    assert all(r.winner is None and "maybe is not a vote" in r.error for r in results)
+
+
+def test_unimplemented_power_is_reported():
+    results = simulate(range(50), 9)
+    assert any(r.error is not None and r.winner is None for r in results)
+
+
+def test_parallel_independent_of_worker_count():
+    sequential = simulate_batch(1234, 0, 300, 5)
+    assert run_parallel(1234, 300, 5, max_workers=1, batch_size=300) == sequential
+    assert run_parallel(1234, 300, 5, max_workers=3, batch_size=40) == sequential
+    assert sequential.num_games == 300
+    assert sum(sequential.wins.values()) == 300
@@ -0,0 +1,56 @@
+"""tests for secret_hitler.stages"""
+
+import random
+
+import pytest
+
+from secret_hitler.board import Board
+from secret_hitler.game import Game
+from secret_hitler.sim import PENDING_ACTIONS
+from secret_hitler.stages import GameOver, IllegalActionError, NewPresident, RevealIdentities, Stage
+
+
+def test_action_tables():
+    assert set(RevealIdentities.user_actions) == {"ack_identity"}
+    for stage in Stage.all_stages:
+        for (name, handler) in stage.user_actions.items():
+            assert stage.__dict__[name] is handler
+
+
+@pytest.mark.parametrize("action", ["no_such_action", "prompts", "copy", "__init__"])
+def test_only_user_actions_are_dispatched(action):
+    game = Game(random.Random(0))
+    for i in range(5):
+        game.add_player(f"p{i}")
+    (prompts, _) = game.begin_game()
+    assert {prompt.method for prompt in prompts.values()} == {"ack_identity"}
+    with pytest.raises(IllegalActionError, match="Action does not exist"):
+        game.perform_action(action, "Got it!")
+    game.perform_action("ack_identity", "Got it!")
+    assert game.stage.num_identity_acks == 1
+
+
+@pytest.mark.parametrize("num_players", [5, 6])
+def test_eligible_nominees_are_the_accepted_ones(num_players):
+    rng = random.Random(num_players)
+    for seed in range(20):
+        board = Board(random.Random(seed))
+        for i in range(num_players):
+            board.add_player(f"p{i}")
+        board.begin_game()
+        stage: Stage = RevealIdentities(board)
+        for _ in range(100):
+            if type(stage) is NewPresident:
+                # nominating does not change the board, so every nominee can be tried on the same one
+                accepted = []
+                for name in board.get_player_names():
+                    try:
+                        stage.copy().nominate_chancellor(name)
+                        accepted.append(name)
+                    except IllegalActionError:
+                        pass
+                assert stage.eligible_nominees() == accepted
+            (_, action, choices) = PENDING_ACTIONS[type(stage)](stage)
+            stage = stage.perform_action(action, rng.choice(choices))
+            if type(stage) is GameOver:
+                break
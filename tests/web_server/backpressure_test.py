@@ -0,0 +1,64 @@
+"""tests for the outbound queues of web_server/server.py, with a client that stops reading"""
+
+import asyncio
+import json
+import socket
+
+import tornado.iostream
+from tornado.testing import gen_test
+
+from server_case import ServerTestCase  # puts web_server/ on sys.path
+import server
+
+
+def client_frame(request) -> bytes:
+    """a masked text frame, as clients must send (with a zero mask, the payload is unchanged)"""
+    payload = json.dumps(request).encode()
+    assert len(payload) < 126
+    return bytes([0x81, 0x80 | len(payload)]) + b"\0\0\0\0" + payload
+
+
+class SlowClientTest(ServerTestCase):
+    async def connect_slow_client(self) -> tornado.iostream.IOStream:
+        """a client that completes the handshake, creates a game, then never reads again"""
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stream = tornado.iostream.IOStream(sock)
+        await stream.connect(("127.0.0.1", self.get_http_port()))
+        await stream.write(b"GET /ws HTTP/1.1\r\nHost: 127.0.0.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        await stream.read_until(b"\r\n\r\n")
+        await stream.write(client_frame({"type": "new_game", "host": "slow"}))
+        while not len(server.games):
+            await asyncio.sleep(0.01)
+        return stream
+
+    @gen_test(timeout=30)
+    def test_slow_client_is_bounded_then_dropped(self):
+        stream = yield self.connect_slow_client()
+        handle = server.games[next(iter(server.games))]
+        ws = next(iter(handle.handles.values()))
+        ws.ws_connection.stream.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        server.OUTBOX_MAX_CHARS = 1 << 16
+        try:
+            # superseded state updates are merged while queued
+            for i in range(2000):
+                handle.broadcast_state({"players": [f"player{i}-{j}" for j in range(20)], "election_tracker": i})
+                yield asyncio.sleep(0)
+            assert ws.writing is not None
+            assert len(ws.outbox) == 1
+            assert json.loads(ws.outbox[0][0])["version"] == handle.version
+
+            # messages that cannot be merged pile up until the client is dropped
+            num_dropped = server.slow_clients_dropped.values.get((), 0)
+            max_queued = 0
+            for _ in range(100):
+                handle.broadcast({"type": "error", "msg": "x" * 1000})
+                max_queued = max(max_queued, ws.outbox_chars)
+                yield asyncio.sleep(0)
+            assert 0 < max_queued <= server.OUTBOX_MAX_CHARS
+            assert ws.dropped and ws.outbox_chars == 0
+            assert server.slow_clients_dropped.values[()] == num_dropped + 1
+        finally:
+            server.OUTBOX_MAX_CHARS = 1 << 20
+            stream.close()
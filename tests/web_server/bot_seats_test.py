@@ -0,0 +1,56 @@
+"""tests for web_server/bot_seats.py"""
+
+import random
+
+from tornado.testing import gen_test
+
+from server_case import ServerTestCase  # puts web_server/ on sys.path
+import bot_seats
+import server
+from sim_client import SimClient
+
+
+class BotSeatTest(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        bot_seats.BOT_TIME_BUDGET = 0.01
+
+    def tearDown(self):
+        bot_seats.BOT_TIME_BUDGET = 0.1
+        super().tearDown()
+
+    @gen_test(timeout=60)
+    def test_human_plays_with_bots(self):
+        host = SimClient(self.ws_url(), "host", random.Random(3))
+        yield host.connect()
+        host.send({"type": "new_game", "host": host.name})
+        yield host.receive_until("player_id")
+        for i in range(4):
+            host.send({"type": "add_bot", "player_name": f"bot{i}"})
+            response = yield host.receive_until("success")
+        assert response["msg"] == "Added bot. Currently 5 players in game."
+        host.send({"type": "add_bot", "player_name": "bot0"})
+        response = yield host.receive_until("error")
+        assert "already exists" in response["msg"]
+
+        host.send({"type": "begin_game"})
+        yield host.play()
+        handle = server.games[host.game_id]
+        assert handle.is_over()
+        # the game moved past prompts the host had no part in
+        assert handle.prompt_round > host.num_actions
+
+    @gen_test(timeout=30)
+    def test_only_host_adds_bots_before_the_game(self):
+        url = self.ws_url()
+        (host, guest) = (SimClient(url, "host", random.Random(4)), SimClient(url, "guest", random.Random(5)))
+        yield host.connect()
+        yield guest.connect()
+        host.send({"type": "new_game", "host": host.name})
+        yield host.receive_until("player_id")
+        guest.send({"type": "join_game", "game_id": host.game_id, "player_name": guest.name})
+        yield guest.receive_until("player_id")
+        guest.send({"type": "add_bot", "player_name": "bot"})
+        response = yield guest.receive_until("error")
+        assert response["msg"] == "Cannot add bot. Only the host can add bots."
+        assert "bot" not in server.games[host.game_id].ids
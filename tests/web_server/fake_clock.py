@@ -0,0 +1,9 @@
+"""a clock for the timer wheel and the game manager that only moves when tests set it"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
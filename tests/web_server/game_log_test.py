@@ -0,0 +1,223 @@
+"""tests for web_server/game_log.py and game recovery in web_server/server.py"""
+
+import os
+import pickle
+import random
+import sys
+
+import pytest
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+import server  # noqa: E402
+import game_log  # noqa: E402
+from game_log import GameLog, GameLogError  # noqa: E402
+
+from secret_hitler.exceptions import GameError  # noqa: E402
+
+
+def test_log_segments(tmp_path):
+    log = GameLog(str(tmp_path))
+    assert log.read_snapshot() is None
+    log.start_segment({"state": 1})
+    log.append(["n", "g1", "host", 7])
+    log.append(["b", "g1"])
+    log.start_segment({"state": 2})
+    log.append(["a", "g1", "player1", "vote", "ja"])
+    log.close()
+    # simulate a crash in the middle of a write
+    with open(log.path("events", log.segment), "a") as f:
+        f.write('["a","g1",')
+
+    recovered = GameLog(str(tmp_path))
+    assert recovered.read_snapshot() == {"state": 2}
+    assert list(recovered.read_events()) == [["a", "g1", "player1", "vote", "ja"]]
+    assert sorted(os.listdir(tmp_path)) == ["events-2.log", "snapshot-2.pickle"]
+
+
+def test_failed_writes_stop_the_log(tmp_path, monkeypatch):
+    log = GameLog(str(tmp_path))
+    log.start_segment({})
+    log.append(["n", "g1", "host", 7])
+    log.sync()
+
+    def disk_full():
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(log, "sync_file", disk_full)
+    log.append(["b", "g1"])
+    with pytest.raises(GameLogError, match="No space left"):
+        log.sync()
+    with pytest.raises(GameLogError):
+        log.append(["e", "g1"])
+    log.close()
+
+
+def test_failed_snapshot_keeps_the_previous_one(tmp_path, monkeypatch):
+    log = GameLog(str(tmp_path))
+    log.start_segment({"state": 1})
+    log.append(["n", "g1", "host", 7])
+    log.sync()
+
+    def disk_full(segment, snapshot):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(log, "write_snapshot", disk_full)
+    log.start_segment({"state": 2})
+    log.append(["b", "g1"])
+    log.close()
+
+    recovered = GameLog(str(tmp_path))
+    assert recovered.read_snapshot() == {"state": 1}
+    assert list(recovered.read_events()) == [["n", "g1", "host", 7], ["b", "g1"]]
+
+
+def test_server_stops_logging_once_the_log_failed(tmp_path, monkeypatch):
+    log = GameLog(str(tmp_path))
+    log.start_segment({})
+    log.failure = OSError(28, "No space left on device")
+    monkeypatch.setattr(server, "events", log)
+    server.log_event(game_log.BEGIN_GAME, "g1")
+    assert server.events is None
+    assert "game_log_enabled 0" in server.metrics.registry.render()
+    server.snapshot_games()
+    log.close()
+
+
+def play_randomly(handle: server.GameHandle, rng: random.Random, num_actions: int) -> None:
+    for _ in range(num_actions):
+        if handle.is_over():
+            return
+        player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+        prompt = handle.prompts[player]
+        try:
+            handle.perform_action(handle.ids[player], prompt.method, rng.choice(prompt.choices))
+        except GameError:
+            pass
+
+
+def game_state(handle: server.GameHandle):
+    return (handle.game.get_full_state(), type(handle.game.stage), sorted(handle.prompts),
+            handle.players, handle.game.board.rng.getstate())
+
+
+def test_recover_games(tmp_path):
+    rng = random.Random(5)
+    server.games.games.clear()
+    server.events = GameLog(str(tmp_path))
+    server.snapshot_games()
+    try:
+        handles = []
+        for i in range(4):
+            handle = server.create_game("p0")
+            for name in ["p1", "p2", "p3", "p4"]:
+                handle.add_player(name, None)
+            handle.begin_game()
+            handles.append(handle)
+        for handle in handles:
+            play_randomly(handle, rng, 20)
+        server.snapshot_games()
+        for handle in handles:
+            play_randomly(handle, rng, 20)
+        evicted = handles.pop()
+        server.games.remove(evicted.game_id)
+        evicted.on_evicted()
+        expected = {handle.game_id: game_state(handle) for handle in handles}
+        server.events.sync()
+    finally:
+        server.events.close()
+        server.events = None
+        server.games.games.clear()
+
+    assert server.recover_games(GameLog(str(tmp_path))) == 0
+    try:
+        assert {game_id: game_state(server.games[game_id]) for game_id in server.games} == expected
+    finally:
+        server.games.games.clear()
+
+
+def test_recover_from_snapshot_taken_while_collecting_votes(tmp_path):
+    server.games.games.clear()
+    server.events = GameLog(str(tmp_path))
+    server.snapshot_games()
+    try:
+        handle = server.create_game("p0")
+        for name in ["p1", "p2", "p3", "p4"]:
+            handle.add_player(name, None)
+        handle.begin_game()
+        for player in sorted(handle.prompts):
+            handle.perform_action(handle.ids[player], "ack_identity", "Got it!")
+        (president, prompt) = next(iter(handle.prompts.items()))
+        handle.perform_action(handle.ids[president], prompt.method, next(c for c in prompt.choices if c != president))
+        voters = sorted(handle.prompts)
+        handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "ja")
+        # the collected vote is not logged until every vote is in, so the snapshot leaves it out
+        server.snapshot_games()
+        for voter in voters[1:]:
+            handle.perform_action(handle.ids[voter], "vote_for_chancellor", "ja")
+        expected = game_state(handle)
+        server.events.sync()
+    finally:
+        server.events.close()
+        server.events = None
+        server.games.games.clear()
+
+    assert server.recover_games(GameLog(str(tmp_path))) == 0
+    try:
+        assert game_state(server.games[handle.game_id]) == expected
+    finally:
+        server.games.games.clear()
+
+
+class PlainValuesOnly(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"snapshot holds an object of {module}.{name}")
+
+
+def test_snapshots_hold_plain_values(tmp_path):
+    server.games.games.clear()
+    server.events = GameLog(str(tmp_path))
+    server.snapshot_games()
+    try:
+        handle = server.create_game("p0")
+        for name in ["p1", "p2", "p3", "p4"]:
+            handle.add_player(name, None, bot=name == "p4")
+        handle.begin_game()
+        play_randomly(handle, random.Random(1), 10)
+        server.snapshot_games()
+        server.events.sync()
+        with open(server.events.path("snapshot", server.events.segment), "rb") as f:
+            (version, snapshot) = PlainValuesOnly(f).load()
+    finally:
+        server.events.close()
+        server.events = None
+        server.games.games.clear()
+    assert version == game_log.SNAPSHOT_VERSION
+    assert list(snapshot) == [handle.game_id]
+
+
+def test_snapshots_of_other_layouts_are_refused(tmp_path):
+    log = GameLog(str(tmp_path))
+    log.start_segment({})
+    log.close()
+    with open(log.path("snapshot", log.segment), "wb") as f:
+        pickle.dump((game_log.SNAPSHOT_VERSION + 1, {}), f)
+    with pytest.raises(ValueError, match="layout version"):
+        GameLog(str(tmp_path)).read_snapshot()
+
+
+def test_rejected_events_are_counted(tmp_path):
+    log = GameLog(str(tmp_path))
+    log.start_segment({})
+    log.append(["n", "g1", "p0", 7])
+    for name in ["p0", "p1", "p2", "p3", "p4"]:
+        log.append(["j", "g1", name, name])
+    log.append(["b", "g1"])
+    log.append(["a", "g1", "p0", "vote_for_chancellor", "maybe"])
+    log.close()
+    server.games.games.clear()
+    num_rejected = server.replay_failures.values.get(("RequestError",), 0)
+    try:
+        assert server.recover_games(GameLog(str(tmp_path))) == 1
+        assert server.replay_failures.values[("RequestError",)] == num_rejected + 1
+        assert server.games["g1"].has_begun
+    finally:
+        server.games.games.clear()
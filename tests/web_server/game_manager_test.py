@@ -0,0 +1,87 @@
+"""tests for web_server/game_manager.py"""
+
+import os
+import sys
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+
+from secret_hitler.game import Game  # noqa: E402
+
+from game_manager import GameManager, estimate_size  # noqa: E402
+from timer_wheel import TimerWheel  # noqa: E402
+
+from fake_clock import FakeClock  # noqa: E402
+
+
+class FakeHandle:
+    def __init__(self):
+        self.game = Game()
+        self.over = False
+        self.evicted = False
+
+    def is_over(self):
+        return self.over
+
+    def on_evicted(self):
+        self.evicted = True
+
+
+def test_evicts_idle_and_finished_games():
+    clock = FakeClock()
+    manager = GameManager(max_games=3, idle_ttl=100, game_over_ttl=10, clock=clock)
+    (idle, active, over) = (FakeHandle(), FakeHandle(), FakeHandle())
+    ids = [manager.add(h) for h in (idle, active, over)]
+    assert manager.is_full()
+
+    clock.now = 50
+    manager.touch(active)
+    over.over = True
+    manager.touch(over)
+    assert manager.evict_expired() == []
+
+    clock.now = 60
+    assert manager.evict_expired() == [ids[2]]
+    assert over.evicted
+    clock.now = 120
+    assert manager.evict_expired() == [ids[0]]
+    assert ids[1] in manager and not manager.is_full()
+    assert manager.stats() == {"games": 1, "max_games": 3, "games_over": 0, "games_created": 3, "games_evicted": 2}
+
+
+def test_memory_estimate_counts_each_game():
+    clock = FakeClock()
+    manager = GameManager(max_games=10, idle_ttl=100, game_over_ttl=10, clock=clock)
+    handle = FakeHandle()
+    manager.add(handle)
+    for i in range(5):
+        handle.game.add_player(f"p{i}")
+    stats = manager.stats(include_memory=True)
+    assert stats["game_bytes_total"] == stats["game_bytes_max"] == estimate_size(handle.game) > 0
+
+
+def test_timer_wheel_evicts_games_once_expired():
+    clock = FakeClock()
+    wheel = TimerWheel(1, clock=clock)
+    manager = GameManager(max_games=3, idle_ttl=100, game_over_ttl=10, clock=clock, wheel=wheel)
+    (idle, active, over) = (FakeHandle(), FakeHandle(), FakeHandle())
+    ids = [manager.add(h) for h in (idle, active, over)]
+
+    clock.now = 50
+    manager.touch(active)
+    over.over = True
+    manager.touch(over)
+    wheel.advance()
+    assert manager.num_evicted == 0
+
+    clock.now = 60
+    wheel.advance()
+    assert over.evicted and ids[2] not in manager
+    clock.now = 100
+    wheel.advance()
+    assert idle.evicted and ids[1] in manager
+    # the timer of a touched game is re-armed for the rest of its ttl
+    clock.now = 150
+    wheel.advance()
+    assert active.evicted and len(manager) == 0 and len(wheel) == 0
+    assert manager.num_evicted == 3
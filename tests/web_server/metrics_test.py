@@ -0,0 +1,32 @@
+"""tests for web_server/metrics.py"""
+
+import os
+import sys
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+import metrics  # noqa: E402
+
+
+def test_render():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ("type",))
+    latency = registry.histogram("latency_seconds", "Latency")
+    latency.buckets = (0.1, 1.0)
+    registry.gauge("games", "Games", lambda: 3)
+    requests.inc(("vote",))
+    requests.inc(("vote",))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{type="vote"} 2' in lines
+    assert [line for line in lines if line.startswith("latency_seconds")] == [
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3.0',
+    ]
+    assert "games 3" in lines
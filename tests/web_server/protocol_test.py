@@ -0,0 +1,58 @@
+"""tests for the message encodings of web_server/protocol.py"""
+
+import os
+import re
+import sys
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+import protocol  # noqa: E402
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "..", "web_server", "ws_schema.md")
+
+# an example value for each field type in ws_schema.md
+EXAMPLE_VALUES = {
+    "string": "some text",
+    "int": 7,
+    "List[string]": ["ja", "nein"],
+    "Object": {"liberal_progress": 2, "election_tracker": 0, "winner": "liberal"},
+}
+
+
+def documented_responses():
+    """an example of every response type in ws_schema.md, with all of its fields"""
+    with open(SCHEMA) as f:
+        schema = f.read()
+    responses = schema.split("## Types of responses")[1].split("\n## ")[0]
+    examples = []
+    for section in responses.split("\n### ")[1:]:
+        (message_type, body) = section.split("\n", 1)
+        message = {"type": message_type.strip()}
+        for (field, field_type) in re.findall(r"^- (\w+): ([\w\[\]\\]+)", body, re.MULTILINE):
+            message[field] = EXAMPLE_VALUES[field_type.replace("\\", "").rstrip(".,")]
+        examples.append(message)
+    return examples
+
+
+def test_documented_responses_round_trip():
+    examples = documented_responses()
+    assert {message["type"] for message in examples} == set(protocol.COMPACT_MESSAGES)
+    for message in examples:
+        encoded = protocol.encode_compact(message)
+        assert encoded.startswith("[")
+        assert protocol.decode_compact(encoded) == message
+
+
+def test_unregistered_type_is_sent_as_json():
+    message = {"type": "chat", "msg": "hi"}
+    encoded = protocol.encode_compact(message)
+    assert encoded.startswith("{")
+    assert protocol.decode_compact(encoded) == message
+
+
+def test_frame_sizes_are_utf8_bytes():
+    assert protocol.frame_size('["e","déjà"]') == len('["e","déjà"]'.encode()) == 14
+    encoded = protocol.EncodedMessage(protocol.state_update_message({"players": ["Zoë", "p1"]}, 3))
+    for encoding in protocol.ENCODINGS:
+        frame = encoded.encode(encoding)
+        assert encoded.sizes[encoding] == len(frame.encode())
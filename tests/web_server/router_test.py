@@ -0,0 +1,77 @@
+"""tests for web_server/router.py"""
+
+import random
+
+import tornado.httpserver
+import tornado.testing
+from tornado.testing import gen_test
+
+from server_case import ServerTestCase, fresh_application  # puts web_server/ on sys.path
+import protocol
+import router
+import server
+from sim_client import SimClient, play_game
+
+NUM_SHARDS = 2
+
+
+def test_shard_of_is_stable_and_spreads_games():
+    game_ids = [f"game-{i}" for i in range(1000)]
+    shards = [router.shard_of(game_id, NUM_SHARDS) for game_id in game_ids]
+    assert shards == [router.shard_of(game_id, NUM_SHARDS) for game_id in game_ids]
+    assert 400 < shards.count(0) < 600
+
+
+class RouterTest(ServerTestCase):
+    def get_app(self):
+        # both shards are served by this process, which is enough to exercise the routing
+        shard_application = fresh_application()
+        server.ACCEPT_ROUTED_GAME_IDS = True
+        shard_urls = []
+        for _ in range(NUM_SHARDS):
+            (sock, port) = tornado.testing.bind_unused_port()
+            tornado.httpserver.HTTPServer(shard_application).add_sockets([sock])
+            shard_urls.append(f"ws://127.0.0.1:{port}/ws")
+        return router.make_router_application(shard_urls)
+
+    def tearDown(self):
+        server.ACCEPT_ROUTED_GAME_IDS = False
+        super().tearDown()
+
+    @gen_test(timeout=30)
+    def test_game_through_router(self):
+        clients = yield play_game(self.ws_url(), 5, random.Random(3))
+        assert all(c.game_over() for c in clients)
+        # the game is registered under the id the router picked and told the clients
+        assert list(server.games) == [clients[0].game_id]
+        assert server.games[clients[0].game_id].is_over()
+
+    @gen_test(timeout=30)
+    def test_action_before_joining_a_game(self):
+        client = SimClient(self.ws_url(), "p0", random.Random(4))
+        yield client.connect()
+        client.send({"type": "user_action", "action": "vote", "choice": "ja"})
+        response = yield client.receive()
+        assert response == {"type": "error", "msg": "Not in a game."}
+        client.send({"type": "join_game", "player_name": "p0"})
+        response = yield client.receive()
+        assert response["type"] == "error"
+        client.close()
+
+    @gen_test(timeout=30)
+    def test_failed_join_keeps_the_client_in_its_game(self):
+        for encoding in protocol.ENCODINGS:
+            client = SimClient(self.ws_url(), "p0", random.Random(5), encoding)
+            yield client.connect()
+            client.send({"type": "new_game", "host": "p0"})
+            yield client.receive_until("player_id")
+            client.send({"type": "join_game", "game_id": "no-such-game", "player_name": "p0"})
+            response = yield client.receive()
+            assert response == {"type": "error", "msg": "Game does not exist."}
+            # still the host of the game it created
+            client.send({"type": "add_bot", "player_name": "bot"})
+            response = yield client.receive()
+            while response["type"] not in ("success", "error"):
+                response = yield client.receive()
+            assert response["type"] == "success"
+            client.close()
@@ -0,0 +1,26 @@
+"""shared setup for the tests that run web_server/server.py
+
+Importing this module puts web_server/ on sys.path, since the server modules are run as scripts from there.
+"""
+
+import os
+import sys
+
+from tornado.testing import AsyncHTTPTestCase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+import server  # noqa: E402
+
+
+def fresh_application():
+    """the server's application, without the games of earlier tests"""
+    server.games.games.clear()
+    return server.application
+
+
+class ServerTestCase(AsyncHTTPTestCase):
+    def get_app(self):
+        return fresh_application()
+
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self.get_http_port()}/ws"
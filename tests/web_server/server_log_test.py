@@ -0,0 +1,45 @@
+"""tests for web_server/server_log.py"""
+
+import io
+import logging
+import logging.handlers
+import os
+import sys
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+import server_log  # noqa: E402
+
+
+class Owner:
+    def __init__(self):
+        self.num_lookups = 0
+
+    def log_context(self):
+        self.num_lookups += 1
+        return {"game_id": "g1", "player_id": "p1"}
+
+
+def test_queued_logging_with_context():
+    stream = io.StringIO()
+    root = logging.getLogger()
+    level = root.level
+    server_log.configure(logging.INFO, stream)
+    try:
+        owner = Owner()
+        log = server_log.ContextAdapter(logging.getLogger("test"), owner)
+        log.debug("not formatted: %s", owner)
+        assert owner.num_lookups == 0
+        log.info("action %s", "vote")
+        logging.getLogger("test").warning("no context")
+    finally:
+        server_log.flush()
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        root.setLevel(level)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("INFO test [game=g1 player=p1] action vote")
+    assert lines[1].endswith("WARNING test [game=- player=-] no context")
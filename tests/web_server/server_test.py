@@ -0,0 +1,289 @@
+"""end-to-end tests of web_server/server.py over WebSocket"""
+
+from collections import deque
+from concurrent.futures import Future
+import json
+import random
+
+import pytest
+from tornado.testing import gen_test
+
+from server_case import ServerTestCase  # puts web_server/ on sys.path
+import protocol
+import server
+from sim_client import SimClient, play_game
+from timer_wheel import TimerWheel
+
+from secret_hitler.board import Vote
+from secret_hitler.exceptions import GameError
+from secret_hitler.stages import ChancellorNominated, NewPresident, RevealIdentities
+
+from fake_clock import FakeClock
+
+
+class GameFlowTest(ServerTestCase):
+    @gen_test(timeout=30)
+    def test_simulated_clients_finish_a_game(self):
+        clients = yield play_game(self.ws_url(), 5, random.Random(1))
+        assert all(c.game_over() for c in clients)
+        assert len(server.games) == 1
+        game_id = clients[0].game_id
+        assert server.games[game_id].is_over()
+
+    @gen_test(timeout=30)
+    def test_metrics(self):
+        yield play_game(self.ws_url(), 5, random.Random(1))
+        response = yield self.http_client.fetch(self.get_url("/metrics"))
+        lines = response.body.decode().splitlines()
+        assert any(line.startswith('ws_request_seconds_count{type="user_action"}') for line in lines)
+        assert any(line.startswith("ws_sent_bytes_total ") for line in lines)
+        assert any(line.startswith('stage_action_seconds_count{stage="ChancellorNominated",action="vote_for_chancellor"}')
+                   for line in lines)
+
+    @gen_test(timeout=30)
+    def test_evicted_game_disconnects_players(self):
+        client = SimClient(self.ws_url(), "host", random.Random(2))
+        yield client.connect()
+        client.send({"type": "new_game", "host": "host"})
+        yield client.receive_until("player_id")
+        server.games.idle_ttl = 0
+        try:
+            assert server.games.evict_expired() == [client.game_id]
+        finally:
+            server.games.idle_ttl = server.GAME_IDLE_TTL
+        message = yield client.conn.read_message()
+        assert message is None
+
+    @gen_test(timeout=30)
+    def test_compact_encoding(self):
+        clients = yield play_game(self.ws_url(), 5, random.Random(1), "compact")
+        assert all(c.game_over() for c in clients)
+        verbose = yield play_game(self.ws_url(), 5, random.Random(1))
+        messages = [message for c in verbose for message in c.received]
+        assert [protocol.decode_compact(protocol.encode_compact(m)) for m in messages] == messages
+        compact_size = sum(len(protocol.encode_compact(m)) for m in messages)
+        assert compact_size < 0.6 * sum(len(protocol.encode_json(m)) for m in messages)
+
+
+def fake_connection(encoding):
+    # no request behind it, so tornado's initialization is skipped
+    ws = server.WSHandler.__new__(server.WSHandler)
+    ws.game = None
+    ws.player_id = None
+    ws.log = server.ContextAdapter(server.logger, ws)
+    ws.encoding = encoding
+    ws.frames = []
+    ws.write_message = ws.frames.append
+    return ws
+
+
+def test_evicted_game_is_closed_after_queued_messages():
+    ws = fake_connection("json")
+    pending: Future = Future()     # calls back on set_result, without an event loop
+    ws.write_message = lambda frame: ws.frames.append(frame) or (pending if len(ws.frames) == 1 else None)
+    ws.closed = False
+    ws.close = lambda: setattr(ws, "closed", True)
+    handle = server.GameHandle("p0")
+    ws.game = handle
+    handle.add_player("p0", ws)
+    handle.broadcast_state({"election_tracker": 1})
+    handle.on_evicted()
+    # the last update is still queued behind the first one, which is being written
+    assert not ws.closed and len(ws.frames) == 1
+    pending.set_result(None)
+    assert ws.closed and json.loads(ws.frames[-1])["updates"] == {"election_tracker": 1}
+
+
+def test_broadcast_encodes_once_per_encoding():
+    handle = server.GameHandle("p0")
+    connections = [fake_connection(encoding) for encoding in ["json", "compact", "json", "compact"]]
+    for (i, ws) in enumerate(connections):
+        handle.add_player(f"p{i}", ws)
+    handle.begin_game()
+    # begin_game: one frame per encoding for game_begun and the full state, identities are per player
+    full_state = [ws.frames[-1] for ws in connections]
+    assert full_state[0] is full_state[2] and full_state[1] is full_state[3]
+    assert protocol.decode_compact(full_state[1]) == json.loads(full_state[0])
+
+
+def play_randomly(handle, rng, num_actions):
+    for _ in range(num_actions):
+        player = rng.choice(sorted(set(handle.prompts) - handle.acted))
+        prompt = handle.prompts[player]
+        try:
+            handle.perform_action(handle.ids[player], prompt.method, rng.choice(prompt.choices))
+        except GameError:
+            pass
+
+
+def test_reconnect_receives_changes_since_version():
+    rng = random.Random(6)
+    handle = server.GameHandle("p0")
+    connections = [fake_connection("json") for _ in range(5)]
+    for (i, ws) in enumerate(connections):
+        handle.add_player(f"p{i}", ws)
+    handle.begin_game()
+    seen = handle.version
+    play_randomly(handle, rng, 40)
+    assert handle.version > seen
+
+    expected = dict()
+    for frame in connections[0].frames:
+        message = json.loads(frame)
+        if message.get("version", 0) > seen:
+            expected.update(message["updates"])
+    ws = fake_connection("json")
+    handle.sync_state(ws, seen)
+    assert json.loads(ws.frames[-1]) == {"type": "state_update", "updates": expected, "version": handle.version}
+
+    # nothing to send when up to date, the full state once the history no longer reaches back far enough
+    handle.sync_state(ws, handle.version)
+    assert len(ws.frames) == 1
+    handle.history = deque(list(handle.history)[-1:], maxlen=1)
+    handle.sync_state(ws, seen)
+    assert json.loads(ws.frames[-1])["updates"] == handle.get_full_state()
+
+    # clients catching up with the full state share its frame until the state changes
+    others = [fake_connection("json") for _ in range(2)]
+    for other in others:
+        handle.sync_state(other, None)
+    assert others[0].frames[-1] is others[1].frames[-1] is ws.frames[-1]
+    play_randomly(handle, rng, 5)
+    handle.sync_state(others[0], None)
+    expected = {"type": "state_update", "updates": handle.get_full_state(), "version": handle.version}
+    assert json.loads(others[0].frames[-1]) == expected
+
+
+def start_vote(handle):
+    """acks every identity and nominates a chancellor, returns the players then prompted to vote"""
+    for player in sorted(handle.prompts):
+        handle.perform_action(handle.ids[player], "ack_identity", "Got it!")
+    (president, prompt) = next(iter(handle.prompts.items()))
+    handle.perform_action(handle.ids[president], prompt.method, next(c for c in prompt.choices if c != president))
+    return sorted(handle.prompts)
+
+
+def test_votes_are_collected_then_performed_together():
+    handle = server.GameHandle("p0")
+    connections = [fake_connection("json") for _ in range(5)]
+    for (i, ws) in enumerate(connections):
+        handle.add_player(f"p{i}", ws)
+    handle.begin_game()
+    voters = start_vote(handle)
+    assert {prompt.method for prompt in handle.prompts.values()} == {"vote_for_chancellor"}
+    sent = [len(ws.frames) for ws in connections]
+    with pytest.raises(server.RequestError):
+        handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "maybe")
+    for voter in voters[:-1]:
+        handle.perform_action(handle.ids[voter], "vote_for_chancellor", "ja")
+    with pytest.raises(server.RequestError):
+        handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "nein")
+    # nothing is performed nor sent before the last vote
+    assert handle.game.stage.votes == []
+    assert [len(ws.frames) for ws in connections] == sent
+    handle.perform_action(handle.ids[voters[-1]], "vote_for_chancellor", "ja")
+    assert type(handle.game.stage).__name__ == "PresidentDecidesLegislation"
+    assert handle.collected == [] and handle.acted == set()
+
+
+def test_failed_batch_is_rolled_back_and_prompted_again(monkeypatch):
+    handle = server.GameHandle("p0")
+    for i in range(5):
+        handle.add_player(f"p{i}", fake_connection("json"))
+    handle.begin_game()
+    voters = start_vote(handle)
+    state = handle.get_full_state()
+    prompt_round = handle.prompt_round
+
+    logged = []
+    monkeypatch.setattr(server, "log_event", lambda *event: logged.append(event))
+
+    def fail(stage):
+        raise GameError("failed")
+    # fails once every vote is in
+    monkeypatch.setattr(ChancellorNominated, "count_votes", fail)
+    for voter in voters[:-1]:
+        handle.perform_action(handle.ids[voter], "vote_for_chancellor", "ja")
+    with pytest.raises(GameError):
+        handle.perform_action(handle.ids[voters[-1]], "vote_for_chancellor", "ja")
+    assert handle.game.stage.votes == [] and handle.get_full_state() == state
+    assert handle.collected == [] and handle.acted == set() and handle.prompt_round == prompt_round + 1
+    # replaying the log must not run into the rejected votes
+    assert logged == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(server, "log_event", lambda *event: logged.append(event))
+    for voter in voters:
+        handle.perform_action(handle.ids[voter], "vote_for_chancellor", "ja")
+    assert type(handle.game.stage).__name__ == "PresidentDecidesLegislation"
+    assert logged == [("a", handle.game_id, voter, "vote_for_chancellor", "ja") for voter in voters]
+
+
+def test_players_act_once_per_prompt_unbatched(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_COLLECTIVE_ACTIONS", False)
+    handle = server.GameHandle("p0")
+    for i in range(5):
+        handle.add_player(f"p{i}", fake_connection("json"))
+    handle.begin_game()
+    voters = start_vote(handle)
+    handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "ja")
+    with pytest.raises(server.RequestError):
+        handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "ja")
+    with pytest.raises(server.RequestError):
+        handle.perform_action(handle.ids[voters[1]], "nominate_chancellor", "p1")
+    assert handle.game.stage.votes == [Vote.JA]
+
+
+def test_turn_timeout_plays_default_actions(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(server, "timers", TimerWheel(server.TIMER_TICK, clock=clock))
+    handle = server.GameHandle("p0")
+    for i in range(5):
+        handle.add_player(f"p{i}", fake_connection("json"))
+    handle.begin_game()
+    handle.perform_action(handle.ids["p0"], "ack_identity", "Got it!")
+
+    # everyone else is acked for once the identities stage times out
+    clock.now = server.PROMPT_TIMEOUTS[RevealIdentities] - 1
+    server.timers.advance()
+    assert type(handle.game.stage) is RevealIdentities
+    clock.now += 1
+    server.timers.advance()
+    assert type(handle.game.stage) is NewPresident
+
+    # a random nominee, then votes against it for the players who did not vote
+    clock.now += server.DEFAULT_PROMPT_TIMEOUT
+    server.timers.advance()
+    assert type(handle.game.stage) is ChancellorNominated
+    voters = sorted(handle.prompts)
+    handle.perform_action(handle.ids[voters[0]], "vote_for_chancellor", "ja")
+    clock.now += server.PROMPT_TIMEOUTS[ChancellorNominated]
+    server.timers.advance()
+    assert type(handle.game.stage) is NewPresident
+    assert handle.game.board.election_tracker == 1
+    assert len(server.timers) == 1
+
+    handle.on_evicted()
+    assert len(server.timers) == 0
+
+
+def test_turn_timeout_outlives_rejected_default_actions(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(server, "timers", TimerWheel(server.TIMER_TICK, clock=clock))
+    handle = server.GameHandle("p0")
+    for i in range(5):
+        handle.add_player(f"p{i}", fake_connection("json"))
+    handle.begin_game()
+    voters = start_vote(handle)
+    perform_action = handle.perform_action
+
+    def stale_for_first_voter(player_id, action, choice):
+        if handle.players[player_id] == voters[0]:
+            raise server.RequestError("Cannot perform request. Expected nominate_chancellor.")
+        perform_action(player_id, action, choice)
+    monkeypatch.setattr(handle, "perform_action", stale_for_first_voter)
+    clock.now += server.PROMPT_TIMEOUTS[ChancellorNominated]
+    server.timers.advance()
+    # the other voters still got their default votes
+    assert handle.acted == set(voters[1:])
+    handle.on_evicted()
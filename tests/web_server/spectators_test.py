@@ -0,0 +1,118 @@
+"""tests for web_server/spectators.py"""
+
+import asyncio
+import json
+import random
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from server_case import ServerTestCase  # puts web_server/ on sys.path
+import server
+from sim_client import SimClient
+from spectators import Channel
+from server_test import fake_connection, play_randomly
+
+
+class Socket:
+    def __init__(self, slow=False):
+        self.encoding = "json"
+        self.frames = []
+        self.slow = slow
+        self.writing = None
+
+    def write_message(self, frame):
+        self.frames.append(frame)
+        if self.slow:
+            self.writing = asyncio.get_running_loop().create_future()
+            return self.writing
+        return None
+
+    def received(self):
+        return [json.loads(frame) for frame in self.frames]
+
+
+async def settle():
+    """let the IOLoop run the deliveries scheduled so far"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class ChannelTest(AsyncTestCase):
+    @gen_test
+    def test_updates_are_delayed_by_actions(self):
+        channel = Channel(delay=2)
+        channel.publish({"players": ["p0"]}, delayed=False)
+        socket = Socket()
+        channel.subscribe(socket)
+        channel.publish({"liberal_progress": 1})
+        channel.count_actions()
+        yield settle()
+        assert socket.received() == [{"type": "state_update", "updates": {"players": ["p0"]}, "version": 1}]
+        channel.count_actions()
+        yield settle()
+        assert socket.received()[1:] == [{"type": "state_update", "updates": {"liberal_progress": 1}, "version": 2}]
+
+    @gen_test
+    def test_slow_spectator_gets_merged_state(self):
+        channel = Channel(delay=0)
+        (slow, fast) = (Socket(slow=True), Socket())
+        channel.subscribe(slow)
+        channel.subscribe(fast)
+        for progress in range(1, 4):
+            channel.publish({"fascist_progress": progress, f"update{progress}": True})
+            yield settle()
+        assert len(fast.received()) == 3
+        assert len(slow.received()) == 1
+        slow.writing.set_result(None)
+        yield settle()
+        assert slow.received()[-1] == {
+            "type": "state_update",
+            "updates": {"fascist_progress": 3, "update1": True, "update2": True, "update3": True},
+            "version": 3,
+        }
+        assert channel.subscribers[slow].writing is slow.writing
+
+    @gen_test
+    def test_fan_out_encodes_once(self):
+        channel = Channel(delay=0)
+        sockets = [Socket() for _ in range(1000)]
+        for socket in sockets:
+            channel.subscribe(socket)
+        channel.publish({"election_tracker": 1})
+        yield settle()
+        assert all(len(socket.frames) == 1 and socket.frames[0] is sockets[0].frames[0] for socket in sockets)
+
+
+class SpectateTest(ServerTestCase):
+    @gen_test(timeout=30)
+    def test_spectator_sees_public_state_only(self):
+        handle = server.create_game("p0")
+        connections = [fake_connection("json") for _ in range(5)]
+        for (i, ws) in enumerate(connections):
+            handle.add_player(f"p{i}", ws)
+        handle.begin_game()
+        spectator = SimClient(self.ws_url(), "spectator", random.Random(0))
+        yield spectator.connect()
+        spectator.send({"type": "spectate", "game_id": handle.game_id})
+        yield spectator.receive_until("success")
+        play_randomly(handle, random.Random(1), 40)
+        while spectator.version != handle.spectators.version:
+            yield spectator.receive()
+
+        assert {message["type"] for message in spectator.received} == {"success", "state_update"}
+        assert "identity" not in spectator.state
+        assert spectator.state == handle.spectators.state
+        # the players' state, as of SPECTATOR_DELAY actions ago
+        assert set(spectator.state) == set(handle.get_full_state())
+        spectator.send({"type": "user_action", "action": "vote_for_chancellor", "choice": "ja"})
+        response = yield spectator.receive_until("error")
+        assert response["msg"] == "Not in a game."
+        # spectators cannot become players, of this game or any other
+        other = server.create_game("q0")
+        for request in [{"type": "new_game", "host": "spectator"},
+                        {"type": "join_game", "game_id": other.game_id, "player_name": "spectator"},
+                        {"type": "reconnect", "game_id": handle.game_id, "player_id": handle.ids["p0"]}]:
+            spectator.send(request)
+            response = yield spectator.receive_until("error")
+            assert response["msg"].endswith("Spectating a game.")
+        assert len(other.players) == 0 and handle.handles[handle.ids["p0"]] is connections[0]
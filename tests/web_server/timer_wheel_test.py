@@ -0,0 +1,41 @@
+"""tests for web_server/timer_wheel.py"""
+
+import math
+import os
+import random
+import sys
+
+# the server modules are run as scripts from web_server/
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web_server"))
+from timer_wheel import TimerWheel  # noqa: E402
+
+from fake_clock import FakeClock  # noqa: E402
+
+
+def test_timers_fire_on_the_first_tick_after_their_deadline():
+    clock = FakeClock()
+    # 2 levels of 4 slots only reach 16 ticks ahead, later timers wait at the top level
+    wheel = TimerWheel(0.5, slots=4, levels=2, clock=clock)
+    rng = random.Random(0)
+    fired = []
+    expected = dict()
+    timers = dict()
+    for i in range(500):
+        # timers scheduled at different times, some of them cancelled
+        clock.now += rng.choice([0, 0, 0.5, 2])
+        wheel.advance()
+        delay = rng.uniform(0, 60)
+        timers[i] = wheel.schedule(delay, lambda i=i: fired.append((i, wheel.current)))
+        expected[i] = wheel.current + max(1, math.ceil(delay / 0.5))
+        if rng.random() < 0.2:
+            wheel.cancel(timers.pop(i))
+            del expected[i]
+    fired_early = len(fired)
+    assert len(wheel) == len(timers) - fired_early
+
+    while wheel:
+        clock.now += rng.choice([0.5, 1.5, 4])
+        wheel.advance()
+    # timers fire in order on their tick, even when advancing several ticks at once
+    assert sorted(fired, key=lambda f: (f[1], f[0])) == sorted(expected.items(), key=lambda e: (e[1], e[0]))
+    assert [tick for (_, tick) in fired] == sorted(tick for (_, tick) in fired)
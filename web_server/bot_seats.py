@@ -0,0 +1,88 @@
+"""Computer players seated in games hosted by the server.
+
+A BotSeat is prompted through GameHandle.update_prompts like any player, but instead of waiting for
+a WebSocket it searches for its action with secret_hitler.bot.MCTSBot in a process pool, so searches
+neither hold the IOLoop nor compete with it for the GIL. The result is posted back to the IOLoop and
+performed like a human's action. If no decision arrives in time (e.g. every worker is busy), the
+bot plays a random choice rather than stall its game.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+import random
+from typing import Optional, Sequence
+
+import tornado.ioloop
+
+from secret_hitler.bot import MCTSBot
+from secret_hitler.compact import CompactState
+from secret_hitler.exceptions import GameError
+from secret_hitler.prompts import Prompt
+
+BOT_TIME_BUDGET = 0.1           # seconds of search per decision
+BOT_DECISION_TIMEOUT = 1.0      # seconds from prompt to action, including waiting for a free worker
+BOT_PROCESSES: Optional[int] = None     # processes searching for bots, None for all cores but the IOLoop's
+
+logger = logging.getLogger("server.bots")
+executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        # leave a core to the IOLoop
+        executor = ProcessPoolExecutor(BOT_PROCESSES or max(1, (os.cpu_count() or 1) - 1))
+    return executor
+
+
+def decide(name: str, state: CompactState, choices: Sequence[str], time_budget: float, seed: int) -> str:
+    """runs in a worker process"""
+    return MCTSBot(name, time_budget, seed=seed).search(state, choices)
+
+
+class BotSeat:
+    def __init__(self, handle, name: str, seed: Optional[int] = None):
+        self.handle = handle                            # server.GameHandle the bot plays in
+        self.name: str = name
+        self.rng: random.Random = random.Random(seed)
+        self.pending_round: Optional[int] = None        # prompt round the bot is deciding for
+
+    def on_prompt(self, prompt: Prompt, prompt_round: int) -> None:
+        if self.pending_round == prompt_round:
+            return
+        self.pending_round = prompt_round
+        tornado.ioloop.IOLoop.current().spawn_callback(self.act, prompt, prompt_round)
+
+    async def act(self, prompt: Prompt, prompt_round: int) -> None:
+        choice = None
+        if len(set(prompt.choices)) == 1:
+            choice = prompt.choices[0]
+        elif self.is_current(prompt_round):
+            state = CompactState.from_board(self.handle.game.board, self.handle.game.stage)
+            decision = asyncio.get_running_loop().run_in_executor(
+                get_executor(), decide, self.name, state, prompt.choices, BOT_TIME_BUDGET, self.rng.getrandbits(64))
+            try:
+                choice = await asyncio.wait_for(decision, BOT_DECISION_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("%s did not decide %s in time, playing at random", self.name, prompt.method)
+            except Exception as err:
+                logger.error("search of %s for %s failed: %r", self.name, prompt.method, err)
+        if not self.is_current(prompt_round):
+            # the game moved on (or was evicted) while searching
+            return
+
+        others = [c for c in dict.fromkeys(prompt.choices) if c != choice]
+        self.rng.shuffle(others)
+        for candidate in ([choice] if choice is not None else []) + others:
+            try:
+                self.handle.perform_action(self.handle.ids[self.name], prompt.method, candidate)
+                return
+            except GameError:
+                continue
+        logger.error("%s found no legal choice for %s", self.name, prompt.method)
+
+    def is_current(self, prompt_round: int) -> bool:
+        return (self.handle.prompt_round == prompt_round and self.name in self.handle.prompts
+                and self.name not in self.handle.acted and self.handle.bots.get(self.name) is self)
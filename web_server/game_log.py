@@ -0,0 +1,223 @@
+"""Durable, append-only log of the games hosted by this server process.
+
+A game is fully determined by the seed of its PRNG and the requests it accepted, so logging those
+as compact events is enough to rebuild every game after a restart by replaying them.
+Events are queued for a background thread, which writes and fsyncs them in batches, so the IOLoop never waits on
+the disk and a crash loses at most the last sync interval.
+
+The log directory holds numbered segments: snapshot-<n>.pickle holds every game as of the start
+of events-<n>.log. Recovery loads the latest snapshot and replays the events logged since, and
+starting a new segment with a fresh snapshot bounds how much there is to replay. The snapshot is pickled by the
+caller, as the games must not change while they are serialised, and written out by the background thread too.
+Snapshots only hold plain values (tuples, dicts, strings, numbers), never objects of the game engine, so that the
+engine can change without making the log unreadable.
+A snapshot that cannot be written leaves the previous one in place, with the events of both segments to replay.
+Events that cannot be written stop the log, which then raises GameLogError rather than take events it would lose.
+"""
+
+import json
+import logging
+import os
+import pickle
+import queue
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional, TextIO, Tuple, Union
+
+# event layouts, all events are JSON lists starting with the event type and the game_id
+NEW_GAME = "n"      # [NEW_GAME, game_id, host, seed]
+JOIN_GAME = "j"     # [JOIN_GAME, game_id, player_name, player_id]
+ADD_BOT = "r"       # [ADD_BOT, game_id, player_name, player_id]
+BEGIN_GAME = "b"    # [BEGIN_GAME, game_id]
+USER_ACTION = "a"   # [USER_ACTION, game_id, player_name, action, choice]
+EVICT_GAME = "e"    # [EVICT_GAME, game_id]
+
+# version of the snapshot layout: {game_id: snapshot of the game, see GameHandle.get_snapshot}.
+# To bump on any change to that layout, including CompactState.pack
+SNAPSHOT_VERSION = 1
+
+SEGMENT_FILE = re.compile(r"(events|snapshot)-(\d+)\.(log|pickle)$")
+
+logger = logging.getLogger("game_log")
+
+# what the writer thread is given: a line of the events file, a new segment as (segment, pickled snapshot),
+# an Event to set once everything before it is durable, or None to stop
+Command = Union[str, Tuple[int, bytes], threading.Event, None]
+
+
+class GameLogError(Exception):
+    """the log failed to write events, it takes no more of them"""
+    pass
+
+
+class GameLog:
+    def __init__(self, log_dir: str, sync_interval: float = 0):
+        self.log_dir: str = log_dir
+        os.makedirs(log_dir, exist_ok=True)
+        self.segment: int = max(self.segments("snapshot"), default=0)
+        self.sync_interval: float = sync_interval   # seconds between fsyncs, more events are synced at once
+        self.commands: queue.SimpleQueue = queue.SimpleQueue()
+        self.writer: Optional[threading.Thread] = None  # started by the first start_segment
+        self.failure: Optional[Exception] = None        # set by the writer thread if events could not be written
+        # only used by the writer thread
+        self.file: Optional[TextIO] = None
+        self.num_unsynced: int = 0
+
+    def path(self, kind: str, segment: int) -> str:
+        extension = "log" if kind == "events" else "pickle"
+        return os.path.join(self.log_dir, f"{kind}-{segment}.{extension}")
+
+    def segments(self, kind: str) -> List[int]:
+        found = [SEGMENT_FILE.match(name) for name in os.listdir(self.log_dir)]
+        return sorted(int(m.group(2)) for m in found if m is not None and m.group(1) == kind)
+
+    def read_snapshot(self) -> Any:
+        """state saved by the latest start_segment, or None if there is none"""
+        if self.segment == 0:
+            return None
+        with open(self.path("snapshot", self.segment), "rb") as f:
+            (version, state) = pickle.load(f)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot-{self.segment} has layout version {version}, expected {SNAPSHOT_VERSION}")
+        return state
+
+    def read_events(self) -> Iterator[List]:
+        """all events logged since the latest snapshot, in order"""
+        for segment in self.segments("events"):
+            if segment < self.segment:
+                continue
+            with open(self.path("events", segment)) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # torn write from a crash, nothing after it was synced
+                        break
+                    yield json.loads(line)
+
+    def append(self, event: List) -> None:
+        """raises GameLogError once events could not be written, as nothing appended would be durable any more"""
+        assert self.writer is not None, "start_segment before appending"
+        self.check()
+        self.commands.put(json.dumps(event, separators=(",", ":")) + "\n")
+
+    def sync(self) -> None:
+        """waits until the appended events are durable, raises GameLogError if they could not be written"""
+        if self.writer is None:
+            return
+        synced = threading.Event()
+        self.commands.put(synced)
+        synced.wait()
+        self.check()
+
+    def check(self) -> None:
+        if self.failure is not None:
+            raise GameLogError(f"failed to write the game log in {self.log_dir}: {self.failure}") from self.failure
+
+    def start_segment(self, state: Any) -> None:
+        """saves state as the new snapshot, continues logging after it and drops everything older.
+        state must reflect every event appended so far, in the layout of SNAPSHOT_VERSION.
+        It is pickled right away, the rest happens in the background.
+        """
+        self.segment += 1
+        self.commands.put((self.segment, pickle.dumps((SNAPSHOT_VERSION, state), pickle.HIGHEST_PROTOCOL)))
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write, name="game_log", daemon=True)
+            self.writer.start()
+
+    def write(self) -> None:
+        """the writer thread: carries out the commands queued, fsync'ing once per batch of them"""
+        last_sync = 0.0
+        while True:
+            batch = self.next_batch(last_sync)
+            if self.failure is None:
+                self.write_batch(batch)
+            last_sync = time.monotonic()
+            for command in batch:
+                if isinstance(command, threading.Event):
+                    command.set()
+            if None in batch:
+                self.close_file()
+                return
+
+    def next_batch(self, last_sync: float) -> List[Command]:
+        """waits for a command, then for the sync interval to be over, and returns all the commands queued by then"""
+        batch: List[Command] = [self.commands.get()]
+        time.sleep(max(0.0, last_sync + self.sync_interval - time.monotonic()))
+        while not self.commands.empty():
+            batch.append(self.commands.get())
+        return batch
+
+    def write_batch(self, batch: List[Command]) -> None:
+        try:
+            for command in batch:
+                if isinstance(command, str):
+                    assert self.file is not None
+                    self.file.write(command)
+                    self.num_unsynced += 1
+                elif isinstance(command, tuple):
+                    self.write_segment(*command)
+            self.sync_file()
+        except Exception as err:
+            # events after the failed ones would be unreadable (e.g. after a torn line) or lost in a crash anyway.
+            # The thread keeps running, whoever waits in sync must be woken up
+            logger.exception("failed to write the game log, it takes no more events")
+            self.failure = err
+
+    def sync_file(self) -> None:
+        if self.file is None or self.num_unsynced == 0:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.num_unsynced = 0
+
+    def close_file(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write_segment(self, segment: int, snapshot: bytes) -> None:
+        self.sync_file()
+        self.close_file()
+        try:
+            self.write_snapshot(segment, snapshot)
+        except OSError:
+            # the previous snapshot and its events are kept, recovery replays the events of this segment after them
+            logger.exception("failed to write snapshot %d, logging events on without it", segment)
+            self.file = open(self.path("events", segment), "a")
+            return
+        self.file = open(self.path("events", segment), "a")
+        self.sync_dir()
+
+        for kind in ("events", "snapshot"):
+            for old_segment in self.segments(kind):
+                if old_segment < segment:
+                    os.remove(self.path(kind, old_segment))
+
+    def write_snapshot(self, segment: int, snapshot: bytes) -> None:
+        snapshot_path = self.path("snapshot", segment)
+        with open(snapshot_path + ".tmp", "wb") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+    def sync_dir(self) -> None:
+        fd = os.open(self.log_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """writes out everything queued, then stops the writer thread"""
+        if self.writer is None:
+            return
+        self.commands.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def size(self) -> Tuple[int, int]:
+        """number of bytes in (latest snapshot, events since)"""
+        snapshot = os.path.getsize(self.path("snapshot", self.segment)) if self.segment else 0
+        events = sum(os.path.getsize(self.path("events", s)) for s in self.segments("events") if s >= self.segment)
+        return (snapshot, events)
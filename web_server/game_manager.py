@@ -0,0 +1,142 @@
+"""Keeps track of the games hosted by this server process.
+
+Games are evicted once they are over, or once nobody has acted in them for a while,
+so that finished and abandoned games do not pin memory and sockets forever. Given a timer wheel,
+every game has a timer on it for when it may expire, which checks the game and is re-armed for the
+remaining time if it was touched since. Otherwise expired games are swept with evict_expired.
+"""
+
+from enum import Enum
+import sys
+import time
+import types
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import uuid
+
+from timer_wheel import Timer, TimerWheel
+
+
+class GameManager:
+    def __init__(self, max_games: int, idle_ttl: float, game_over_ttl: float,
+                 clock: Callable[[], float] = time.monotonic, wheel: Optional[TimerWheel] = None):
+        self.max_games: int = max_games
+        self.idle_ttl: float = idle_ttl              # seconds without any action before a game is evicted
+        self.game_over_ttl: float = game_over_ttl    # seconds a finished game is kept around
+        self.clock: Callable[[], float] = clock
+        self.games: Dict[str, Any] = dict()          # game_id -> server.GameHandle
+        self.num_created: int = 0
+        self.num_evicted: int = 0
+        self.wheel: Optional[TimerWheel] = wheel
+        self.expiry_timers: Dict[str, Timer] = dict()   # game_id -> timer checking for expiry, given a wheel
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.games
+
+    def __getitem__(self, game_id: str):
+        return self.games[game_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.games)
+
+    def is_full(self) -> bool:
+        return len(self.games) >= self.max_games
+
+    def add(self, handle, game_id: Optional[str] = None) -> str:
+        """registers handle as a new game and returns its game_id, which is generated unless given"""
+        if game_id is None:
+            game_id = str(uuid.uuid4())
+        handle.game_id = game_id
+        handle.last_active = self.clock()
+        self.games[game_id] = handle
+        self.num_created += 1
+        self.arm_expiry(handle, self.idle_ttl)
+        return game_id
+
+    def remove(self, game_id: str) -> None:
+        del self.games[game_id]
+        if self.wheel is not None:
+            self.wheel.cancel(self.expiry_timers.pop(game_id, None))
+
+    def touch(self, handle) -> None:
+        handle.last_active = self.clock()
+        if handle.is_over():
+            # finished games expire sooner than the idle games the timer was armed for
+            self.arm_expiry(handle, self.game_over_ttl)
+
+    def ttl(self, handle) -> float:
+        return self.game_over_ttl if handle.is_over() else self.idle_ttl
+
+    def is_expired(self, handle, now: float) -> bool:
+        return now - handle.last_active >= self.ttl(handle)
+
+    def arm_expiry(self, handle, delay: float) -> None:
+        if self.wheel is None:
+            return
+        self.wheel.cancel(self.expiry_timers.get(handle.game_id))
+        game_id = handle.game_id
+        self.expiry_timers[game_id] = self.wheel.schedule(delay, lambda: self.check_expiry(game_id))
+
+    def check_expiry(self, game_id: str) -> None:
+        handle = self.games.get(game_id)
+        if handle is None:
+            return
+        remaining = handle.last_active + self.ttl(handle) - self.clock()
+        if remaining <= 0:
+            self.evict(game_id)
+        else:
+            self.arm_expiry(handle, remaining)
+
+    def evict(self, game_id: str) -> None:
+        handle = self.games[game_id]
+        self.remove(game_id)
+        handle.on_evicted()
+        self.num_evicted += 1
+
+    def evict_expired(self) -> List[str]:
+        """removes all expired games. Returns their game_ids."""
+        now = self.clock()
+        expired = [game_id for (game_id, handle) in self.games.items() if self.is_expired(handle, now)]
+        for game_id in expired:
+            self.evict(game_id)
+        return expired
+
+    def stats(self, include_memory: bool = False) -> Dict:
+        """capacity metrics. Measuring memory walks every game, so it is only done on request."""
+        num_over = sum(1 for handle in self.games.values() if handle.is_over())
+        stats = {
+            "games": len(self.games),
+            "max_games": self.max_games,
+            "games_over": num_over,
+            "games_created": self.num_created,
+            "games_evicted": self.num_evicted,
+        }
+        if include_memory:
+            sizes = [estimate_size(handle.game) for handle in self.games.values()]
+            stats["game_bytes_total"] = sum(sizes)
+            stats["game_bytes_max"] = max(sizes, default=0)
+        return stats
+
+
+def estimate_size(obj, seen: Optional[set] = None) -> int:
+    """approximate number of bytes held by obj and everything it references.
+    Classes, functions, modules and enum members are shared between games and not counted.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType, Enum)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for (k, v) in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += estimate_size(getattr(obj, slot), seen)
+    return size
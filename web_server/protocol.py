@@ -0,0 +1,119 @@
+"""Encodings of the messages the server sends, see ws_schema.md.
+
+Clients pick one when connecting, with the encoding query argument of the WebSocket URL:
+"json" (the default) sends every message as a JSON object, "compact" as a JSON array
+with single letter message types and state keys, which is much smaller. Message types without
+a compact form are sent as JSON objects in the compact encoding too.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# message type -> (compact code, fields in the order they are sent)
+COMPACT_MESSAGES = {
+    "state_update": ("u", ["updates", "version"]),
+    "prompt": ("p", ["action", "prompt", "choices"]),
+    "game_id": ("g", ["game_id"]),
+    "player_id": ("i", ["player_id"]),
+    "game_begun": ("b", []),
+    "is_host": ("h", []),
+    "error": ("e", ["msg"]),
+    "success": ("s", ["msg"]),
+}
+
+COMPACT_STATE_KEYS = {
+    "players": "p",
+    "eliminated_players": "x",
+    "president": "P",
+    "chancellor": "C",
+    "unused_tiles": "d",
+    "discarded_tiles": "D",
+    "election_tracker": "t",
+    "liberal_progress": "l",
+    "fascist_progress": "f",
+    "fascist_powers": "w",
+    "identity": "I",
+}
+
+
+def encode_json(message: Dict) -> str:
+    return json.dumps(message)
+
+
+# json.dumps builds a new encoder whenever it is given options
+dumps_compact = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def encode_compact(message: Dict) -> str:
+    compact = COMPACT_MESSAGES.get(message["type"])
+    if compact is None:
+        # an object, which decoders tell apart from the arrays of the message types with a compact form
+        return dumps_compact(message)
+    (code, fields) = compact
+    if code == "u":
+        get = COMPACT_STATE_KEYS.get
+        encoded = [code, {get(k, k): v for (k, v) in message["updates"].items()}]
+        if "version" in message:
+            encoded.append(message["version"])
+        return dumps_compact(encoded)
+    return dumps_compact([code] + [message[field] for field in fields])
+
+
+def decode_compact(encoded: str) -> Dict:
+    """inverse of encode_compact"""
+    decoded = json.loads(encoded)
+    if isinstance(decoded, dict):
+        return decoded
+    message_type = next(t for (t, (code, _)) in COMPACT_MESSAGES.items() if code == decoded[0])
+    message: Dict[str, Any] = {"type": message_type}
+    message.update(zip(COMPACT_MESSAGES[message_type][1], decoded[1:]))
+    if message_type == "state_update":
+        state_keys = {short: key for (key, short) in COMPACT_STATE_KEYS.items()}
+        message["updates"] = {state_keys.get(k, k): v for (k, v) in message["updates"].items()}
+    return message
+
+
+ENCODINGS: Dict[str, Callable[[Dict], str]] = {
+    "json": encode_json,
+    "compact": encode_compact,
+}
+
+
+def state_update_message(updates: Dict, version: Optional[int] = None) -> Dict:
+    """version is left out of updates that are not part of the game state's history, e.g. identities"""
+    message: Dict[str, Any] = {
+        "type": "state_update",
+        "updates": updates
+    }
+    if version is not None:
+        message["version"] = version
+    return message
+
+
+def prompt_message(action: str, prompt: str, choices: List[str]) -> Dict:
+    return {
+        "type": "prompt",
+        "action": action,
+        "prompt": prompt,
+        "choices": choices
+    }
+
+
+def frame_size(frame: str) -> int:
+    """bytes of UTF-8 sent for frame. Both encodings escape everything else, so this is rarely more than len(frame)"""
+    return len(frame) if frame.isascii() else len(frame.encode())
+
+
+class EncodedMessage:
+    """message encoded on demand, at most once per encoding, for sending the same message to many clients"""
+    def __init__(self, message: Dict):
+        self.message: Dict = message
+        self.frames: Dict[str, str] = dict()     # encoding -> encoded message
+        self.sizes: Dict[str, int] = dict()      # encoding -> frame_size of the encoded message
+
+    def encode(self, encoding: str) -> str:
+        frame = self.frames.get(encoding)
+        if frame is None:
+            frame = self.frames[encoding] = ENCODINGS[encoding](self.message)
+            self.sizes[encoding] = frame_size(frame)
+        return frame
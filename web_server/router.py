@@ -0,0 +1,182 @@
+"""Runs the game server as several worker processes behind a router.
+
+Every game is owned by exactly one worker, chosen by a hash of its game_id, so games are never
+shared between processes and need no locking. Router processes accept the client WebSockets and
+relay each connection to the worker owning its game over a local WebSocket. Routers keep no game
+state, so there can be as many of them as there are cores, all accepting on the same port.
+Given a log directory, each worker keeps a game log in its own subdirectory (see game_log.py).
+Games are recovered by the worker of the same index, so restart with the same number of workers.
+By default, workers and routers each get half of the cores. The cores left over (if any) are shared equally between
+the bot pools of the workers, which have at least one process each.
+
+Usage: python router.py [num_workers] [port] [log_dir]
+"""
+
+import json
+import logging
+import os
+import sys
+from typing import List, Optional
+import uuid
+import zlib
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.process
+import tornado.web
+import tornado.websocket
+from tornado.websocket import websocket_connect, WebSocketClientConnection
+
+import bot_seats
+from protocol import ENCODINGS, decode_compact
+import server
+import server_log
+
+# requests that (re)bind a client connection to the worker owning a game
+ROUTING_REQUESTS = ("new_game", "join_game", "spectate", "reconnect")
+
+logger = logging.getLogger("router")
+
+
+def shard_of(game_id: str, num_shards: int) -> int:
+    # crc32 rather than hash(): it must agree across processes regardless of PYTHONHASHSEED
+    return zlib.crc32(game_id.encode()) % num_shards
+
+
+def is_error(frame: str, encoding: str) -> bool:
+    message = decode_compact(frame) if encoding == "compact" else json.loads(frame)
+    return message["type"] == "error"
+
+
+class RouterHandler(tornado.websocket.WebSocketHandler):
+    def initialize(self, shard_urls: List[str]):
+        self.shard_urls: List[str] = shard_urls
+
+    def open(self):
+        self.set_nodelay(True)
+        self.upstream: Optional[WebSocketClientConnection] = None
+        # workers are asked for a known encoding, so that the first thing they send is the answer to a routing request
+        encoding = self.get_argument("encoding", "json")
+        self.encoding = encoding if encoding in ENCODINGS else "json"
+        if encoding not in ENCODINGS:
+            self.respond_to_error(f"Unknown encoding {encoding}. Using json.")
+
+    def on_close(self):
+        if self.upstream is not None:
+            self.upstream.close()
+            self.upstream = None
+
+    def check_origin(self, origin):
+        return True
+
+    async def on_message(self, message):
+        # tornado reads the next message only once this coroutine is done, so requests stay in order
+        try:
+            request = json.loads(message)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or request.get("type") not in ROUTING_REQUESTS:
+            if self.upstream is None:
+                self.respond_to_error("Not in a game.")
+            else:
+                self.upstream.write_message(message)
+            return
+
+        if request["type"] == "new_game":
+            # the router names new games, so that it knows which worker they will live on
+            request["game_id"] = str(uuid.uuid4())
+            message = json.dumps(request)
+        elif "game_id" not in request:
+            self.respond_to_error("Invalid Request. Did not find expected field game_id.")
+            return
+
+        await self.connect_upstream(shard_of(request["game_id"], len(self.shard_urls)), message)
+
+    async def connect_upstream(self, shard: int, message: str):
+        """sends the routing request message to the worker of shard, over a new connection that replaces the current
+        one only if the worker accepts the request. Otherwise the client stays in its game, as with a single server.
+        """
+        try:
+            upstream = await websocket_connect(f"{self.shard_urls[shard]}?encoding={self.encoding}")
+            upstream.write_message(message)
+            response = await upstream.read_message()
+        except Exception as err:
+            logger.error("cannot reach shard %d: %s", shard, err)
+            self.respond_to_error("Game server unavailable.")
+            return
+        if response is None:
+            logger.error("shard %d hung up on a routing request", shard)
+            self.respond_to_error("Game server unavailable.")
+            return
+        assert isinstance(response, str), "workers only send text frames"
+        if self.ws_connection is None or is_error(response, self.encoding):
+            # the client left while connecting, or the worker refused (e.g. no such game)
+            upstream.close()
+            if self.ws_connection is not None:
+                self.write_message(response)
+            return
+        if self.upstream is not None:
+            self.upstream.close()
+        self.upstream = upstream
+        self.write_message(response)
+        tornado.ioloop.IOLoop.current().add_callback(self.relay, upstream)
+
+    async def relay(self, upstream: WebSocketClientConnection):
+        """forwards everything the worker sends to the client, without decoding it"""
+        while True:
+            message = await upstream.read_message()
+            if message is None:
+                break
+            try:
+                await self.write_message(message)
+            except tornado.websocket.WebSocketClosedError:
+                upstream.close()
+                return
+        # the worker hung up (e.g. the game was evicted) unless the client moved on to another game
+        if self.upstream is upstream:
+            self.upstream = None
+            self.close()
+
+    def respond_to_error(self, reason: str):
+        self.write_message(json.dumps({
+            "type": "error",
+            "msg": reason
+        }))
+
+
+def make_router_application(shard_urls: List[str]) -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/ws", RouterHandler, {"shard_urls": shard_urls}),
+        (r"/(.*)", tornado.web.StaticFileHandler, {"path": os.path.dirname(__file__), "default_filename": "index.html"}),
+    ])
+
+
+def main(num_workers: int, port: int, log_dir: Optional[str] = None):
+    num_cores = tornado.process.cpu_count()
+    public_sockets = tornado.netutil.bind_sockets(port)
+    worker_sockets = [tornado.netutil.bind_sockets(0, "127.0.0.1") for _ in range(num_workers)]
+    shard_urls = [f"ws://127.0.0.1:{sockets[0].getsockname()[1]}/ws" for sockets in worker_sockets]
+
+    # processes 0..num_workers-1 own the games, the rest route. Crashed processes are restarted.
+    task_id = tornado.process.fork_processes(2 * num_workers)
+    server_log.configure()
+    if task_id == 0:
+        logger.info("Serving site at port %d with %d workers", port, num_workers)
+    if task_id < num_workers:
+        server.ACCEPT_ROUTED_GAME_IDS = True
+        # the cores not taken by the workers and routers, shared between the bot pools of the workers
+        bot_seats.BOT_PROCESSES = max(1, (num_cores - 2 * num_workers) // num_workers)
+        if log_dir is not None:
+            server.enable_game_log(os.path.join(log_dir, f"shard-{task_id}"))
+        tornado.httpserver.HTTPServer(server.application).add_sockets(worker_sockets[task_id])
+        server.start_timers()
+    else:
+        tornado.httpserver.HTTPServer(make_router_application(shard_urls)).add_sockets(public_sockets)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else max(1, tornado.process.cpu_count() // 2),
+         int(sys.argv[2]) if len(sys.argv) > 2 else 3737,
+         sys.argv[3] if len(sys.argv) > 3 else None)
@@ -1,6 +1,12 @@
+from asyncio import Future
+from collections import deque
 import json
+import logging
 import os
-from typing import Dict, List
+import random
+import sys
+import time
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
 import uuid
 
 import tornado.httpserver
@@ -8,13 +14,78 @@ import tornado.websocket
 import tornado.ioloop
 import tornado.web
 
+from secret_hitler.compact import CompactState
 from secret_hitler.game import Game
 from secret_hitler.prompts import Prompt
 from secret_hitler.exceptions import GameError
-
-games: Dict[str, "GameHandle"] = dict()
-
-MAX_GAMES_ALLOWED = 1
+from secret_hitler.stages import ChancellorNominated, GameOver, PerformPresidentialPower, RevealIdentities
+
+from bot_seats import BotSeat
+from game_manager import GameManager
+from spectators import Channel
+from timer_wheel import Timer, TimerWheel
+from protocol import ENCODINGS, EncodedMessage, frame_size, prompt_message, state_update_message
+import game_log
+from game_log import GameLog, GameLogError
+import server_log
+from server_log import ContextAdapter
+import metrics
+
+MAX_GAMES_ALLOWED = 2000        # per process, see benchmarks/server_load_bench.py
+GAME_IDLE_TTL = 60 * 60         # seconds without any action before a game is evicted
+GAME_OVER_TTL = 5 * 60          # seconds a finished game is kept so players can see the outcome
+TIMER_TICK = 0.5                # seconds between ticks of the timer wheel driving turn timers and eviction
+ACCEPT_ROUTED_GAME_IDS = False  # set on workers behind router.py, which names new games itself
+LOG_SYNC_INTERVAL = 0.05        # seconds between fsyncs of the game log
+SNAPSHOT_INTERVAL = 5 * 60      # seconds between snapshots of all games, bounds the log replayed on recovery
+STATE_HISTORY_LENGTH = 64       # state updates kept per game for clients catching up after reconnecting
+SPECTATOR_DELAY = 3             # actions spectators lag behind the players
+OUTBOX_MAX_CHARS = 1 << 20      # characters queued for a client that does not keep up, before disconnecting it
+# seconds players have to act on a prompt, by stage, before their default action is played for them
+PROMPT_TIMEOUTS = {
+    RevealIdentities: 60,
+    ChancellorNominated: 60,
+    PerformPresidentialPower: 90,
+}
+DEFAULT_PROMPT_TIMEOUT = 120
+# action -> choice played on timeout if legal, otherwise a random legal choice is
+DEFAULT_CHOICES = {"vote_for_chancellor": "nein"}
+# perform actions every prompted player takes (votes, identity acks) together, once everyone has taken them
+BATCH_COLLECTIVE_ACTIONS = True
+
+REQUEST_TYPES = ("new_game", "join_game", "add_bot", "spectate", "reconnect", "begin_game", "user_action")
+
+logger = logging.getLogger("server")
+timers = TimerWheel(TIMER_TICK)     # the timers of every game, see start_timers
+games = GameManager(MAX_GAMES_ALLOWED, GAME_IDLE_TTL, GAME_OVER_TTL, wheel=timers)
+events: Optional[GameLog] = None    # see enable_game_log
+replaying = False                   # bots and turn timers do not act on prompts while logged games are replayed
+
+request_seconds = metrics.registry.histogram(
+    "ws_request_seconds", "Time to handle a WebSocket request, by request type", ("type",))
+action_seconds = metrics.registry.histogram(
+    "game_action_seconds", "Time to perform a user action, including broadcasting its results")
+stage_action_seconds = metrics.registry.histogram(
+    "stage_action_seconds", "Time spent in Game.perform_action, by stage and action", ("stage", "action"))
+errors_total = metrics.registry.counter("errors_total", "Requests that failed, by error", ("error",))
+messages_sent = metrics.registry.counter("ws_messages_sent_total", "WebSocket messages sent")
+bytes_sent = metrics.registry.counter("ws_sent_bytes_total", "Bytes of UTF-8 sent in WebSocket messages")
+connections_opened = metrics.registry.counter("ws_connections_opened_total", "WebSocket connections opened")
+connections_closed = metrics.registry.counter("ws_connections_closed_total", "WebSocket connections closed")
+messages_coalesced = metrics.registry.counter(
+    "ws_messages_coalesced_total", "State updates merged into the previous one while queued for a slow client")
+slow_clients_dropped = metrics.registry.counter(
+    "ws_slow_clients_dropped_total", "Connections closed because too much was queued for them")
+turn_timeouts = metrics.registry.counter(
+    "turn_timeouts_total", "Prompts the default action was played for, by action", ("action",))
+replay_failures = metrics.registry.counter(
+    "game_log_replay_failures_total", "Logged events rejected when replayed on recovery, by error", ("error",))
+metrics.registry.gauge("timers", "Timers pending on the timer wheel", lambda: len(timers))
+metrics.registry.gauge("ws_connections", "Open WebSocket connections",
+                       lambda: connections_opened.values.get((), 0) - connections_closed.values.get((), 0))
+metrics.registry.gauge("games", "Games hosted by this process", lambda: len(games))
+metrics.registry.gauge("game_log_enabled", "1 while games are logged, 0 if not or once the game log failed",
+                       lambda: int(events is not None))
 
 
 class RequestError(Exception):
@@ -22,30 +93,101 @@ class RequestError(Exception):
 
 
 class GameHandle:
-    def __init__(self, host: str):
+    def __init__(self, host: str, seed: Optional[int] = None):
         self.host: str = host                            # player_name of host
-        self.game: Game = Game()                         # game server instance
+        self.game_id: str = ""                           # set by the GameManager
+        self.seed: int = seed if seed is not None else random.getrandbits(64)
+        self.game: Game = Game(random.Random(self.seed))  # game server instance
         self.players: Dict[str, str] = dict()            # player_id -> player_name
         self.handles: Dict[str, WSHandler] = dict()      # player_id -> ws_handle
         self.ids: Dict[str, str] = dict()                # player_name -> player_id
         self.prompts: Dict[str, Prompt] = dict()         # player_name -> secret_hitler.Prompt
+        self.bots: Dict[str, BotSeat] = dict()           # player_name -> seat of a computer player
+        self.prompt_round: int = 0                       # number of times prompts were updated
+        self.acted: Set[str] = set()                     # player_names who acted on the current prompts
+        self.collected: List[Tuple[str, str, str]] = []  # (player_name, action, choice) waiting for the others
+        self.turn_timer: Optional[Timer] = None          # plays default actions if the prompts are not acted on
         self.has_begun: bool = False                     # has the game begun?
-
-    def add_player(self, player: str, ws_handle):
+        self.last_active: float = 0                      # set by the GameManager
+        self.version: int = 0                            # number of state updates broadcast so far
+        self.history: Deque[Tuple[int, Dict]] = deque(maxlen=STATE_HISTORY_LENGTH)  # (version, updates)
+        self.spectators: Channel = Channel(SPECTATOR_DELAY)
+        self.full_state: Optional[Tuple[int, EncodedMessage]] = None    # (version, message with the full state)
+        self.log = ContextAdapter(logger, self)
+
+    def add_player(self, player: str, ws_handle, player_id: Optional[str] = None, bot: bool = False):
         self.game.add_player(player)
-        player_id = str(uuid.uuid4())
+        player_id = player_id or str(uuid.uuid4())
         self.players[player_id] = player
-        self.handles[player_id] = ws_handle
+        if bot:
+            self.bots[player] = BotSeat(self, player)
+        elif ws_handle is not None:
+            self.handles[player_id] = ws_handle
         self.ids[player] = player_id
+        log_event(game_log.ADD_BOT if bot else game_log.JOIN_GAME, self.game_id, player, player_id)
 
         # broadcast updated player list to everyone
-        for player_id in self.players.keys():
-            self.handles[player_id].send_state_update({
-                "players": list(self.players.values())
-            })
+        self.broadcast_state({
+            "players": list(self.players.values())
+        })
 
         return player_id
 
+    def broadcast_state(self, updates: Dict):
+        """send updates to everyone as the next version of the game state"""
+        self.version += 1
+        self.history.append((self.version, updates))
+        self.broadcast(state_update_message(updates, self.version))
+        # the waiting room is not delayed, there is nothing to give away yet
+        self.spectators.publish(updates, delayed=self.has_begun)
+        for ws in self.handles.values():
+            ws.state_version = self.version
+
+    def state_changes_since(self, version: int) -> Optional[Dict]:
+        """all updates after version merged into one, None if some of them are no longer in the history"""
+        if version == self.version:
+            return dict()
+        if version > self.version or not self.history or self.history[0][0] > version + 1:
+            return None
+        changes: Dict = dict()
+        for (update_version, updates) in self.history:
+            if update_version > version:
+                changes.update(updates)
+        return changes
+
+    def sync_state(self, ws, version: Optional[int]):
+        """bring ws up to date from version: only the changes since then if possible, else the full state"""
+        updates = None if version is None else self.state_changes_since(version)
+        if updates is None and self.has_begun:
+            ws.send_encoded(self.full_state_message())
+        else:
+            if updates is None:
+                updates = {"players": list(self.players.values())}
+            if updates:
+                ws.send_state_update(updates, self.version)
+        ws.state_version = self.version
+
+    def full_state_message(self) -> EncodedMessage:
+        """the full state as of the current version, built and encoded once for every client catching up with it,
+        e.g. all players reconnecting at once after a restart
+        """
+        if self.full_state is None or self.full_state[0] != self.version:
+            self.full_state = (self.version, EncodedMessage(state_update_message(self.get_full_state(), self.version)))
+        return self.full_state[1]
+
+    def broadcast(self, message: Dict, recipients=None):
+        """send message to recipients (default: everyone), encoding it only once per encoding in use"""
+        self.log.debug("broadcasting: %s", message)
+        encoded = EncodedMessage(message)
+        (num_sent, size) = (0, 0)
+        for ws in (self.handles.values() if recipients is None else recipients):
+            frame = encoded.encode(ws.encoding)
+            ws.send_frame(frame, message)
+            num_sent += 1
+            size += encoded.sizes[ws.encoding]
+        messages_sent.inc(amount=num_sent)
+        bytes_sent.inc(amount=size)
+
     def update_ws_handle(self, player_id: str, ws_handle):
         self.handles[player_id] = ws_handle
 
@@ -56,38 +198,172 @@ class GameHandle:
         return self.game.get_full_state()
 
     def update_prompts(self, prompts):
-        print("updating prompts to: " + str(prompts))
+        self.log.debug("updating prompts to: %s", prompts)
         # update internal prompt store
         self.prompts = prompts
-        # send prompt to users who need prompts
-        for prompt_player in prompts:
-            self.handles[self.ids[prompt_player]].send_new_prompt(prompts[prompt_player])
+        self.prompt_round += 1
+        self.acted.clear()
+        self.collected = []
+        self.prompt_bots()
+        self.start_turn_timer()
+        # send prompt to users who need prompts. Players given the same prompt (e.g. to vote) share it, and its encoding
+        recipients: Dict[Prompt, List[WSHandler]] = dict()
+        for (prompt_player, prompt) in prompts.items():
+            # players are not connected while their game is being recovered
+            ws = self.handles.get(self.ids[prompt_player])
+            if ws is not None:
+                recipients.setdefault(prompt, []).append(ws)
+        for (prompt, handles) in recipients.items():
+            self.broadcast(prompt_message(prompt.method, prompt.prompt_str, prompt.choices), handles)
+
+    def prompt_bots(self):
+        """have the bots among the prompted players decide on their actions, in the background"""
+        if replaying:
+            return
+        for (prompt_player, prompt) in self.prompts.items():
+            seat = self.bots.get(prompt_player)
+            if seat is not None and prompt_player not in self.acted:
+                seat.on_prompt(prompt, self.prompt_round)
+
+    def start_turn_timer(self):
+        """give the prompted players until the timeout of the current stage to act"""
+        timers.cancel(self.turn_timer)
+        self.turn_timer = None
+        if replaying or not self.prompts:
+            return
+        timeout = PROMPT_TIMEOUTS.get(type(self.game.stage), DEFAULT_PROMPT_TIMEOUT)
+        prompt_round = self.prompt_round
+        self.turn_timer = timers.schedule(timeout, lambda: self.on_turn_timeout(prompt_round))
+
+    def on_turn_timeout(self, prompt_round: int):
+        """play the default action of every prompted player who has not acted on the prompts of prompt_round"""
+        if prompt_round != self.prompt_round:
+            return
+        self.turn_timer = None
+        for player in sorted(set(self.prompts) - self.acted):
+            if prompt_round != self.prompt_round:
+                # e.g. the last vote missing was played and the game moved on
+                break
+            if player in self.acted:
+                continue
+            prompt = self.prompts[player]
+            self.log.info("%s did not act in time on %s", player, prompt.method)
+            turn_timeouts.inc((prompt.method,))
+            self.perform_default_action(player, prompt)
+
+    def perform_default_action(self, player: str, prompt: Prompt):
+        choices = list(prompt.choices)
+        random.shuffle(choices)
+        default = DEFAULT_CHOICES.get(prompt.method)
+        if default in choices:
+            choices.insert(0, default)
+        for choice in choices:
+            try:
+                self.perform_action(self.ids[player], prompt.method, choice)
+                return
+            except GameError:
+                continue
+            except RequestError as err:
+                # no other choice would be accepted either, e.g. the prompt is no longer current
+                self.log.warning("no default for %s on %s: %s", player, prompt.method, err)
+                return
+        self.log.warning("no legal default for %s on %s", player, prompt.method)
 
     def begin_game(self):
         (prompts, state_updates) = self.game.begin_game()
         self.has_begun = True
+        log_event(game_log.BEGIN_GAME, self.game_id)
         # send prompts
         self.update_prompts(prompts)
         # send identities to every player. Broadcast game_begun & full_state (ignore state_updates)
-        full_state = self.get_full_state()
-        for player_id in self.players.keys():
-            self.handles[player_id].send_player_identity(self.game.get_identity(self.players[player_id]))
-            self.handles[player_id].send_game_begun()
-            self.handles[player_id].send_state_update(full_state)
+        for (player_id, ws) in self.handles.items():
+            ws.send_player_identity(self.game.get_identity(self.players[player_id]))
+        self.broadcast({
+            "type": "game_begun"
+        })
+        self.broadcast_state(self.get_full_state())
 
     def perform_action(self, player_id, action, choice):
+        player = self.players[player_id]
         # check if user is authorized
-        if self.players[player_id] not in self.prompts:
+        if player not in self.prompts:
             raise RequestError("Cannot perform request. Unauthorized to do so.")
+        prompt = self.prompts[player]
+        if player in self.acted:
+            raise RequestError(f"Cannot perform request. Already performed {prompt.method}.")
+        if action != prompt.method:
+            raise RequestError(f"Cannot perform request. Expected {prompt.method}.")
+        if BATCH_COLLECTIVE_ACTIONS and len(self.prompts) > 1:
+            self.collect_action(player, prompt, choice)
+            return
+        start = time.perf_counter()
+        stage = type(self.game.stage).__name__
         (prompts, state_updates) = self.game.perform_action(action, choice)
-
+        stage_action_seconds.observe(time.perf_counter() - start, (stage, action))
+        log_event(game_log.USER_ACTION, self.game_id, player, action, choice)
+        self.acted.add(player)
+        self.apply_results(prompts, state_updates, start, 1)
+
+    def collect_action(self, player: str, prompt: Prompt, choice: str):
+        """hold back an action all prompted players take until everyone has taken it, then perform them together.
+        None of them changes anything visible before the last one, so nothing is lost by waiting.
+        Should one of them fail, none are performed and everyone is prompted again, rather than waiting on actions taken.
+        The actions are only logged once performed, so the log never holds a rejected batch.
+        """
+        if choice not in prompt.choices:
+            raise RequestError(f"Cannot perform request. Expected {prompt.method} with one of {prompt.choices}.")
+        self.acted.add(player)
+        self.collected.append((player, prompt.method, choice))
+        if len(self.collected) < len(self.prompts):
+            return
+        start = time.perf_counter()
+        stage = type(self.game.stage).__name__
+        try:
+            (prompts, state_updates) = self.game.perform_actions(self.collected)
+        except Exception:
+            # the game is as it was before the batch
+            self.log.warning("rejected %s, prompting everyone again", self.collected)
+            self.update_prompts(self.prompts)
+            raise
+        stage_action_seconds.observe(time.perf_counter() - start, (stage, prompt.method))
+        for (collected_player, action, collected_choice) in self.collected:
+            log_event(game_log.USER_ACTION, self.game_id, collected_player, action, collected_choice)
+        num_actions = len(self.collected)
+        self.collected = []
+        self.apply_results(prompts, state_updates, start, num_actions)
+
+    def apply_results(self, prompts, state_updates, start: float, num_actions: int):
+        """send out the results of num_actions actions performed since start"""
         if prompts:
             self.update_prompts(prompts)
 
         if state_updates:
             # send state updates to everyone
-            for ws in self.handles.values():
-                ws.send_state_update(state_updates)
+            self.broadcast_state(state_updates)
+        self.spectators.count_actions(num_actions)
+        if self.is_over():
+            self.spectators.flush()
+            timers.cancel(self.turn_timer)
+            self.turn_timer = None
+            # finished games are kept for less time
+            games.touch(self)
+        action_seconds.observe(time.perf_counter() - start)
+
+    def is_over(self) -> bool:
+        return type(self.game.stage) is GameOver
+
+    def on_evicted(self):
+        log_event(game_log.EVICT_GAME, self.game_id)
+        # bots still deciding find they are no longer seated
+        self.bots.clear()
+        timers.cancel(self.turn_timer)
+        self.turn_timer = None
+        self.spectators.close()
+        # disconnect everyone, clients will find the game gone if they try to reconnect
+        for ws in self.handles.values():
+            if ws.game is self:
+                ws.game = None
+                ws.close_when_written()
 
     def get_prompt_of_player(self, player_id):
         player = self.players[player_id]
@@ -95,108 +371,279 @@ class GameHandle:
             return None
         return self.prompts[player]
 
+    def log_context(self) -> Dict:
+        return {"game_id": self.game_id, "player_id": "-"}
+
+    def get_snapshot(self) -> Tuple:
+        """everything but the connections, which do not survive a restart, as plain values (see game_log.py):
+        (host, seed, players, has_begun, version, bots, acted, packed CompactState of the game, PRNG state).
+        The prompts follow from the stage. Collected actions are left out, like everything not logged yet: their
+        players are prompted again after a restart.
+        """
+        state = CompactState.from_board(self.game.board, self.game.stage)
+        acted = self.acted.difference(player for (player, _, _) in self.collected)
+        return (self.host, self.seed, dict(self.players), self.has_begun, self.version, sorted(self.bots),
+                sorted(acted), state.pack(), self.game.board.rng.getstate())
+
+    @staticmethod
+    def from_snapshot(snapshot: Tuple) -> "GameHandle":
+        (host, seed, players, has_begun, version, bots, acted, packed, rng_state) = snapshot
+        # the history is not kept, clients reconnecting with an older version get the full state
+        handle = GameHandle(host, seed)
+        rng = handle.game.board.rng
+        rng.setstate(rng_state)
+        state = CompactState.unpack(packed)
+        handle.game.board = state.to_board(rng)
+        handle.game.stage = state.to_stage(handle.game.board)
+        if handle.game.stage is not None:
+            try:
+                handle.prompts = handle.game.stage.prompts().get_dict()
+            except GameError as err:
+                # the game was stuck in this stage already, e.g. on a presidential power that is not implemented
+                handle.log.error("recovered game has no prompts: %r", err)
+        handle.players = players
+        handle.ids = {name: player_id for (player_id, name) in players.items()}
+        (handle.has_begun, handle.version) = (has_begun, version)
+        handle.bots = {name: BotSeat(handle, name) for name in bots}
+        handle.acted = set(acted)
+        # spectators only get to see the recovered state after the next few actions
+        handle.spectators.publish(handle.get_full_state() if handle.has_begun else {"players": list(handle.players.values())},
+                                  delayed=handle.has_begun)
+        return handle
+
 
 class WSHandler(tornado.websocket.WebSocketHandler):
+    # outbound queue, for messages sent while the previous write is still in flight
+    writing: Optional[Future] = None                        # the write in flight
+    outbox: Optional[Deque[Tuple[str, Dict]]] = None        # (frame, message) waiting for it
+    outbox_chars: int = 0
+    dropped: bool = False                                   # for falling too far behind
+    closing: bool = False                                   # close once the outbox is written, see close_when_written
+
     def open(self):
+        # most actions are answered with several small messages, which Nagle's algorithm would hold back until
+        # the client acknowledges the first one (up to 40ms with delayed acknowledgements)
+        self.set_nodelay(True)
         self.game = None
         self.player_id = None
-        print("new ws connection!")
+        self.spectating: Optional[Channel] = None
+        self.state_version: Optional[int] = None    # version of the game state last sent to this client
+        self.log = ContextAdapter(logger, self)
+        encoding = self.get_argument("encoding", "json")
+        self.encoding = encoding if encoding in ENCODINGS else "json"
+        self.log.debug("new ws connection!")
+        connections_opened.inc()
+        if encoding not in ENCODINGS:
+            self.respond_to_error(f"Unknown encoding {encoding}. Using json.")
 
     def on_close(self):
-        print("connection closed")
+        self.log.debug("connection closed")
+        connections_closed.inc()
+        if self.spectating is not None:
+            self.spectating.unsubscribe(self)
 
     def check_origin(self, origin):
         return True
 
+    def log_context(self) -> Dict:
+        return {"game_id": self.game.game_id if self.game else "-", "player_id": self.player_id or "-"}
+
     def on_message(self, message):
+        start = time.perf_counter()
+        self.request_type = "invalid"
+        try:
+            self.handle_request(message)
+        finally:
+            request_seconds.observe(time.perf_counter() - start, (self.request_type,))
+
+    def handle_request(self, message):
         try:
             request = json.loads(message)
             self.ensure_properties(request, ["type"])
-
-            if request["type"] == "new_game":
-                self.ensure_properties(request, ["host"])
-                if len(games) >= MAX_GAMES_ALLOWED:
-                    self.respond_to_error("Cannot create game. Server at max capacity.")
-                new_game_id = str(uuid.uuid4())
-                self.game = GameHandle(request["host"])
-                self.player_id = self.game.add_player(request["host"], self)
-                games[new_game_id] = self.game
-                self.respond_to_success("Game created successfully.")
-                self.send_game_id(new_game_id)
-                self.send_player_id()
-                return
-
-            if request["type"] == "reconnect":
-                self.game = self.safe_get_game(request)
-                self.safe_get_player(request)  # makes sure player_id exists in self.game
-                self.player_id = request["player_id"]
-                self.game.update_ws_handle(self.player_id, self)
-                if self.game.has_begun:
-                    # send game_begun to send client into game proper
-                    self.send_game_begun()
-                    # send full state to get client up to date
-                    self.send_state_update(self.game.get_full_state())
-                    self.send_player_identity()
-                    # send current prompt if there exists one
-                    self.send_new_prompt(self.game.get_prompt_of_player(self.player_id))
-                else:
-                    # send player_id to send client into waiting room
-                    self.send_player_id()
-                    # if player is host, send is_host
-                    if self.game.host == self.game.players[self.player_id]:
-                        self.send_is_host()
-                    # send waiting room players
-                    self.send_state_update({
-                        "players": list(self.game.players.values())
-                    })
+            handler = REQUEST_HANDLERS.get(request["type"])
+            if handler is None:
                 return
-
-            if request["type"] == "join_game":
-                self.game = self.safe_get_game(request)
-                self.ensure_properties(request, ["player_name"])
-                if request["player_name"] in self.game.players.values():
-                    self.respond_to_error("Cannot join. User name already exists in game.")
-                self.player_id = self.game.add_player(request["player_name"], self)
-                self.respond_to_success(f"Joined game. Currently {len(self.game.players)} players in game.")
-                self.send_game_id(request["game_id"])
-                self.send_player_id()
-                return
-
-            if request["type"] == "begin_game":
-                self.game.begin_game()
-                return
-
-            if request["type"] == "user_action":
-                self.ensure_properties(request, ["action", "choice"])
-                self.game.perform_action(self.player_id, request["action"], request["choice"])
-                action = request["action"]
-                self.respond_to_success(f"Action {action} performed successfully.")
-
-        except RequestError as err:
-            self.respond_to_error(str(err))
-            self.recover_from_execption()
-        except GameError as err:
+            self.request_type = request["type"]
+            handler(self, request)
+        except (RequestError, GameError) as err:
+            errors_total.inc((type(err).__name__,))
             self.respond_to_error(str(err))
             self.recover_from_execption()
         # except Exception as err:
         #     self.respond_to_error("Unknown exception occurred: " + str(err))
 
+    def handle_new_game(self, request):
+        self.ensure_not_spectating("create game")
+        self.ensure_properties(request, ["host"])
+        if games.is_full():
+            self.respond_to_error("Cannot create game. Server at max capacity.")
+            return
+        routed_game_id = request.get("game_id") if ACCEPT_ROUTED_GAME_IDS else None
+        if routed_game_id in games:
+            raise RequestError("Cannot create game. Game ID already in use.")
+        self.game = create_game(request["host"], routed_game_id)
+        self.player_id = self.game.add_player(request["host"], self)
+        self.respond_to_success("Game created successfully.")
+        self.send_game_id(self.game.game_id)
+        self.send_player_id()
+
+    def handle_reconnect(self, request):
+        self.ensure_not_spectating("reconnect")
+        self.game = self.safe_get_game(request)
+        self.safe_get_player(request)  # makes sure player_id exists in self.game
+        self.player_id = request["player_id"]
+        self.game.update_ws_handle(self.player_id, self)
+        games.touch(self.game)
+        # clients may send the last version of the state they have seen, to only receive what changed since
+        version = request.get("version")
+        if type(version) is not int:
+            version = None
+        if self.game.has_begun:
+            # send game_begun to send client into game proper
+            self.send_game_begun()
+            # get client up to date
+            self.game.sync_state(self, version)
+            self.send_player_identity()
+            # send current prompt if there exists one
+            self.send_new_prompt(self.game.get_prompt_of_player(self.player_id))
+        else:
+            # send player_id to send client into waiting room
+            self.send_player_id()
+            # if player is host, send is_host
+            if self.game.host == self.game.players[self.player_id]:
+                self.send_is_host()
+            # send waiting room players
+            self.game.sync_state(self, version)
+
+    def handle_join_game(self, request):
+        self.ensure_not_spectating("join")
+        self.game = self.safe_get_game(request)
+        self.ensure_properties(request, ["player_name"])
+        if request["player_name"] in self.game.ids:
+            self.respond_to_error("Cannot join. User name already exists in game.")
+            return
+        self.player_id = self.game.add_player(request["player_name"], self)
+        games.touch(self.game)
+        self.respond_to_success(f"Joined game. Currently {len(self.game.players)} players in game.")
+        self.send_game_id(request["game_id"])
+        self.send_player_id()
+
+    def handle_add_bot(self, request):
+        self.safe_get_own_game()
+        self.ensure_properties(request, ["player_name"])
+        if self.game.host != self.game.players[self.player_id]:
+            raise RequestError("Cannot add bot. Only the host can add bots.")
+        if self.game.has_begun:
+            raise RequestError("Cannot add bot. Game has already begun.")
+        if request["player_name"] in self.game.ids:
+            self.respond_to_error("Cannot add bot. User name already exists in game.")
+            return
+        self.game.add_player(request["player_name"], None, bot=True)
+        games.touch(self.game)
+        self.respond_to_success(f"Added bot. Currently {len(self.game.players)} players in game.")
+
+    def handle_spectate(self, request):
+        if self.game is not None or self.spectating is not None:
+            raise RequestError("Cannot spectate. Already in a game.")
+        game = self.safe_get_game(request)
+        self.respond_to_success("Spectating game.")
+        self.spectating = game.spectators
+        self.spectating.subscribe(self)
+
+    def handle_begin_game(self, request):
+        self.safe_get_own_game().begin_game()
+        games.touch(self.game)
+
+    def handle_user_action(self, request):
+        self.ensure_properties(request, ["action", "choice"])
+        self.safe_get_own_game()
+        games.touch(self.game)
+        self.game.perform_action(self.player_id, request["action"], request["choice"])
+        action = request["action"]
+        self.respond_to_success(f"Action {action} performed successfully.")
+
     def recover_from_execption(self):
         if self.game is None:
             return
         # TODO: better recovery from all kinds of states
         if self.game.has_begun:
-            # send full state to get client up to date
-            self.send_state_update(self.game.get_full_state())
+            # get client up to date, usually it already is
+            self.game.sync_state(self, self.state_version)
             self.send_player_identity()
             # send current prompt if there exists one
             self.send_new_prompt(self.game.get_prompt_of_player(self.player_id))
 
     def safe_send(self, obj):
+        frame = ENCODINGS[self.encoding](obj)
+        messages_sent.inc()
+        bytes_sent.inc(amount=frame_size(frame))
+        self.send_frame(frame, obj)
+
+    def send_encoded(self, encoded: EncodedMessage):
+        frame = encoded.encode(self.encoding)
+        messages_sent.inc()
+        bytes_sent.inc(amount=encoded.sizes[self.encoding])
+        self.send_frame(frame, encoded.message)
+
+    def send_frame(self, frame: str, message: Dict):
+        """send message, encoded as frame. Does not count towards the metrics, callers do that.
+        Messages sent while the previous one is still being written wait in the outbox, where a state_update is merged
+        into a state_update before it. Clients that let too much pile up are disconnected, to catch up by reconnecting.
+        """
+        if self.writing is None:
+            self.write_frame(frame)
+            return
+        if self.dropped:
+            return
+        if self.outbox is None:
+            self.outbox = deque()
+        if self.outbox and message["type"] == "state_update" and self.outbox[-1][1]["type"] == "state_update":
+            (queued_frame, queued) = self.outbox.pop()
+            self.outbox_chars -= len(queued_frame)
+            message = state_update_message({**queued["updates"], **message["updates"]},
+                                           message.get("version", queued.get("version")))
+            frame = ENCODINGS[self.encoding](message)
+            messages_coalesced.inc()
+        self.outbox.append((frame, message))
+        self.outbox_chars += len(frame)
+        if self.outbox_chars > OUTBOX_MAX_CHARS:
+            self.log.warning("disconnecting client with %d characters queued", self.outbox_chars)
+            slow_clients_dropped.inc()
+            self.dropped = True
+            self.outbox.clear()
+            self.outbox_chars = 0
+            self.close(1008, "Too far behind. Reconnect to catch up.")
+
+    def write_frame(self, frame: str):
         try:
-            self.write_message(json.dumps(obj))
+            future = self.write_message(frame)
         except Exception as err:
-            print("Encountered error during ws send: " + str(err))
+            self.log.warning("Encountered error during ws send: %s", err)
+            return
+        if future is not None and not future.done():
+            self.writing = future
+            future.add_done_callback(self.on_written)
+
+    def on_written(self, future: Future):
+        self.writing = None
+        if future.cancelled() or future.exception() is not None:
+            # the connection is gone
+            self.outbox = None
+            self.outbox_chars = 0
+            return
+        while self.outbox and self.writing is None:
+            (frame, _) = self.outbox.popleft()
+            self.outbox_chars -= len(frame)
+            self.write_frame(frame)
+        if self.closing and self.writing is None:
+            self.close()
+
+    def close_when_written(self):
+        """close the connection once the messages queued for it are written, e.g. the end of an evicted game"""
+        if self.writing is None:
+            self.close()
+        else:
+            self.closing = True
 
     def send_player_identity(self, identity=None):
         identity = identity or self.game.get_identity(self.player_id)
@@ -209,22 +656,14 @@ class WSHandler(tornado.websocket.WebSocketHandler):
             "type": "game_begun"
         })
 
-    def send_state_update(self, updates):
-        print("sending update: " + str(updates))
-        self.safe_send({
-            "type": "state_update",
-            "updates": updates
-        })
+    def send_state_update(self, updates, version: Optional[int] = None):
+        self.log.debug("sending update: %s", updates)
+        self.safe_send(state_update_message(updates, version))
 
     def send_new_prompt(self, prompt):
-        print("sending prompt: " + str(prompt))
+        self.log.debug("sending prompt: %s", prompt)
         if prompt:
-            self.safe_send({
-                "type": "prompt",
-                "action": prompt.method,
-                "prompt": prompt.prompt_str,
-                "choices": prompt.choices
-            })
+            self.safe_send(prompt_message(prompt.method, prompt.prompt_str, prompt.choices))
 
     def send_game_id(self, game_id):
         self.safe_send({
@@ -249,12 +688,22 @@ class WSHandler(tornado.websocket.WebSocketHandler):
             raise RequestError("Game does not exist.")
         return games[request["game_id"]]
 
+    def safe_get_own_game(self):
+        if self.game is None:
+            raise RequestError("Not in a game.")
+        return self.game
+
     def safe_get_player(self, request):
         self.ensure_properties(request, ["player_id"])
         if request["player_id"] not in self.game.players:
             raise RequestError("Player does not exist")
         return self.game.players[request["player_id"]]
 
+    def ensure_not_spectating(self, attempt: str):
+        # spectators would otherwise receive their game's updates early, as a player, and delayed, as a spectator
+        if self.spectating is not None:
+            raise RequestError(f"Cannot {attempt}. Spectating a game.")
+
     def ensure_properties(self, request, props: List[str]):
         for prop in props:
             if prop not in request:
@@ -275,14 +724,129 @@ class WSHandler(tornado.websocket.WebSocketHandler):
         self.safe_send(response)
 
 
+# request type -> handler, so handling a request is a single lookup
+REQUEST_HANDLERS: Dict[str, Callable[[WSHandler, Dict], None]] = {
+    request_type: getattr(WSHandler, f"handle_{request_type}") for request_type in REQUEST_TYPES
+}
+
+
+def evict_expired_games() -> None:
+    games.evict_expired()
+
+
+def start_timers() -> None:
+    """tick the timer wheel, which turn timers and eviction run on, from the IOLoop"""
+    tornado.ioloop.PeriodicCallback(timers.advance, TIMER_TICK * 1000).start()
+
+
+def create_game(host: str, game_id: Optional[str] = None, seed: Optional[int] = None) -> GameHandle:
+    handle = GameHandle(host, seed)
+    games.add(handle, game_id)
+    log_event(game_log.NEW_GAME, handle.game_id, handle.host, handle.seed)
+    return handle
+
+
+def log_event(*event) -> None:
+    global events
+    if events is None:
+        return
+    try:
+        events.append(list(event))
+    except GameLogError:
+        # games go on without being logged rather than fail every request, see game_log_enabled
+        logger.critical("stopped logging games, they will not survive a restart", exc_info=True)
+        events = None
+
+
+def replay_event(event: List) -> None:
+    (event_type, game_id) = event[:2]
+    if event_type == game_log.NEW_GAME:
+        create_game(event[2], game_id, event[3])
+    elif event_type == game_log.JOIN_GAME:
+        games[game_id].add_player(event[2], None, event[3])
+    elif event_type == game_log.ADD_BOT:
+        games[game_id].add_player(event[2], None, event[3], bot=True)
+    elif event_type == game_log.BEGIN_GAME:
+        games[game_id].begin_game()
+    elif event_type == game_log.USER_ACTION:
+        handle = games[game_id]
+        handle.perform_action(handle.ids[event[2]], event[3], event[4])
+    elif event_type == game_log.EVICT_GAME:
+        games.remove(game_id)
+
+
+def snapshot_games() -> None:
+    """starts a new segment of the game log. The games are pickled here, the log writes them out in the background"""
+    if events is None:
+        # the log failed since it was enabled
+        return
+    events.start_segment({game_id: games[game_id].get_snapshot() for game_id in games})
+
+
+def recover_games(log: GameLog) -> int:
+    """rebuilds the games in log from its latest snapshot and the events logged since.
+    Returns the number of events the games rejected, which only happens if they play out differently than logged.
+    """
+    assert events is None, "replayed events must not be logged again"
+    global replaying
+    replaying = True
+    snapshot = log.read_snapshot() or dict()
+    for (game_id, handle_snapshot) in snapshot.items():
+        games.add(GameHandle.from_snapshot(handle_snapshot), game_id)
+    num_failed = 0
+    for event in log.read_events():
+        try:
+            replay_event(event)
+        except (RequestError, GameError) as err:
+            logger.error("skipping event %s that cannot be replayed: %r", event, err)
+            replay_failures.inc((type(err).__name__,))
+            num_failed += 1
+    replaying = False
+    # bots pick up where they left off once the IOLoop runs, players get a full turn to do so
+    for game_id in games:
+        games[game_id].prompt_bots()
+        games[game_id].start_turn_timer()
+    return num_failed
+
+
+def enable_game_log(log_dir: str) -> None:
+    """recovers the games logged in log_dir, then logs all games there from now on"""
+    global events
+    log = GameLog(log_dir, LOG_SYNC_INTERVAL)
+    num_failed = recover_games(log)
+    logger.info("recovered %d games from %s", len(games), log_dir)
+    if num_failed:
+        logger.error("%d logged events could not be replayed, see game_log_replay_failures_total", num_failed)
+    events = log
+    snapshot_games()
+    tornado.ioloop.PeriodicCallback(snapshot_games, SNAPSHOT_INTERVAL * 1000).start()
+
+
+class StatusHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write(games.stats(include_memory=self.get_argument("memory", None) is not None))
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(metrics.registry.render())
+
+
 application = tornado.web.Application([
     (r"/ws", WSHandler),
+    (r"/status", StatusHandler),
+    (r"/metrics", MetricsHandler),
     (r"/(.*)", tornado.web.StaticFileHandler, {"path": os.path.dirname(__file__), "default_filename": "index.html"}),
 ])
 
 
 if __name__ == "__main__":
+    server_log.configure()
     http_server = tornado.httpserver.HTTPServer(application)
     http_server.listen(3737)
-    print("Serving site at port 3737")
+    logger.info("Serving site at port 3737")
+    if len(sys.argv) > 1:
+        enable_game_log(sys.argv[1])
+    start_timers()
     tornado.ioloop.IOLoop.instance().start()
@@ -0,0 +1,78 @@
+"""Logging for the server processes.
+
+Records are put on a queue and written out by a background thread, so the IOLoop never waits on
+log output. Loggers wrapped in a ContextAdapter tag their records with the game and player they
+concern, and, like any logger, only format their messages once a record passes the level check.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional, TextIO
+
+LEVEL = os.environ.get("SECRET_HITLER_LOG_LEVEL", "INFO")
+FORMAT = "%(asctime)s %(levelname)s %(name)s [game=%(game_id)s player=%(player_id)s] %(message)s"
+CONTEXT_FIELDS = ("game_id", "player_id")
+
+listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """fills in the context fields of records logged without a ContextAdapter"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, "-")
+        return True
+
+
+class ContextAdapter(logging.LoggerAdapter):
+    """tags records with owner.log_context(), which is only called for records that are emitted"""
+    def __init__(self, logger: logging.Logger, owner):
+        super().__init__(logger, {})
+        self.owner = owner
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = self.owner.log_context()
+        return (msg, kwargs)
+
+
+def configure(level=LEVEL, stream: TextIO = sys.stderr) -> None:
+    """log everything at level or above to stream, from a background thread.
+    Must be called again in processes forked afterwards, the thread does not survive a fork.
+    """
+    global listener
+    if listener is not None:
+        listener.stop()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter(FORMAT))
+    output.addFilter(ContextFilter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, output)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    listener.start()
+
+
+def flush() -> None:
+    """writes out all queued records and stops the background thread"""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+atexit.register(flush)
+
+
+def disable() -> None:
+    """turns off all logging in this process, e.g. when simulating load"""
+    logging.disable(logging.CRITICAL)
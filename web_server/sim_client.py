@@ -0,0 +1,112 @@
+"""Simulated WebSocket clients for load testing the server.
+
+Each client speaks the protocol described in ws_schema.md and answers every prompt with a random choice.
+"""
+
+import asyncio
+import json
+import random
+from typing import Callable, Dict, List, Optional
+
+from tornado import gen
+from tornado.websocket import websocket_connect, WebSocketClientConnection
+
+from protocol import decode_compact
+
+LIBERAL_WINNING_PROGRESS = 5
+FASCIST_WINNING_PROGRESS = 6
+
+
+DECODINGS: Dict[str, Callable[[str], Dict]] = {
+    "json": json.loads,
+    "compact": decode_compact,
+}
+
+
+class SimClient:
+    def __init__(self, url: str, name: str, rng: random.Random, encoding: str = "json", think_time: float = 0):
+        self.url: str = f"{url}?encoding={encoding}"
+        self.decode: Callable[[str], Dict] = DECODINGS[encoding]
+        self.name: str = name
+        self.rng: random.Random = rng
+        self.think_time: float = think_time     # average seconds before answering a prompt
+        self.conn: Optional[WebSocketClientConnection] = None
+        self.game_id: Optional[str] = None
+        self.player_id: Optional[str] = None
+        self.state: Dict = dict()
+        self.version: Optional[int] = None      # of the game state, to send when reconnecting
+        self.num_actions: int = 0
+        self.received: List[Dict] = []
+        self.bytes_received: int = 0
+
+    async def connect(self) -> None:
+        self.conn = await websocket_connect(self.url)
+
+    def send(self, request: Dict) -> None:
+        assert self.conn is not None
+        self.conn.write_message(json.dumps(request))
+
+    async def receive(self) -> Dict:
+        assert self.conn is not None
+        message = await self.conn.read_message()
+        if message is None:
+            raise ConnectionError(f"{self.name}: connection closed")
+        assert isinstance(message, str), "the server only sends text frames"
+        self.bytes_received += len(message)
+        response = self.decode(message)
+        self.received.append(response)
+        if response["type"] == "state_update":
+            self.state.update(response["updates"])
+            self.version = response.get("version", self.version)
+        elif response["type"] == "game_id":
+            self.game_id = response["game_id"]
+        elif response["type"] == "player_id":
+            self.player_id = response["player_id"]
+        return response
+
+    async def receive_until(self, response_type: str) -> Dict:
+        while True:
+            response = await self.receive()
+            if response["type"] == response_type:
+                return response
+
+    def game_over(self) -> bool:
+        return (self.state.get("liberal_progress") == LIBERAL_WINNING_PROGRESS
+                or self.state.get("fascist_progress") == FASCIST_WINNING_PROGRESS)
+
+    async def play(self) -> None:
+        """answer prompts with random choices until the game is over"""
+        while not self.game_over():
+            response = await self.receive()
+            if response["type"] == "prompt":
+                if self.think_time:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+                self.send({
+                    "type": "user_action",
+                    "action": response["action"],
+                    "choice": self.rng.choice(response["choices"]),
+                })
+                self.num_actions += 1
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+async def play_game(url: str, num_players: int, rng: random.Random, encoding: str = "json",
+                    think_time: float = 0) -> List[SimClient]:
+    """create a game, fill it with num_players simulated clients and play it to the end"""
+    clients = [SimClient(url, f"p{i}", random.Random(rng.getrandbits(64)), encoding, think_time)
+               for i in range(num_players)]
+    await gen.multi([c.connect() for c in clients])
+    (host, guests) = (clients[0], clients[1:])
+    host.send({"type": "new_game", "host": host.name})
+    await host.receive_until("player_id")
+    for guest in guests:
+        guest.send({"type": "join_game", "game_id": host.game_id, "player_name": guest.name})
+        await guest.receive_until("player_id")
+    host.send({"type": "begin_game"})
+    await gen.multi([c.play() for c in clients])
+    for c in clients:
+        c.close()
+    return clients
@@ -0,0 +1,175 @@
+"""Read-only fan-out of a game's public state to spectators.
+
+Every game has a Channel that receives the state updates broadcast to its players, which never hold
+identities or prompts, and releases them to subscribed spectators a number of actions later, so
+that spectators cannot relay the game to its players as it happens.
+
+Delivery happens in IOLoop callbacks rather than on the action path, encodes each update once per
+encoding for all spectators and yields to the IOLoop every FANOUT_CHUNK sockets, so that thousands of
+spectators do not hold up the players. A spectator has at most one write in flight: updates released
+while its socket is still busy are merged into one catch-up with the whole state once it drains, so a
+slow spectator costs a version number rather than a growing queue.
+"""
+
+import asyncio
+from collections import deque
+import functools
+import logging
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import tornado.ioloop
+import tornado.websocket
+
+import metrics
+from protocol import EncodedMessage, state_update_message
+
+FANOUT_CHUNK = 256      # spectators written to before yielding to the IOLoop
+
+logger = logging.getLogger("server.spectators")
+
+num_spectators = 0
+spectator_messages_sent = metrics.registry.counter("spectator_messages_sent_total", "Messages sent to spectators")
+spectator_catch_ups = metrics.registry.counter(
+    "spectator_catch_ups_total", "Whole states sent to spectators whose sockets fell behind, instead of their updates")
+metrics.registry.gauge("spectators", "Subscribed spectators", lambda: num_spectators)
+
+
+class Subscriber:
+    __slots__ = ("ws", "version", "writing", "subscribed")
+
+    def __init__(self, ws):
+        self.ws = ws                            # server.WSHandler
+        self.version: int = -1                  # version of the spectator state last written to ws
+        self.writing: Optional[Any] = None      # future of the write in flight, if any
+        self.subscribed: bool = True            # until unsubscribed, possibly while a delivery is under way
+
+
+class Channel:
+    def __init__(self, delay: int):
+        self.delay: int = delay                 # actions spectators lag behind the players
+        self.num_actions: int = 0
+        self.delayed: Deque[Tuple[int, Dict]] = deque()    # (num_actions when due, updates) not released yet
+        self.state: Dict = dict()               # public state as released so far
+        self.version: int = 0                   # number of updates released so far
+        self.released: List[Dict] = []          # updates released but not delivered yet
+        self.subscribers: Dict[Any, Subscriber] = dict()   # ws -> subscriber
+        self.delivering: bool = False
+        self.full_state: Optional[EncodedMessage] = None   # self.state as a message, until the next release
+
+    def publish(self, updates: Dict, delayed: bool = True) -> None:
+        self.delayed.append((self.num_actions + self.delay if delayed else 0, updates))
+        self.release()
+
+    def count_actions(self, num_actions: int = 1) -> None:
+        self.num_actions += num_actions
+        self.release()
+
+    def flush(self) -> None:
+        """release everything, e.g. once the game is over and no action will come to release it"""
+        self.num_actions += self.delay
+        self.release()
+
+    def release(self) -> None:
+        while self.delayed and self.delayed[0][0] <= self.num_actions:
+            updates = self.delayed.popleft()[1]
+            self.state.update(updates)
+            self.version += 1
+            self.full_state = None
+            if self.subscribers:
+                self.released.append(updates)
+        if self.released and not self.delivering:
+            self.delivering = True
+            tornado.ioloop.IOLoop.current().add_callback(self.deliver)
+
+    async def deliver(self) -> None:
+        try:
+            while self.released:
+                (base, version) = (self.version - len(self.released), self.version)
+                updates: Dict = dict()
+                for released in self.released:
+                    updates.update(released)
+                self.released = []
+                message = EncodedMessage(state_update_message(updates, version))
+                subscribers = list(self.subscribers.values())
+                for start in range(0, len(subscribers), FANOUT_CHUNK):
+                    if start:
+                        await asyncio.sleep(0)
+                    self.deliver_chunk(subscribers[start:start + FANOUT_CHUNK], message, base, version)
+        finally:
+            self.delivering = False
+
+    def deliver_chunk(self, chunk: List[Subscriber], message: EncodedMessage, base: int, version: int) -> None:
+        """write message, which takes spectators from version base to version, to the subscribers in chunk.
+        This runs for every spectator between two actions, so the common case is kept to a few attribute lookups.
+        """
+        frames = message.frames
+        num_sent = 0
+        for subscriber in chunk:
+            if subscriber.writing is not None or subscriber.version >= version or not subscriber.subscribed:
+                # busy sockets catch up once their write is done
+                continue
+            if subscriber.version != base:
+                self.catch_up(subscriber)
+                continue
+            ws = subscriber.ws
+            frame = frames.get(ws.encoding) or message.encode(ws.encoding)
+            try:
+                future = ws.write_message(frame)
+            except tornado.websocket.WebSocketClosedError:
+                self.unsubscribe(ws)
+                continue
+            num_sent += 1
+            subscriber.version = version
+            if future is not None and not future.done():
+                subscriber.writing = future
+                future.add_done_callback(functools.partial(self.on_written, subscriber))
+        spectator_messages_sent.inc(amount=num_sent)
+
+    def subscribe(self, ws) -> None:
+        global num_spectators
+        if ws in self.subscribers:
+            return
+        num_spectators += 1
+        subscriber = self.subscribers[ws] = Subscriber(ws)
+        if self.state:
+            self.catch_up(subscriber)
+
+    def unsubscribe(self, ws) -> None:
+        global num_spectators
+        subscriber = self.subscribers.pop(ws, None)
+        if subscriber is not None:
+            subscriber.subscribed = False
+            num_spectators -= 1
+
+    def close(self) -> None:
+        """disconnect every spectator, e.g. when the game is evicted"""
+        for ws in list(self.subscribers):
+            self.unsubscribe(ws)
+            ws.close()
+
+    def catch_up(self, subscriber: Subscriber) -> None:
+        """send the whole state to subscriber, which is not up to date"""
+        if self.full_state is None:
+            self.full_state = EncodedMessage(state_update_message(dict(self.state), self.version))
+        spectator_catch_ups.inc()
+        self.write(subscriber, self.full_state, self.version)
+
+    def write(self, subscriber: Subscriber, message: EncodedMessage, version: int) -> None:
+        try:
+            future = subscriber.ws.write_message(message.encode(subscriber.ws.encoding))
+        except tornado.websocket.WebSocketClosedError:
+            self.unsubscribe(subscriber.ws)
+            return
+        spectator_messages_sent.inc()
+        subscriber.version = version
+        if future is not None and not future.done():
+            subscriber.writing = future
+            future.add_done_callback(functools.partial(self.on_written, subscriber))
+
+    def on_written(self, subscriber: Subscriber, future) -> None:
+        subscriber.writing = None
+        if future.exception() is not None:
+            logger.debug("dropping spectator: %r", future.exception())
+            self.unsubscribe(subscriber.ws)
+        elif subscriber.ws in self.subscribers and subscriber.version < self.version:
+            self.catch_up(subscriber)
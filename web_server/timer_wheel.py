@@ -0,0 +1,99 @@
+"""Hierarchical timer wheel, for the many timers of a server process that are mostly cancelled.
+
+Time advances in ticks. Level 0 has one slot per tick for the next `slots` ticks, and every further
+level has slots `slots` times as long, each cascaded into the levels below once its time comes. Scheduling
+and cancelling a timer are O(1), and so is a tick apart from the timers it fires or cascades (at most
+once per level), however many timers are pending. Timers fire on the first tick at or after their
+deadline, so up to one tick late.
+"""
+
+import logging
+import math
+import time
+from typing import Callable, List, Optional, Set
+
+logger = logging.getLogger("server.timers")
+
+
+class Timer:
+    __slots__ = ("due", "callback", "slot")
+
+    def __init__(self, due: int, callback: Callable[[], None]):
+        self.due: int = due                         # tick to fire on
+        self.callback: Callable[[], None] = callback
+        self.slot: Optional[Set["Timer"]] = None    # slot the timer waits in, None once fired or cancelled
+
+
+class TimerWheel:
+    def __init__(self, tick: float, slots: int = 256, levels: int = 4, clock: Callable[[], float] = time.monotonic):
+        self.tick: float = tick                     # seconds
+        self.slots: int = slots
+        self.levels: int = levels
+        self.clock: Callable[[], float] = clock
+        self.start: float = clock()
+        self.current: int = 0                       # ticks processed so far
+        self.wheels: List[List[Set[Timer]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.num_timers: int = 0
+
+    def __len__(self) -> int:
+        return self.num_timers
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """call callback in delay seconds (at the earliest on the next tick)"""
+        timer = Timer(self.current + max(1, math.ceil(delay / self.tick)), callback)
+        self.place(timer)
+        self.num_timers += 1
+        return timer
+
+    def cancel(self, timer: Optional[Timer]) -> None:
+        if timer is not None and timer.slot is not None:
+            timer.slot.discard(timer)
+            timer.slot = None
+            self.num_timers -= 1
+
+    def place(self, timer: Timer) -> None:
+        # the lowest level whose current rotation reaches the deadline. Timers beyond the top level wait in
+        # one of its slots and are placed again whenever it is cascaded.
+        level = 0
+        span = self.slots
+        while level < self.levels - 1 and timer.due // span != self.current // span:
+            level += 1
+            span *= self.slots
+        slot = self.wheels[level][timer.due // (span // self.slots) % self.slots]
+        slot.add(timer)
+        timer.slot = slot
+
+    def advance(self) -> None:
+        """process every tick up to now, firing the timers due"""
+        target = int((self.clock() - self.start) / self.tick)
+        while self.current < target:
+            self.current += 1
+            self.cascade()
+            self.fire()
+
+    def cascade(self) -> None:
+        # the slots of higher levels whose time has come, from the top down
+        level = 1
+        span = self.slots
+        while level < self.levels and self.current % span == 0:
+            level += 1
+            span *= self.slots
+        for cascaded in range(level - 1, 0, -1):
+            span //= self.slots
+            slot = self.wheels[cascaded][self.current // span % self.slots]
+            timers = list(slot)
+            slot.clear()
+            for timer in timers:
+                self.place(timer)
+
+    def fire(self) -> None:
+        slot = self.wheels[0][self.current % self.slots]
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            timer.slot = None
+            self.num_timers -= 1
+            try:
+                timer.callback()
+            except Exception:
+                logger.exception("timer callback failed")